@@ -11,6 +11,7 @@ class Settings:
     players: dict[PlayerIdentity, str]
     upload_password: str | None = None
     secret_key: str | None = None
+    parallel_handlers: bool = False
 
 
 def load_settings(config_dir: Path | None = None) -> Settings:
@@ -34,6 +35,7 @@ def load_settings(config_dir: Path | None = None) -> Settings:
         players=players,
         upload_password=server.get("upload_password") or None,
         secret_key=server.get("secret_key") or None,
+        parallel_handlers=bool(server.get("parallel_handlers", False)),
     )
 
 
@@ -17,14 +17,39 @@ Per-frame processing order enforced by analyze_frames:
      identity resolution is still valid when a car is deleted mid-frame
 """
 
+import bisect
+import itertools
 import math
+import queue
+import sys
+import time
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
-from dataclasses import dataclass, field
-from itertools import pairwise
+from array import array
+from collections import Counter
+from collections.abc import (
+    Callable,
+    Collection,
+    Container,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+)
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from enum import Flag, StrEnum, auto
+from functools import partial
+from typing import ClassVar, NamedTuple, cast
 
 from player_identity import PlayerIdentity, from_network_frame
-from rrrocket_schema import FrameData, ParsedReplay, UpdatedActor
+from rrrocket_schema import (
+    ActorUpdate,
+    Demolish,
+    Frame,
+    ParsedReplay,
+    Pickup,
+    RigidBody,
+)
 
 # Coordinates are taken from wiki.rlbot.org
 # https://wiki.rlbot.org/v4/botmaking/useful-game-values/
@@ -51,6 +76,235 @@ BIG_PAD_POSITIONS = {
 # car size and positional jitter in replay network frames.
 BIG_PAD_RADIUS = 400
 BIG_PAD_RADIUS_SQ = BIG_PAD_RADIUS**2
+# Hoops' small pads aren't listed; they keep the position of the car that
+# first picked them up (see _classify_pad).
+SMALL_PAD_POSITIONS = {
+    "standard": [
+        (0, -4240),
+        (-1792, -4184),
+        (1792, -4184),
+        (-940, -3308),
+        (940, -3308),
+        (0, -2816),
+        (-3584, -2484),
+        (3584, -2484),
+        (-1788, -2300),
+        (1788, -2300),
+        (-2048, -1036),
+        (0, -1024),
+        (2048, -1036),
+        (-1024, 0),
+        (1024, 0),
+        (-2048, 1036),
+        (0, 1024),
+        (2048, 1036),
+        (-1788, 2300),
+        (1788, 2300),
+        (-3584, 2484),
+        (3584, 2484),
+        (0, 2816),
+        (-940, 3310),
+        (940, 3308),
+        (0, 4240),
+        (-1792, 4184),
+        (1792, 4184),
+    ],
+    "hoops": [],
+}
+# Official hitbox radius is 144uu; widened like BIG_PAD_RADIUS. Car positions
+# this close to the halfway line count as on it when no pad is matched.
+SMALL_PAD_RADIUS = 280
+SMALL_PAD_RADIUS_SQ = SMALL_PAD_RADIUS**2
+
+
+class SampleSeries:
+    """Timestamped samples stored column-wise.
+
+    Parallel time/value arrays of unboxed doubles avoid a tuple and two float
+    objects per sample, and reducers walk the columns directly. Appending to
+    an array('d') is slower than to a list, but reducing one is faster by
+    about as much.
+    """
+
+    __slots__ = ("times", "values")
+
+    def __init__(self) -> None:
+        self.times = array("d")
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, time: float, value: float) -> None:
+        self.times.append(time)
+        self.values.append(value)
+
+    def extend(self, other: "SampleSeries") -> None:
+        self.times.extend(other.times)
+        self.values.extend(other.values)
+
+    def sorted_by_time(self) -> "SampleSeries":
+        """A copy in time order; samples with equal times keep their order."""
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        out = SampleSeries()
+        out.times = array("d", [self.times[i] for i in order])
+        out.values = array("d", [self.values[i] for i in order])
+        return out
+
+
+class RingBuffer:
+    """The last ``capacity`` rows of ``width`` doubles, oldest overwritten first.
+
+    Rows live in one preallocated array, so memory is fixed however many are
+    pushed.
+    """
+
+    __slots__ = ("_data", "_len", "_next", "capacity", "width")
+
+    def __init__(self, capacity: int, width: int) -> None:
+        self.capacity = capacity
+        self.width = width
+        self._data = array("d", bytes(8 * capacity * width))
+        self._next = 0  # row the next push overwrites
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def push(self, *row: float) -> None:
+        start = self._next * self.width
+        self._data[start : start + self.width] = array("d", row)
+        self._next = (self._next + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def last(self) -> tuple[float, ...] | None:
+        if not self._len:
+            return None
+        start = (self._next - 1) % self.capacity * self.width
+        return tuple(self._data[start : start + self.width])
+
+    def rows(self) -> list[tuple[float, ...]]:
+        """The rows held, oldest first."""
+        w = self.width
+        first = self._next - self._len
+        starts = ((first + i) % self.capacity * w for i in range(self._len))
+        return [tuple(self._data[s : s + w]) for s in starts]
+
+
+# Actor IDs are small dense integers (network channel indices, reused after
+# deletion), so per-actor scalars live in arrays indexed by actor ID rather
+# than dicts of boxed values. Both maps grow on demand.
+
+_NO_INT = -(2**63)
+
+
+class ActorIntMap:
+    """Actor ID -> int, stored in an array('q')."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self) -> None:
+        self._values = array("q")
+
+    def __contains__(self, aid: int) -> bool:
+        return self.get(aid) is not None
+
+    def get(self, aid: int) -> int | None:
+        if 0 <= aid < len(self._values):
+            value = self._values[aid]
+            if value != _NO_INT:
+                return value
+        return None
+
+    def __setitem__(self, aid: int, value: int) -> None:
+        values = self._values
+        if aid >= len(values):
+            values.extend([_NO_INT] * max(aid + 1 - len(values), len(values)))
+        values[aid] = value
+
+    def pop(self, aid: int) -> int | None:
+        value = self.get(aid)
+        if value is not None:
+            self._values[aid] = _NO_INT
+        return value
+
+
+class ActorPointMap:
+    """Actor ID -> (x, y), stored as two array('d') columns; NaN marks absent."""
+
+    __slots__ = ("_xs", "_ys")
+
+    def __init__(self) -> None:
+        self._xs = array("d")
+        self._ys = array("d")
+
+    def __contains__(self, aid: int) -> bool:
+        return 0 <= aid < len(self._xs) and not math.isnan(self._xs[aid])
+
+    def get(self, aid: int) -> tuple[float, float] | None:
+        if aid in self:
+            return self._xs[aid], self._ys[aid]
+        return None
+
+    def set(self, aid: int, x: float, y: float) -> None:
+        xs = self._xs
+        if aid >= len(xs):
+            grow = [math.nan] * max(aid + 1 - len(xs), len(xs))
+            xs.extend(grow)
+            self._ys.extend(grow)
+        xs[aid] = x
+        self._ys[aid] = y
+
+    def __setitem__(self, aid: int, point: tuple[float, float]) -> None:
+        self.set(aid, *point)
+
+    def pop(self, aid: int) -> tuple[float, float] | None:
+        point = self.get(aid)
+        if point is not None:
+            self._xs[aid] = math.nan
+        return point
+
+
+class GameClock:
+    """Maps frame times to game seconds elapsed, from SecondsRemaining updates.
+
+    Regulation counts down from the first value seen, so elapsed game time is
+    ``start - remaining``. Overtime resets the clock to 0 and counts up, so
+    once 0 has been seen positive values are ``start + remaining``.
+    """
+
+    __slots__ = ("_frame_times", "_game_seconds", "_seen_zero", "_start")
+
+    def __init__(self) -> None:
+        self._frame_times: list[float] = []
+        self._game_seconds: list[float] = []
+        self._start: int | None = None
+        self._seen_zero = False
+
+    def __len__(self) -> int:
+        return len(self._frame_times)
+
+    def append(self, frame_time: float, seconds_remaining: int) -> None:
+        """Record a clock update. Frame times must be non-decreasing."""
+        if self._start is None:
+            self._start = seconds_remaining
+        if seconds_remaining == 0:
+            self._seen_zero = True
+        if self._seen_zero and seconds_remaining > 0:
+            game_seconds = self._start + seconds_remaining
+        else:
+            game_seconds = self._start - seconds_remaining
+        self._frame_times.append(frame_time)
+        self._game_seconds.append(game_seconds)
+
+    def game_seconds(self, frame_time: float) -> float:
+        """Game seconds as of the last clock update at or before frame_time.
+
+        Times before the first update map to the first update's value. The
+        clock must not be empty.
+        """
+        i = bisect.bisect_right(self._frame_times, frame_time)
+        return self._game_seconds[max(i - 1, 0)]
 
 
 class IdentityResolver:
@@ -61,9 +315,9 @@ class IdentityResolver:
     """
 
     def __init__(self) -> None:
-        self._car_to_pri: dict[int, int] = {}
+        self._car_to_pri = ActorIntMap()
         self._pri_identity: dict[int, tuple[str, str]] = {}
-        self._component_to_car: dict[int, int] = {}
+        self._component_to_car = ActorIntMap()
 
     def link_car_to_pri(self, car_id: int, pri_id: int) -> None:
         self._car_to_pri[car_id] = pri_id
@@ -75,9 +329,9 @@ class IdentityResolver:
         self._component_to_car[comp_id] = car_id
 
     def remove_actor(self, aid: int) -> None:
-        self._car_to_pri.pop(aid, None)
+        self._car_to_pri.pop(aid)
         self._pri_identity.pop(aid, None)
-        self._component_to_car.pop(aid, None)
+        self._component_to_car.pop(aid)
 
     def resolve_car(self, car_id: int) -> tuple[str, str] | None:
         pri = self._car_to_pri.get(car_id)
@@ -98,7 +352,7 @@ class IdentityResolver:
         return [aid for aid, ident in self._pri_identity.items() if ident in identities]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MatchEvent:
     event_type: str
     game_seconds: float
@@ -106,7 +360,32 @@ class MatchEvent:
     team: int
 
 
-@dataclass(frozen=True)
+class TrajectorySample(NamedTuple):
+    seconds: float  # relative to the goal, so <= 0
+    x: float
+    y: float
+    z: float
+    speed: float
+
+
+@dataclass(frozen=True, slots=True)
+class CarTrajectory:
+    identity: PlayerIdentity
+    team: int
+    samples: tuple[TrajectorySample, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class GoalSnapshot:
+    """The cars and ball over the GOAL_CONTEXT_SECONDS before a goal."""
+
+    game_seconds: float
+    team: int  # the scoring team
+    ball: tuple[TrajectorySample, ...]
+    cars: tuple[CarTrajectory, ...]
+
+
+@dataclass(frozen=True, slots=True)
 class PlayerMovementStats:
     boost_per_minute: float
     avg_speed: float
@@ -117,14 +396,20 @@ class PlayerMovementStats:
     stolen_large_pads: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PlayerZoneSeconds:
     defensive: float
     neutral: float
     offensive: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class PlayerSpacing:
+    avg_teammate_distance: float  # to the nearest teammate, in uu
+    shared_zone_seconds: float  # in the same zone as at least one teammate
+
+
+@dataclass(frozen=True, slots=True)
 class PlayerMatchStats:
     """Per-player metrics computed from frame analysis. See CONTEXT.md: Player Match Stats."""
 
@@ -132,9 +417,11 @@ class PlayerMatchStats:
     demos_received: int = 0
     movement: PlayerMovementStats | None = None
     zone_seconds: PlayerZoneSeconds | None = None
+    heatmap: tuple[float, ...] | None = None  # see heatmap_cell
+    spacing: PlayerSpacing | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class FrameAnalysis:
     team_possession_seconds: float | None = None
     opponent_possession_seconds: float | None = None
@@ -155,9 +442,17 @@ class FrameAnalysis:
         default_factory=dict[tuple[str, str], int]
     )
     match_events: list[MatchEvent] = field(default_factory=list[MatchEvent])
+    goal_snapshots: list[GoalSnapshot] = field(default_factory=list[GoalSnapshot])
     player_zone_seconds: dict[tuple[str, str], PlayerZoneSeconds] = field(
         default_factory=dict[tuple[str, str], PlayerZoneSeconds]
     )
+    # Seconds per cell, see heatmap_cell
+    player_heatmaps: dict[tuple[str, str], tuple[float, ...]] = field(
+        default_factory=dict[tuple[str, str], tuple[float, ...]]
+    )
+    player_spacing: dict[tuple[str, str], PlayerSpacing] = field(
+        default_factory=dict[tuple[str, str], PlayerSpacing]
+    )
 
     def per_player(self) -> dict[PlayerIdentity, PlayerMatchStats]:
         """Assemble per-player match stats keyed by player identity.
@@ -171,6 +466,8 @@ class FrameAnalysis:
             | self.demos_received.keys()
             | self.movement_stats.keys()
             | self.player_zone_seconds.keys()
+            | self.player_heatmaps.keys()
+            | self.player_spacing.keys()
         )
         return {
             PlayerIdentity(*identity): PlayerMatchStats(
@@ -178,12 +475,30 @@ class FrameAnalysis:
                 demos_received=self.demos_received.get(identity, 0),
                 movement=self.movement_stats.get(identity),
                 zone_seconds=self.player_zone_seconds.get(identity),
+                heatmap=self.player_heatmaps.get(identity),
+                spacing=self.player_spacing.get(identity),
             )
             for identity in identities
         }
 
 
-@dataclass
+class Pad(NamedTuple):
+    """A boost pad, classified from its first pickup (see _classify_pad)."""
+
+    x: float
+    y: float
+    is_big: bool
+
+    @property
+    def half(self) -> int | None:
+        """The team whose half the pad is on (team 0 attacks positive-y), or
+        None for pads on the halfway line."""
+        if self.y == 0:
+            return None
+        return 1 if self.y > 0 else 0
+
+
+@dataclass(slots=True)
 class FrameContext:
     """Shared state maintained by the orchestrator loop."""
 
@@ -196,14 +511,95 @@ class FrameContext:
     resolver: IdentityResolver = field(default_factory=IdentityResolver)
 
     # Per-actor state
-    actor_team: dict[int, int] = field(default_factory=dict[int, int])
-    actor_position: dict[int, tuple[float, float]] = field(
-        default_factory=dict[int, tuple[float, float]]
+    actor_team: ActorIntMap = field(default_factory=ActorIntMap)
+    actor_position: ActorPointMap = field(default_factory=ActorPointMap)
+
+    # Per-actor state behind the decoded event streams (see _decode_pickup,
+    # _decode_demolish and _decode_stat_counter). Pads are classified on
+    # their first pickup; later pickups look them up.
+    pickup_state: ActorIntMap = field(default_factory=ActorIntMap)
+    pads: dict[int, Pad] = field(default_factory=dict[int, Pad])  # by pad actor
+    demolish_active: dict[int, bool] = field(default_factory=dict[int, bool])
+    # PRI actor -> counter object ID -> last value. PRIs live all match.
+    stat_counters: dict[int, dict[int, int]] = field(
+        default_factory=dict[int, dict[int, int]]
     )
+    # Frame time of each actor's last on_rigid_body delivery when decimating
+    rigid_body_sampled_at: dict[int, float] = field(default_factory=dict[int, float])
 
     # Game state
     is_playing: bool = False
     frame_time: float = 0.0
+    game_clock: GameClock = field(default_factory=GameClock)
+
+    def remove_actor(self, aid: int) -> None:
+        """Drop all per-actor state for a deleted actor."""
+        self.car_actors.discard(aid)
+        self.ball_actors.discard(aid)
+        self.boost_comp_actors.discard(aid)
+        self.resolver.remove_actor(aid)
+        self.actor_team.pop(aid)
+        self.actor_position.pop(aid)
+        self.pickup_state.pop(aid)
+        self.pads.pop(aid, None)
+        self.demolish_active.pop(aid, None)
+        self.rigid_body_sampled_at.pop(aid, None)
+
+
+class PadPickup(NamedTuple):
+    """A boost pad pickup, decoded once from NewReplicatedPickupData."""
+
+    instigator: int  # car actor
+    team: int
+    is_big: bool
+    is_stolen: bool
+
+
+type UpdateCallback = Callable[[FrameContext, ActorUpdate], None]
+
+
+class Metric(StrEnum):
+    """A group of FrameAnalysis outputs that analyze_frames can compute alone."""
+
+    POSSESSION = "possession"  # team/opponent_possession_seconds
+    BALL_ZONES = "ball_zones"  # defensive/neutral/offensive_zone_seconds
+    PLAYER_ZONES = "player_zones"  # player_zone_seconds
+    DEMOLITIONS = "demolitions"  # demolitions
+    DEMOS_RECEIVED = "demos_received"  # demos_received
+    BOOST = "boost"  # team/opponent_boost_collected/stolen
+    MOVEMENT = "movement"  # movement_stats
+    MATCH_EVENTS = "match_events"  # match_events
+    GOAL_CONTEXT = "goal_context"  # goal_snapshots
+    HEATMAPS = "heatmaps"  # player_heatmaps
+    SPACING = "spacing"  # player_spacing
+
+
+class SharedState(Flag):
+    """FrameContext state the orchestrator maintains only for handlers that
+    declare it in ``needs``."""
+
+    PLAYING = auto()  # is_playing
+    CARS = auto()  # car_actors
+    BALLS = auto()  # ball_actors
+    BOOST_COMPONENTS = auto()  # boost_comp_actors
+    CAR_LINKS = auto()  # resolver: car -> PRI (needs CARS)
+    COMPONENT_LINKS = auto()  # resolver: boost component -> car
+    IDENTITIES = auto()  # resolver: PRI -> (platform, id)
+    TEAMS = auto()  # actor_team
+    POSITIONS = auto()  # actor_position
+    GAME_CLOCK = auto()  # game_clock
+    ALL = (
+        PLAYING
+        | CARS
+        | BALLS
+        | BOOST_COMPONENTS
+        | CAR_LINKS
+        | COMPONENT_LINKS
+        | IDENTITIES
+        | TEAMS
+        | POSITIONS
+        | GAME_CLOCK
+    )
 
 
 class FrameHandler(ABC):
@@ -223,14 +619,49 @@ class FrameHandler(ABC):
       state (boost components, speed samples) must be flushed into
       identity-keyed accumulators here.
 
-    Subclasses must declare ``update_obj_ids`` (a frozenset of network object
-    IDs to receive ``on_update`` notifications for) on the instance.
+    Attributes several handlers read are decoded once per update by the
+    orchestrator and delivered through ``on_rigid_body``, ``on_pickup``,
+    ``on_demolish`` and ``on_stat_counter``; a handler subscribes by
+    overriding the method. For any other attribute, a handler lists its
+    network object IDs in ``update_obj_ids`` to receive them through
+    ``on_update``, or overrides ``update_routes`` so the frame loop calls a
+    per-ID method directly. All of these follow the ``on_update`` ordering.
+
+    ``needs`` lists the shared FrameContext state the handler reads; state no
+    handler needs is not maintained. It defaults to everything.
+
+    ``version`` is recorded with each match the handler's metric is written
+    for; bump it whenever a change alters the handler's output, so that
+    ``process.py --reprocess-stale`` recomputes just that metric.
     """
 
-    update_obj_ids: frozenset[int]
+    needs: ClassVar[SharedState] = SharedState.ALL
+    version: ClassVar[int] = 1
+    update_obj_ids: frozenset[int] = frozenset()
 
-    @abstractmethod
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None: ...
+    def on_update(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        del ctx, actor
+
+    def update_routes(self) -> dict[int, UpdateCallback]:
+        """Callback per subscribed object ID (default: on_update for each)."""
+        return dict.fromkeys(self.update_obj_ids, self.on_update)
+
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        del ctx, aid, rb
+
+    def on_pickup(self, ctx: FrameContext, pickup: PadPickup) -> None:
+        """A pad was picked up (each pickup once; respawns are filtered out)."""
+        del ctx, pickup
+
+    def on_demolish(self, ctx: FrameContext, demolish: Demolish) -> None:
+        """A car's demolish notification went active (rising edge only)."""
+        del ctx, demolish
+
+    def on_stat_counter(
+        self, ctx: FrameContext, aid: int, stat: str, prev: int, value: int
+    ) -> None:
+        """A PRI's scoreboard counter (see STAT_COUNTERS) changed from prev."""
+        del ctx, aid, stat, prev, value
 
     def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
         del ctx, aid
@@ -239,43 +670,105 @@ class FrameHandler(ABC):
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None: ...
 
 
-def _parse_pickup(
-    actor: UpdatedActor,
-    last_pickup_state: dict[int, int],
-    actor_team: dict[int, int],
-    actor_position: dict[int, tuple[float, float]],
+def _decode_pickup(
+    ctx: FrameContext,
+    actor: ActorUpdate,
     big_pads: Sequence[tuple[float, float]],
-) -> tuple[int, int, bool, bool] | None:
-    """Parse a NewReplicatedPickupData actor update.
-
-    Returns (instigator_actor_id, team, is_big, is_stolen) or None to skip.
-    """
-    aid = actor["actor_id"]
-    pickup = actor.get("attribute", {}).get("PickupNew", {})
-    picked_up_state = pickup.get("picked_up")
+    small_pads: Sequence[tuple[float, float]] = (),
+) -> PadPickup | None:
+    """Decode a NewReplicatedPickupData update, or None if it isn't a pickup."""
+    aid = actor.actor_id
+    pickup = actor.value
+    if not isinstance(pickup, Pickup):
+        return None
+    picked_up_state = pickup.picked_up
     if (
         picked_up_state is None or picked_up_state == 255
     ):  # 255 = pad respawning, no valid pickup
         return None
-    if last_pickup_state.get(aid) == picked_up_state:
+    if ctx.pickup_state.get(aid) == picked_up_state:
         return None
-    last_pickup_state[aid] = picked_up_state
+    ctx.pickup_state[aid] = picked_up_state
 
-    instigator = pickup.get("instigator")
+    instigator = pickup.instigator
     if instigator is None:
         return None
-    team = actor_team.get(instigator)
-    pos = actor_position.get(instigator)
-    if team is None or pos is None:
+    team = ctx.actor_team.get(instigator)
+    if team is None:
         return None
+    pad = ctx.pads.get(aid)
+    if pad is None:
+        pos = ctx.actor_position.get(instigator)
+        if pos is None:
+            return None
+        pad = ctx.pads[aid] = _classify_pad(pos, big_pads, small_pads)
+    # Stolen = picked up on the opponent's half
+    is_stolen = pad.half == 1 - team
+    return PadPickup(instigator, team, pad.is_big, is_stolen)
 
-    x, y = pos
-    is_big = any(
-        (x - bx) ** 2 + (y - by) ** 2 <= BIG_PAD_RADIUS_SQ for bx, by in big_pads
-    )
-    # Stolen = picked up on the opponent's half (team 0 attacks positive-y)
-    is_stolen = (team == 0 and y > 0) or (team == 1 and y < 0)
-    return instigator, team, is_big, is_stolen
+
+def _classify_pad(
+    car_position: tuple[float, float],
+    big_pads: Sequence[tuple[float, float]],
+    small_pads: Sequence[tuple[float, float]] = (),
+) -> Pad:
+    """A pad from the position of the first car seen picking it up.
+
+    Pads snap to their known position. An unlisted small pad keeps the car's,
+    which is within a car length of the pad, except that a car within
+    SMALL_PAD_RADIUS of the halfway line puts it on the line: which side the
+    car was on says nothing about which half the pad is in.
+    """
+    x, y = car_position
+    for bx, by in big_pads:
+        if (x - bx) ** 2 + (y - by) ** 2 <= BIG_PAD_RADIUS_SQ:
+            return Pad(bx, by, is_big=True)
+    for sx, sy in small_pads:
+        if (x - sx) ** 2 + (y - sy) ** 2 <= SMALL_PAD_RADIUS_SQ:
+            return Pad(sx, sy, is_big=False)
+    if abs(y) <= SMALL_PAD_RADIUS:
+        y = 0
+    return Pad(x, y, is_big=False)
+
+
+_NO_DEMOLISH = Demolish(
+    attacker_active=False, victim_active=False, victim=None, self_demolish=False
+)
+
+
+def _decode_demolish(ctx: FrameContext, actor: ActorUpdate) -> Demolish | None:
+    """Decode a DemolishExtended update, or None unless it newly went active."""
+    demolish = actor.value
+    if not isinstance(demolish, Demolish):
+        demolish = _NO_DEMOLISH
+    currently_active = demolish.victim_active
+    was_active = ctx.demolish_active.get(actor.actor_id, False)
+    ctx.demolish_active[actor.actor_id] = currently_active
+    if not currently_active or was_active:
+        return None
+    return demolish
+
+
+def _decode_stat_counter(ctx: FrameContext, actor: ActorUpdate) -> tuple[int, int]:
+    """Decode a PRI counter update into (previous value, value)."""
+    value = actor.value if isinstance(actor.value, int) else 0
+    counters = ctx.stat_counters.get(actor.actor_id)
+    if counters is None:
+        counters = ctx.stat_counters[actor.actor_id] = {}
+    oid = cast(int, actor.object_id)
+    prev = counters.get(oid, 0)
+    counters[oid] = value
+    return prev, value
+
+
+# Scoreboard counters on each PRI, delivered through on_stat_counter
+STAT_COUNTERS = {
+    "TAGame.PRI_TA:MatchGoals": "goal",
+    "TAGame.PRI_TA:MatchShots": "shot",
+    "TAGame.PRI_TA:MatchSaves": "save",
+    "TAGame.PRI_TA:MatchDemolishes": "demo",
+    "TAGame.PRI_TA:MatchAssists": "assist",
+}
 
 
 def _resolve_obj_ids(replay: ParsedReplay) -> dict[str, int | None]:
@@ -312,6 +805,8 @@ def _resolve_obj_ids(replay: ParsedReplay) -> dict[str, int | None]:
 class PossessionHandler(FrameHandler):
     """Tracks possession seconds per team based on ball hit team transitions."""
 
+    needs = SharedState(0)
+
     @classmethod
     def create(
         cls, obj_ids: dict[str, int | None], tracked_team: int | None
@@ -326,23 +821,23 @@ class PossessionHandler(FrameHandler):
     def __init__(self, hit_team_obj_id: int, tracked_team: int) -> None:
         self.update_obj_ids = frozenset({hit_team_obj_id})
         self.tracked_team = tracked_team
-        self.touches: list[tuple[float, int]] = []
+        self.touches = SampleSeries()  # value: team number of the last touch
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        team_num = actor.get("attribute", {}).get("Byte")
-        if team_num is not None:
-            self.touches.append((ctx.frame_time, team_num))
+    def on_update(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        team_num = actor.value
+        if isinstance(team_num, int):
+            self.touches.append(ctx.frame_time, team_num)
 
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
         if not self.touches:
             return
 
         possession = {0: 0.0, 1: 0.0}
-        for (t_start, team_num), (t_end, _) in pairwise(self.touches):
+        times, teams = self.touches.times, self.touches.values
+        for t_start, t_end, team_num in zip(times, times[1:], teams, strict=False):
             possession[team_num] += t_end - t_start
 
-        last_time, last_team = self.touches[-1]
-        possession[last_team] += ctx.frame_time - last_time
+        possession[teams[-1]] += ctx.frame_time - times[-1]
 
         team_poss = possession.get(self.tracked_team, 0.0)
         opp_poss = possession.get(1 - self.tracked_team, 0.0)
@@ -354,33 +849,29 @@ _ZONE_BOUNDARY = 1707  # field is ±5120 uu from center; one zone ≈ 5120 / 3
 
 
 def _accumulate_zone_seconds(
-    samples: list[tuple[float, float]], tracked_team: int
+    samples: SampleSeries, tracked_team: int
 ) -> dict[str, float]:
-    zones = {"defensive": 0.0, "neutral": 0.0, "offensive": 0.0}
-    for (t_start, y), (t_end, _) in pairwise(samples):
+    below = neutral = above = 0.0
+    times, ys = samples.times, samples.values
+    for t_start, t_end, y in zip(times, times[1:], ys, strict=False):
         dt = t_end - t_start
-        if not 0 < dt < 2.0:
-            continue
-        if tracked_team == 0:
+        if 0 < dt < 2.0:
             if y < -_ZONE_BOUNDARY:
-                zones["defensive"] += dt
+                below += dt
             elif y > _ZONE_BOUNDARY:
-                zones["offensive"] += dt
-            else:
-                zones["neutral"] += dt
-        else:
-            if y > _ZONE_BOUNDARY:
-                zones["defensive"] += dt
-            elif y < -_ZONE_BOUNDARY:
-                zones["offensive"] += dt
+                above += dt
             else:
-                zones["neutral"] += dt
-    return zones
+                neutral += dt
+    if tracked_team == 0:
+        return {"defensive": below, "neutral": neutral, "offensive": above}
+    return {"defensive": above, "neutral": neutral, "offensive": below}
 
 
 class BallZonesHandler(FrameHandler):
     """Tracks time the ball spent in each zone of the field."""
 
+    needs = SharedState.PLAYING | SharedState.BALLS
+
     @classmethod
     def create(
         cls, obj_ids: dict[str, int | None], tracked_team: int | None
@@ -391,21 +882,15 @@ class BallZonesHandler(FrameHandler):
         ball_archetype = obj_ids.get("Archetypes.Ball.Ball_Default")
         if rb_obj_id is None or ball_archetype is None:
             return None
-        return cls(rb_obj_id, tracked_team)
+        return cls(tracked_team)
 
-    def __init__(self, rb_obj_id: int, tracked_team: int) -> None:
-        self.update_obj_ids = frozenset({rb_obj_id})
+    def __init__(self, tracked_team: int) -> None:
         self.tracked_team = tracked_team
-        self.samples: list[tuple[float, float]] = []
+        self.samples = SampleSeries()  # value: ball y
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        if not ctx.is_playing:
-            return
-        if actor["actor_id"] not in ctx.ball_actors:
-            return
-        loc = actor.get("attribute", {}).get("RigidBody", {}).get("location")
-        if loc and "y" in loc:
-            self.samples.append((ctx.frame_time, loc["y"]))
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if ctx.is_playing and aid in ctx.ball_actors:
+            self.samples.append(ctx.frame_time, rb.location.y)
 
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
         if len(self.samples) < 2:
@@ -419,6 +904,13 @@ class BallZonesHandler(FrameHandler):
 class PlayerZonesHandler(FrameHandler):
     """Tracks time each player spent in each zone of the field."""
 
+    needs = (
+        SharedState.PLAYING
+        | SharedState.CARS
+        | SharedState.CAR_LINKS
+        | SharedState.IDENTITIES
+    )
+
     @classmethod
     def create(
         cls, obj_ids: dict[str, int | None], tracked_team: int | None
@@ -428,17 +920,14 @@ class PlayerZonesHandler(FrameHandler):
         rb_obj_id = obj_ids.get("TAGame.RBActor_TA:ReplicatedRBState")
         if rb_obj_id is None:
             return None
-        return cls(rb_obj_id, tracked_team)
+        return cls(tracked_team)
 
-    def __init__(self, rb_obj_id: int, tracked_team: int) -> None:
-        self.update_obj_ids = frozenset({rb_obj_id})
+    def __init__(self, tracked_team: int) -> None:
         self.tracked_team = tracked_team
-        self.car_samples: dict[int, list[tuple[float, float]]] = {}
+        self.car_samples: dict[int, SampleSeries] = {}  # value: car y
         self.identity_zone_times: dict[tuple[str, str], dict[str, float]] = {}
 
-    def _accumulate(
-        self, identity: tuple[str, str], samples: list[tuple[float, float]]
-    ) -> None:
+    def _accumulate(self, identity: tuple[str, str], samples: SampleSeries) -> None:
         new_zones = _accumulate_zone_seconds(samples, self.tracked_team)
         existing = self.identity_zone_times.setdefault(
             identity, {"defensive": 0.0, "neutral": 0.0, "offensive": 0.0}
@@ -454,15 +943,13 @@ class PlayerZonesHandler(FrameHandler):
         if identity:
             self._accumulate(identity, samples)
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        if not ctx.is_playing:
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if not ctx.is_playing or aid not in ctx.car_actors:
             return
-        aid = actor["actor_id"]
-        if aid not in ctx.car_actors:
-            return
-        loc = actor.get("attribute", {}).get("RigidBody", {}).get("location")
-        if loc and "y" in loc:
-            self.car_samples.setdefault(aid, []).append((ctx.frame_time, loc["y"]))
+        samples = self.car_samples.get(aid)
+        if samples is None:
+            samples = self.car_samples[aid] = SampleSeries()
+        samples.append(ctx.frame_time, rb.location.y)
 
     def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
         self._flush_car(ctx, aid)
@@ -480,24 +967,319 @@ class PlayerZonesHandler(FrameHandler):
         }
 
 
+# Player heatmaps are seconds spent on each cell of a HEATMAP_COLUMNS x
+# HEATMAP_ROWS grid over the field, row-major from the player's own goal line
+# (so both teams' maps line up). Positions past the walls or goal lines land
+# in the edge cells.
+HEATMAP_COLUMNS = 16
+HEATMAP_ROWS = 20
+_FIELD_HALF_WIDTH = 4096
+_FIELD_HALF_LENGTH = 5120
+
+
+def heatmap_cell(x: float, y: float, team: int) -> int:
+    if team == 1:  # team 1 defends positive-y; turn the field around
+        x, y = -x, -y
+    col = int((x + _FIELD_HALF_WIDTH) * HEATMAP_COLUMNS / (2 * _FIELD_HALF_WIDTH))
+    row = int((y + _FIELD_HALF_LENGTH) * HEATMAP_ROWS / (2 * _FIELD_HALF_LENGTH))
+    col = min(max(col, 0), HEATMAP_COLUMNS - 1)
+    row = min(max(row, 0), HEATMAP_ROWS - 1)
+    return row * HEATMAP_COLUMNS + col
+
+
+def _accumulate_heatmap(track: "_PositionTrack", team: int, grid: array[float]) -> None:
+    # Same time weighting as _accumulate_zone_seconds, binned a track at a time
+    cells = [heatmap_cell(x, y, team) for x, y in zip(track.xs, track.ys, strict=True)]
+    times = track.times
+    for t_start, t_end, cell in zip(times, times[1:], cells, strict=False):
+        dt = t_end - t_start
+        if 0 < dt < 2.0:
+            grid[cell] += dt
+
+
+class HeatmapHandler(FrameHandler):
+    """Bins each tracked player's positions into a heatmap (see heatmap_cell)."""
+
+    needs = (
+        SharedState.PLAYING
+        | SharedState.CARS
+        | SharedState.CAR_LINKS
+        | SharedState.IDENTITIES
+    )
+
+    @classmethod
+    def create(
+        cls,
+        obj_ids: dict[str, int | None],
+        tracked_team: int | None,
+        tracked_identities: set[tuple[str, str]],
+    ) -> "HeatmapHandler | None":
+        if tracked_team is None:
+            return None
+        if obj_ids.get("TAGame.RBActor_TA:ReplicatedRBState") is None:
+            return None
+        return cls(tracked_team, tracked_identities)
+
+    def __init__(
+        self, tracked_team: int, tracked_identities: set[tuple[str, str]]
+    ) -> None:
+        self.tracked_team = tracked_team
+        self.tracked_identities = tracked_identities
+        # Cars are sampled until their identity is known, then only if it's
+        # tracked; untracked players' samples are dropped when flushed. Cells
+        # are only worked out then.
+        self.car_tracks: dict[int, _PositionTrack] = {}
+        self.identity_grids: dict[tuple[str, str], array[float]] = {}
+
+    def _flush_car(self, ctx: FrameContext, car_id: int) -> None:
+        track = self.car_tracks.pop(car_id, None)
+        if not track:
+            return
+        identity = ctx.resolver.resolve_car(car_id)
+        if identity is None or identity not in self.tracked_identities:
+            return
+        grid = self.identity_grids.get(identity)
+        if grid is None:
+            grid = self.identity_grids[identity] = array(
+                "d", bytes(8 * HEATMAP_COLUMNS * HEATMAP_ROWS)
+            )
+        _accumulate_heatmap(track, self.tracked_team, grid)
+
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if not ctx.is_playing or aid not in ctx.car_actors:
+            return
+        identity = ctx.resolver.resolve_car(aid)
+        if identity is not None and identity not in self.tracked_identities:
+            return
+        track = self.car_tracks.get(aid)
+        if track is None:
+            track = self.car_tracks[aid] = _PositionTrack()
+        track.append(ctx.frame_time, rb.location.x, rb.location.y)
+
+    def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
+        self._flush_car(ctx, aid)
+
+    def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
+        for car_id in list(self.car_tracks):
+            self._flush_car(ctx, car_id)
+        result.player_heatmaps = {
+            identity: tuple(round(seconds, 2) for seconds in grid)
+            for identity, grid in self.identity_grids.items()
+        }
+
+
+# Teammate spacing is measured on a common timeline of one point every
+# SPACING_INTERVAL; a player's last position counts until _SPACING_MAX_GAP old
+# (past that they're demolished, or play is stopped).
+SPACING_INTERVAL = 0.1
+_SPACING_MAX_GAP = 0.5
+
+
+class _PositionTrack:
+    """A car's or player's sampled positions, column-wise like SampleSeries."""
+
+    __slots__ = ("in_order", "times", "xs", "ys")
+
+    def __init__(self) -> None:
+        self.times = array("d")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.in_order = True  # appends come in frame order; extends may not
+
+    def append(self, time: float, x: float, y: float) -> None:
+        self.times.append(time)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def extend(self, other: "_PositionTrack") -> None:
+        if self.times and other.times and other.times[0] < self.times[-1]:
+            self.in_order = False
+        self.in_order = self.in_order and other.in_order
+        self.times.extend(other.times)
+        self.xs.extend(other.xs)
+        self.ys.extend(other.ys)
+
+    def sorted_by_time(self) -> "_PositionTrack":
+        if self.in_order:
+            return self
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        out = _PositionTrack()
+        out.times = array("d", [self.times[i] for i in order])
+        out.xs = array("d", [self.xs[i] for i in order])
+        out.ys = array("d", [self.ys[i] for i in order])
+        return out
+
+    def resample(
+        self, ticks: Sequence[float]
+    ) -> tuple[list[float], list[float], list[bool]]:
+        """x, y and freshness at each tick, from the latest sample.
+
+        A tick is fresh when that sample is at most _SPACING_MAX_GAP old (x
+        and y are 0 where it isn't). Both ticks and the track must be in time
+        order (see sorted_by_time).
+        """
+        xs: list[float] = []
+        ys: list[float] = []
+        fresh: list[bool] = []
+        times = self.times
+        i = 0
+        for tick in ticks:
+            while i < len(times) and times[i] <= tick:
+                i += 1
+            if i and tick - times[i - 1] <= _SPACING_MAX_GAP:
+                xs.append(self.xs[i - 1])
+                ys.append(self.ys[i - 1])
+                fresh.append(True)
+            else:
+                xs.append(0.0)
+                ys.append(0.0)
+                fresh.append(False)
+        return xs, ys, fresh
+
+
+def _zone_code(y: float) -> int:
+    # 0-2 from y < -_ZONE_BOUNDARY up, as in _accumulate_zone_seconds
+    if y < -_ZONE_BOUNDARY:
+        return 0
+    return 1 if y <= _ZONE_BOUNDARY else 2
+
+
+def _team_spacing(
+    tracks: dict[tuple[str, str], _PositionTrack], ticks: Sequence[float]
+) -> dict[tuple[str, str], PlayerSpacing]:
+    """Spacing of one team's players, resampled onto ticks.
+
+    Only ticks where the player and at least one teammate are fresh count. A
+    player shares a zone at such a tick when a fresh teammate is in the same
+    zone.
+    """
+    resampled = {identity: track.resample(ticks) for identity, track in tracks.items()}
+    zones = {
+        identity: [_zone_code(y) for y in ys]
+        for identity, (_, ys, _) in resampled.items()
+    }
+    spacing: dict[tuple[str, str], PlayerSpacing] = {}
+    for identity, (xs, ys, fresh) in resampled.items():
+        mates = [
+            (mxs, mys, mfresh, zones[mate])
+            for mate, (mxs, mys, mfresh) in resampled.items()
+            if mate != identity
+        ]
+        total = 0.0
+        known = shared = 0
+        for i, zone in enumerate(zones[identity]):
+            if not fresh[i]:
+                continue
+            nearest = math.inf
+            together = False
+            for mxs, mys, mfresh, mzones in mates:
+                if mfresh[i]:
+                    nearest = min(nearest, math.hypot(xs[i] - mxs[i], ys[i] - mys[i]))
+                    together = together or mzones[i] == zone
+            if nearest < math.inf:
+                total += nearest
+                known += 1
+                shared += together
+        if known:
+            spacing[identity] = PlayerSpacing(
+                avg_teammate_distance=round(total / known, 1),
+                shared_zone_seconds=round(shared * SPACING_INTERVAL, 2),
+            )
+    return spacing
+
+
+class SpacingHandler(FrameHandler):
+    """Tracks how far each player kept from their nearest teammate, and how
+    long they shared a zone (see _ZONE_BOUNDARY) with one.
+
+    Positions are only collected during the frame loop; the pairwise work is
+    done once in finalize, on a common timeline (see SPACING_INTERVAL).
+    """
+
+    needs = (
+        SharedState.PLAYING
+        | SharedState.CARS
+        | SharedState.CAR_LINKS
+        | SharedState.IDENTITIES
+        | SharedState.TEAMS
+    )
+
+    @classmethod
+    def create(cls, obj_ids: dict[str, int | None]) -> "SpacingHandler | None":
+        if obj_ids.get("TAGame.RBActor_TA:ReplicatedRBState") is None:
+            return None
+        return cls()
+
+    def __init__(self) -> None:
+        self.car_tracks: dict[int, _PositionTrack] = {}
+        self.identity_tracks: dict[tuple[str, str], _PositionTrack] = {}
+        self.identity_team: dict[tuple[str, str], int] = {}
+
+    def _flush_car(self, ctx: FrameContext, car_id: int) -> None:
+        track = self.car_tracks.pop(car_id, None)
+        if not track:
+            return
+        identity = ctx.resolver.resolve_car(car_id)
+        team = ctx.actor_team.get(car_id)
+        if identity is None or team is None:
+            return
+        self.identity_team[identity] = team
+        self.identity_tracks.setdefault(identity, _PositionTrack()).extend(track)
+
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if not ctx.is_playing or aid not in ctx.car_actors:
+            return
+        track = self.car_tracks.get(aid)
+        if track is None:
+            track = self.car_tracks[aid] = _PositionTrack()
+        track.append(ctx.frame_time, rb.location.x, rb.location.y)
+
+    def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
+        self._flush_car(ctx, aid)
+
+    def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
+        for car_id in list(self.car_tracks):
+            self._flush_car(ctx, car_id)
+        if not self.identity_tracks:
+            return
+        # Tracks were joined car by car in flush order, not time order
+        identity_tracks = {
+            identity: track.sorted_by_time()
+            for identity, track in self.identity_tracks.items()
+        }
+        start = min(track.times[0] for track in identity_tracks.values())
+        end = max(track.times[-1] for track in identity_tracks.values())
+        n_ticks = int((end - start) / SPACING_INTERVAL) + 1
+        ticks = [start + i * SPACING_INTERVAL for i in range(n_ticks)]
+        for team in (0, 1):
+            tracks = {
+                identity: track
+                for identity, track in identity_tracks.items()
+                if self.identity_team[identity] == team
+            }
+            if len(tracks) > 1:
+                result.player_spacing.update(_team_spacing(tracks, ticks))
+
+
 class DemolitionsHandler(FrameHandler):
     """Tracks per-player demolitions-dealt count via the PRI counter."""
 
+    needs = SharedState.IDENTITIES
+
     @classmethod
     def create(cls, obj_ids: dict[str, int | None]) -> "DemolitionsHandler | None":
-        demo_obj_id = obj_ids.get("TAGame.PRI_TA:MatchDemolishes")
-        if demo_obj_id is None:
+        if obj_ids.get("TAGame.PRI_TA:MatchDemolishes") is None:
             return None
-        return cls(demo_obj_id)
+        return cls()
 
-    def __init__(self, demo_obj_id: int) -> None:
-        self.update_obj_ids = frozenset({demo_obj_id})
+    def __init__(self) -> None:
         self.actor_demos: dict[int, int] = {}
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        val = actor.get("attribute", {}).get("Int", 0)
-        aid = actor["actor_id"]
-        self.actor_demos[aid] = max(self.actor_demos.get(aid, 0), val)
+    def on_stat_counter(
+        self, ctx: FrameContext, aid: int, stat: str, prev: int, value: int
+    ) -> None:
+        if stat == "demo":
+            self.actor_demos[aid] = max(self.actor_demos.get(aid, 0), value)
 
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
         for aid, count in self.actor_demos.items():
@@ -509,36 +1291,23 @@ class DemolitionsHandler(FrameHandler):
 class DemosReceivedHandler(FrameHandler):
     """Tracks per-player demolitions-received count via DemolishExtended events."""
 
+    needs = SharedState.CARS | SharedState.CAR_LINKS | SharedState.IDENTITIES
+
     @classmethod
     def create(cls, obj_ids: dict[str, int | None]) -> "DemosReceivedHandler | None":
-        demolish_obj_id = obj_ids.get("TAGame.Car_TA:ReplicatedDemolishExtended")
-        if demolish_obj_id is None:
+        if obj_ids.get("TAGame.Car_TA:ReplicatedDemolishExtended") is None:
             return None
-        return cls(demolish_obj_id)
+        return cls()
 
-    def __init__(self, demolish_obj_id: int) -> None:
-        self.update_obj_ids = frozenset({demolish_obj_id})
+    def __init__(self) -> None:
         self.demos_received: dict[tuple[str, str], int] = {}
-        self.demolish_last_active: dict[int, bool] = {}
 
-    def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
-        self.demolish_last_active.pop(aid, None)
-
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        demolish = actor.get("attribute", {}).get("DemolishExtended", {})
-        victim = demolish.get("victim", {})
-        currently_active = bool(victim.get("active"))
-        was_active = self.demolish_last_active.get(actor["actor_id"], False)
-        self.demolish_last_active[actor["actor_id"]] = currently_active
-        # Rising-edge only: skip unless transitioning from inactive → active
-        if not currently_active or was_active:
+    def on_demolish(self, ctx: FrameContext, demolish: Demolish) -> None:
+        if demolish.self_demolish:
             return
-        if demolish.get("self_demolish"):
+        if not demolish.attacker_active:
             return
-        attacker = demolish.get("attacker", {})
-        if not attacker.get("active"):
-            return
-        vid = victim["actor"]
+        vid = demolish.victim
         victim_identity = (
             ctx.resolver.resolve_car(vid) if vid in ctx.car_actors else None
         )
@@ -554,51 +1323,31 @@ class DemosReceivedHandler(FrameHandler):
 class BoostStatsHandler(FrameHandler):
     """Tracks team-level boost collected and stolen totals from pickup events."""
 
+    version = 3  # small pads snap to their known position too
+    needs = SharedState.TEAMS | SharedState.POSITIONS
+
     @classmethod
     def create(
         cls,
         obj_ids: dict[str, int | None],
         tracked_team: int | None,
-        big_pads: Sequence[tuple[float, float]],
     ) -> "BoostStatsHandler | None":
         if tracked_team is None:
             return None
-        pickup_obj_id = obj_ids.get("TAGame.VehiclePickup_TA:NewReplicatedPickupData")
-        if pickup_obj_id is None:
+        if obj_ids.get("TAGame.VehiclePickup_TA:NewReplicatedPickupData") is None:
             return None
-        return cls(pickup_obj_id, tracked_team, big_pads)
+        return cls(tracked_team)
 
-    def __init__(
-        self,
-        pickup_obj_id: int,
-        tracked_team: int,
-        big_pads: Sequence[tuple[float, float]],
-    ) -> None:
-        self.update_obj_ids = frozenset({pickup_obj_id})
+    def __init__(self, tracked_team: int) -> None:
         self.tracked_team = tracked_team
-        self.big_pads = big_pads
-        self.last_pickup_state: dict[int, int] = {}
         self.collected = {0: 0, 1: 0}
         self.stolen = {0: 0, 1: 0}
 
-    def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
-        self.last_pickup_state.pop(aid, None)
-
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        result = _parse_pickup(
-            actor,
-            self.last_pickup_state,
-            ctx.actor_team,
-            ctx.actor_position,
-            self.big_pads,
-        )
-        if result is None:
-            return
-        _, team, is_big, is_stolen = result
-        boost_value = 100 if is_big else 12
-        self.collected[team] += boost_value
-        if is_stolen:
-            self.stolen[team] += boost_value
+    def on_pickup(self, ctx: FrameContext, pickup: PadPickup) -> None:
+        boost_value = 100 if pickup.is_big else 12
+        self.collected[pickup.team] += boost_value
+        if pickup.is_stolen:
+            self.stolen[pickup.team] += boost_value
 
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
         if self.collected[0] == 0 and self.collected[1] == 0:
@@ -613,12 +1362,14 @@ class BoostStatsHandler(FrameHandler):
 class MovementHandler(FrameHandler):
     """Tracks per-player movement stats (boost consumed, speed, pad pickups)."""
 
+    version = 3  # small pads snap to their known position too
+    needs = SharedState.ALL & ~(SharedState.BALLS | SharedState.GAME_CLOCK)
+
     @classmethod
     def create(
         cls,
         obj_ids: dict[str, int | None],
         duration: int | None,
-        big_pads: Sequence[tuple[float, float]],
     ) -> "MovementHandler | None":
         if not duration or duration <= 0:
             return None
@@ -627,32 +1378,21 @@ class MovementHandler(FrameHandler):
         pickup_obj_id = obj_ids.get("TAGame.VehiclePickup_TA:NewReplicatedPickupData")
         if rb_obj_id is None or boost_obj_id is None or pickup_obj_id is None:
             return None
-        return cls(rb_obj_id, boost_obj_id, pickup_obj_id, duration, big_pads)
+        return cls(boost_obj_id, duration)
 
-    def __init__(
-        self,
-        rb_obj_id: int,
-        boost_obj_id: int,
-        pickup_obj_id: int,
-        duration: int,
-        big_pads: Sequence[tuple[float, float]],
-    ) -> None:
-        self.update_obj_ids = frozenset({rb_obj_id, boost_obj_id, pickup_obj_id})
-        self.rb_obj_id = rb_obj_id
+    def __init__(self, boost_obj_id: int, duration: int) -> None:
+        # Rigid bodies and pickups arrive through the shared streams
         self.boost_obj_id = boost_obj_id
-        self.pickup_obj_id = pickup_obj_id
         self.duration = duration
-        self.big_pads = big_pads
 
         # Per boost-component state
         self.comp_boost: dict[int, int] = {}
         self.comp_boost_consumed: dict[int, float] = {}
-        self.car_speed_samples: dict[int, list[tuple[float, float]]] = {}
+        self.car_speed_samples: dict[int, SampleSeries] = {}
         self.identity_pads: dict[tuple[str, str], dict[str, int]] = {}
-        self.last_pickup_state: dict[int, int] = {}
 
         self.identity_boost_consumed: dict[tuple[str, str], float] = {}
-        self.identity_speeds: dict[tuple[str, str], list[tuple[float, float]]] = {}
+        self.identity_speeds: dict[tuple[str, str], SampleSeries] = {}
 
     def _flush_boost_comp(
         self, ctx: FrameContext, comp_id: int, consumed: float
@@ -664,15 +1404,14 @@ class MovementHandler(FrameHandler):
             )
 
     def _flush_speed_samples(
-        self, ctx: FrameContext, car_id: int, samples: list[tuple[float, float]]
+        self, ctx: FrameContext, car_id: int, samples: SampleSeries
     ) -> None:
         identity = ctx.resolver.resolve_car(car_id)
         if identity:
-            self.identity_speeds.setdefault(identity, []).extend(samples)
+            self.identity_speeds.setdefault(identity, SampleSeries()).extend(samples)
 
     def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
         self.comp_boost.pop(aid, None)
-        self.last_pickup_state.pop(aid, None)
         consumed = self.comp_boost_consumed.pop(aid, None)
         if consumed:
             self._flush_boost_comp(ctx, aid, consumed)
@@ -680,69 +1419,56 @@ class MovementHandler(FrameHandler):
         if samples:
             self._flush_speed_samples(ctx, aid, samples)
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        oid = actor.get("object_id")
-        aid = actor["actor_id"]
+    def update_routes(self) -> dict[int, UpdateCallback]:
+        return {self.boost_obj_id: self._on_boost}
 
-        if oid == self.boost_obj_id and ctx.is_playing and aid in ctx.boost_comp_actors:
-            amount = (
-                actor.get("attribute", {})
-                .get("ReplicatedBoost", {})
-                .get("boost_amount")
-            )
-            if amount is None:
-                return
-            prev = self.comp_boost.get(aid)
-            self.comp_boost[aid] = amount
-            if prev is not None and amount < prev:
-                self.comp_boost_consumed[aid] = self.comp_boost_consumed.get(
-                    aid, 0.0
-                ) + (prev - amount)
-
-        elif oid == self.rb_obj_id:
-            if aid in ctx.car_actors and ctx.is_playing:
-                lv = (
-                    actor.get("attribute", {})
-                    .get("RigidBody", {})
-                    .get("linear_velocity")
-                )
-                if lv is not None and "x" in lv and "y" in lv and "z" in lv:
-                    speed = math.sqrt(lv["x"] ** 2 + lv["y"] ** 2 + lv["z"] ** 2)
-                    if aid not in self.car_speed_samples:
-                        self.car_speed_samples[aid] = []
-                    self.car_speed_samples[aid].append((ctx.frame_time, speed))
-
-        elif oid == self.pickup_obj_id and ctx.is_playing:
-            result = _parse_pickup(
-                actor,
-                self.last_pickup_state,
-                ctx.actor_team,
-                ctx.actor_position,
-                self.big_pads,
-            )
-            if result is None:
-                return
-            instigator, _, is_big, is_stolen = result
-            identity = ctx.resolver.resolve_car(instigator)
-            if identity is None:
-                return
-            pads = self.identity_pads.setdefault(
-                identity,
-                {
-                    "small_pads": 0,
-                    "large_pads": 0,
-                    "stolen_small_pads": 0,
-                    "stolen_large_pads": 0,
-                },
+    def _on_boost(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        aid = actor.actor_id
+        if not ctx.is_playing or aid not in ctx.boost_comp_actors:
+            return
+        amount = actor.value
+        if not isinstance(amount, int):
+            return
+        prev = self.comp_boost.get(aid)
+        self.comp_boost[aid] = amount
+        if prev is not None and amount < prev:
+            self.comp_boost_consumed[aid] = self.comp_boost_consumed.get(aid, 0.0) + (
+                prev - amount
             )
-            if is_big:
-                pads["large_pads"] += 1
-                if is_stolen:
-                    pads["stolen_large_pads"] += 1
-            else:
-                pads["small_pads"] += 1
-                if is_stolen:
-                    pads["stolen_small_pads"] += 1
+
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if aid not in ctx.car_actors or not ctx.is_playing:
+            return
+        lv = rb.linear_velocity
+        if lv is not None:
+            speed = math.sqrt(lv.x**2 + lv.y**2 + lv.z**2)
+            if aid not in self.car_speed_samples:
+                self.car_speed_samples[aid] = SampleSeries()
+            self.car_speed_samples[aid].append(ctx.frame_time, speed)
+
+    def on_pickup(self, ctx: FrameContext, pickup: PadPickup) -> None:
+        if not ctx.is_playing:
+            return
+        identity = ctx.resolver.resolve_car(pickup.instigator)
+        if identity is None:
+            return
+        pads = self.identity_pads.setdefault(
+            identity,
+            {
+                "small_pads": 0,
+                "large_pads": 0,
+                "stolen_small_pads": 0,
+                "stolen_large_pads": 0,
+            },
+        )
+        if pickup.is_big:
+            pads["large_pads"] += 1
+            if pickup.is_stolen:
+                pads["stolen_large_pads"] += 1
+        else:
+            pads["small_pads"] += 1
+            if pickup.is_stolen:
+                pads["stolen_small_pads"] += 1
 
     def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
         # Deleted-actor data already accumulated; handle remaining live actors
@@ -762,13 +1488,14 @@ class MovementHandler(FrameHandler):
             consumed = self.identity_boost_consumed.get(identity, 0.0)
             boost_per_minute = round((consumed / 255 * 100) / (self.duration / 60), 1)
 
-            speeds = self.identity_speeds.get(identity, [])
+            speeds = self.identity_speeds.get(identity)
             if speeds:
-                speeds.sort(key=lambda s: s[0])
+                speeds = speeds.sorted_by_time()
+                times, values = speeds.times, speeds.values
                 total_weight = 0.0
                 weighted_sum = 0.0
                 supersonic_time = 0.0
-                for (t1, s1), (t2, _) in pairwise(speeds):
+                for t1, t2, s1 in zip(times, times[1:], values, strict=False):
                     dt = t2 - t1
                     if (
                         0 < dt < 5
@@ -801,13 +1528,7 @@ class MatchEventsHandler(FrameHandler):
     """Extracts per-event match events (goals, shots, saves, demos, assists)
     with game-clock-anchored timestamps."""
 
-    _COUNTER_NAMES = {
-        "TAGame.PRI_TA:MatchGoals": "goal",
-        "TAGame.PRI_TA:MatchShots": "shot",
-        "TAGame.PRI_TA:MatchSaves": "save",
-        "TAGame.PRI_TA:MatchDemolishes": "demo",
-        "TAGame.PRI_TA:MatchAssists": "assist",
-    }
+    needs = SharedState.IDENTITIES | SharedState.GAME_CLOCK
 
     @classmethod
     def create(
@@ -822,88 +1543,46 @@ class MatchEventsHandler(FrameHandler):
         team_obj_id = obj_ids.get("Engine.PlayerReplicationInfo:Team")
         if sr_obj_id is None or team_obj_id is None:
             return None
-        counter_obj_ids: dict[int, str] = {}
-        for obj_name, event_type in cls._COUNTER_NAMES.items():
-            oid = obj_ids.get(obj_name)
-            if oid is not None:
-                counter_obj_ids[oid] = event_type
-        if not counter_obj_ids:
+        if all(obj_ids.get(name) is None for name in STAT_COUNTERS):
             return None
-        return cls(
-            sr_obj_id, team_obj_id, counter_obj_ids, tracked_team, tracked_identities
-        )
+        return cls(team_obj_id, tracked_team, tracked_identities)
 
     def __init__(
         self,
-        sr_obj_id: int,
         team_obj_id: int,
-        counter_obj_ids: dict[int, str],
         tracked_team: int,
         tracked_identities: set[tuple[str, str]],
     ) -> None:
-        self.update_obj_ids = frozenset(
-            {sr_obj_id, team_obj_id} | set(counter_obj_ids.keys())
-        )
-        self.sr_obj_id = sr_obj_id
+        # SecondsRemaining feeds ctx.game_clock, and the scoreboard counters
+        # arrive through on_stat_counter
         self.team_obj_id = team_obj_id
-        self.counter_obj_ids = counter_obj_ids
         self.tracked_team = tracked_team
         self.tracked_identities = tracked_identities
 
-        self.clock_updates: list[tuple[float, int]] = []
         self.actor_team_actor: dict[int, int] = {}
-        self.actor_counters: dict[int, dict[str, int]] = {}
-        self.raw_events: list[tuple[str, float, int]] = []
-
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        obj_id = actor.get("object_id")
-        aid = actor["actor_id"]
-
-        if obj_id == self.sr_obj_id:
-            sr = actor.get("attribute", {}).get("Int")
-            if sr is not None:
-                self.clock_updates.append((ctx.frame_time, sr))
-        elif obj_id == self.team_obj_id:
-            team_actor = actor.get("attribute", {}).get("ActiveActor", {}).get("actor")
-            if team_actor is not None:
-                self.actor_team_actor[aid] = team_actor
-        elif obj_id in self.counter_obj_ids:
-            event_type = self.counter_obj_ids[obj_id]
-            val = actor.get("attribute", {}).get("Int", 0)
-            if aid not in self.actor_counters:
-                self.actor_counters[aid] = {}
-            prev = self.actor_counters[aid].get(event_type, 0)
-            if val > prev:
-                for _ in range(val - prev):
-                    self.raw_events.append((event_type, ctx.frame_time, aid))
-            self.actor_counters[aid][event_type] = val
+        # One entry per counter increment, column-wise
+        self.event_stats: list[str] = []
+        self.event_times = array("d")
+        self.event_pris = array("q")
 
-    def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
-        if not self.clock_updates or not self.raw_events:
-            return
+    def update_routes(self) -> dict[int, UpdateCallback]:
+        return {self.team_obj_id: self._on_team}
 
-        game_start = self.clock_updates[0][1]
-
-        # Regulation: clock counts down (game_start - sr → monotonically increasing game time).
-        # Overtime: clock resets to 0 then counts up; seen_zero marks when regulation ended.
-        seen_zero = False
-        clock_game_seconds: list[tuple[float, float]] = []
-        for c_ft, sr in self.clock_updates:
-            if sr == 0:
-                seen_zero = True
-            if seen_zero and sr > 0:
-                clock_game_seconds.append((c_ft, game_start + sr))
-            else:
-                clock_game_seconds.append((c_ft, game_start - sr))
+    def _on_team(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        if isinstance(actor.value, int):
+            self.actor_team_actor[actor.actor_id] = actor.value
+
+    def on_stat_counter(
+        self, ctx: FrameContext, aid: int, stat: str, prev: int, value: int
+    ) -> None:
+        for _ in range(value - prev):
+            self.event_stats.append(stat)
+            self.event_times.append(ctx.frame_time)
+            self.event_pris.append(aid)
 
-        def frame_to_game_seconds(ft: float) -> float:
-            _, best_gs = clock_game_seconds[0]
-            for c_ft, c_gs in clock_game_seconds:
-                if c_ft <= ft:
-                    best_gs = c_gs
-                else:
-                    break
-            return best_gs
+    def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
+        if not ctx.game_clock or not self.event_stats:
+            return
 
         tracked_team_actor = None
         for aid in ctx.resolver.find_pri_ids_for(self.tracked_identities):
@@ -924,17 +1603,116 @@ class MatchEventsHandler(FrameHandler):
                 else (1 - self.tracked_team)
             )
 
-        for event_type, ft, aid in self.raw_events:
+        for event_type, ft, aid in zip(
+            self.event_stats, self.event_times, self.event_pris, strict=True
+        ):
             identity = ctx.resolver.resolve_pri(aid)
             team = resolve_team(aid)
             if identity is None or team is None:
                 continue
-            gs = frame_to_game_seconds(ft)
+            gs = ctx.game_clock.game_seconds(ft)
             result.match_events.append(
                 MatchEvent(event_type, gs, PlayerIdentity(*identity), team)
             )
 
 
+# Seconds of car and ball movement kept before each goal, sampled at most
+# every GOAL_CONTEXT_INTERVAL per actor (network updates arrive at ~30 Hz).
+GOAL_CONTEXT_SECONDS = 3.0
+GOAL_CONTEXT_INTERVAL = 0.1
+_GOAL_CONTEXT_ROWS = round(GOAL_CONTEXT_SECONDS / GOAL_CONTEXT_INTERVAL) + 1
+
+
+class GoalContextHandler(FrameHandler):
+    """Snapshots where every car and the ball were before each goal.
+
+    Each car and ball keeps its last GOAL_CONTEXT_SECONDS of samples in a
+    RingBuffer (time, x, y, z, speed), copied out when ReplicatedScoredOnTeam
+    reports a goal, so memory doesn't grow with the replay.
+    """
+
+    needs = (
+        SharedState.CARS
+        | SharedState.BALLS
+        | SharedState.CAR_LINKS
+        | SharedState.IDENTITIES
+        | SharedState.TEAMS
+        | SharedState.GAME_CLOCK
+    )
+
+    @classmethod
+    def create(cls, obj_ids: dict[str, int | None]) -> "GoalContextHandler | None":
+        rb_obj_id = obj_ids.get("TAGame.RBActor_TA:ReplicatedRBState")
+        scored_obj_id = obj_ids.get("TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam")
+        if rb_obj_id is None or scored_obj_id is None:
+            return None
+        return cls(scored_obj_id)
+
+    def __init__(self, scored_obj_id: int) -> None:
+        self.scored_obj_id = scored_obj_id
+        self.buffers: dict[int, RingBuffer] = {}
+        # (frame time, scoring team, ball, cars) per goal
+        self.goals: list[
+            tuple[float, int, tuple[TrajectorySample, ...], tuple[CarTrajectory, ...]]
+        ] = []
+
+    def update_routes(self) -> dict[int, UpdateCallback]:
+        return {self.scored_obj_id: self._on_scored}
+
+    def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+        if aid not in ctx.car_actors and aid not in ctx.ball_actors:
+            return
+        buffer = self.buffers.get(aid)
+        if buffer is None:
+            buffer = self.buffers[aid] = RingBuffer(_GOAL_CONTEXT_ROWS, 5)
+        last = buffer.last()
+        if last is not None and ctx.frame_time - last[0] < GOAL_CONTEXT_INTERVAL:
+            return
+        loc, vel = rb.location, rb.linear_velocity
+        speed = math.hypot(vel.x, vel.y, vel.z) if vel is not None else 0.0
+        buffer.push(ctx.frame_time, loc.x, loc.y, loc.z, speed)
+
+    def _trajectory(self, ctx: FrameContext, aid: int) -> tuple[TrajectorySample, ...]:
+        since = ctx.frame_time - GOAL_CONTEXT_SECONDS
+        return tuple(
+            TrajectorySample(round(t - ctx.frame_time, 2), x, y, z, speed)
+            for t, x, y, z, speed in self.buffers[aid].rows()
+            if t >= since
+        )
+
+    def _on_scored(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        if actor.value not in (0, 1):
+            return
+        ball: tuple[TrajectorySample, ...] = ()
+        cars: list[CarTrajectory] = []
+        for aid in self.buffers:
+            if aid in ctx.ball_actors:
+                ball = self._trajectory(ctx, aid)
+                continue
+            identity = ctx.resolver.resolve_car(aid)
+            team = ctx.actor_team.get(aid)
+            if identity is None or team is None:
+                continue
+            cars.append(
+                CarTrajectory(
+                    PlayerIdentity(*identity), team, self._trajectory(ctx, aid)
+                )
+            )
+        scoring_team = 1 - cast(int, actor.value)
+        self.goals.append((ctx.frame_time, scoring_team, ball, tuple(cars)))
+
+    def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
+        self.buffers.pop(aid, None)
+
+    def finalize(self, ctx: FrameContext, result: FrameAnalysis) -> None:
+        if not ctx.game_clock:
+            return
+        result.goal_snapshots = [
+            GoalSnapshot(ctx.game_clock.game_seconds(ft), team, ball, cars)
+            for ft, team, ball, cars in self.goals
+        ]
+
+
 # -- Orchestrator --
 
 
@@ -952,27 +1730,378 @@ class _FrameLoopObjectIds:
     uid_obj_id: int | None
     team_paint_obj_id: int | None
     rb_obj_id: int | None
+    seconds_remaining_obj_id: int | None = None
+    # Decoded once per update for the on_pickup/on_demolish/on_stat_counter
+    # streams (see _build_update_routes)
+    pickup_obj_id: int | None = None
+    demolish_obj_id: int | None = None
+    stat_counter_obj_ids: tuple[tuple[int, str], ...] = ()
+
+    @property
+    def spawn_oids(self) -> frozenset[int]:
+        """Archetypes whose spawns _process_frame registers."""
+        oids = (self.car_archetype, self.ball_archetype, self.boost_comp_archetype)
+        return frozenset(oid for oid in oids if oid is not None)
+
+    def spawns_for(self, needs: SharedState) -> "_FrameLoopObjectIds":
+        """Copy without the archetypes whose actor sets nothing needs."""
+        return replace(
+            self,
+            car_archetype=self.car_archetype if SharedState.CARS in needs else None,
+            ball_archetype=self.ball_archetype if SharedState.BALLS in needs else None,
+            boost_comp_archetype=(
+                self.boost_comp_archetype
+                if SharedState.BOOST_COMPONENTS in needs
+                else None
+            ),
+        )
+
+
+def _shared_state_needed(handlers: Iterable[FrameHandler]) -> SharedState:
+    needs = SharedState(0)
+    for h in handlers:
+        needs |= h.needs
+    return needs
+
+
+def project_frames(
+    frames: Iterable[Frame],
+    spawn_oids: Container[int],
+    update_oids: Container[int],
+) -> Iterator[Frame]:
+    """Compact frames down to the spawns, updates and deletions that are read.
+
+    Spawns are kept for spawn_oids and updates for update_oids. A deletion is
+    kept only for an actor one of those introduced, since no other actor can
+    have left state behind. Frames left empty are dropped, except the last:
+    its time marks the end of the replay.
+    """
+    live: set[int] = set()
+    skipped: Frame | None = None
+    for frame in frames:
+        new_actors = [a for a in frame.new_actors if a.object_id in spawn_oids]
+        updated_actors = [a for a in frame.updated_actors if a.object_id in update_oids]
+        live.update(a.actor_id for a in new_actors)
+        live.update(a.actor_id for a in updated_actors)
+        deleted_actors = [aid for aid in frame.deleted_actors if aid in live]
+        live.difference_update(deleted_actors)
+        if new_actors or updated_actors or deleted_actors:
+            yield Frame(frame.time, new_actors, updated_actors, deleted_actors)
+            skipped = None
+        else:
+            skipped = frame
+    if skipped is not None:
+        yield Frame(skipped.time, [], [], [])
+
+
+# Shared FrameContext state updates, one per _FrameLoopObjectIds attribute.
+
+
+def _on_scored(ctx: FrameContext, actor: ActorUpdate) -> None:
+    if actor.value in (0, 1):
+        ctx.is_playing = False
+
+
+def _on_countdown(ctx: FrameContext, actor: ActorUpdate) -> None:
+    if actor.value == 0:
+        ctx.is_playing = True
+
+
+def _on_vehicle(ctx: FrameContext, actor: ActorUpdate) -> None:
+    value = actor.value
+    if isinstance(value, int) and value >= 0:
+        ctx.resolver.link_component_to_car(actor.actor_id, value)
+
+
+def _on_pri(ctx: FrameContext, actor: ActorUpdate) -> None:
+    aid, _, value = actor
+    if isinstance(value, int) and value >= 0 and aid in ctx.car_actors:
+        ctx.resolver.link_car_to_pri(aid, value)
+
+
+def _on_unique_id(ctx: FrameContext, actor: ActorUpdate) -> None:
+    value = actor.value
+    identity = from_network_frame(value) if isinstance(value, dict) else None
+    if identity:
+        ctx.resolver.set_identity(actor.actor_id, *identity)
+
+
+def _on_team_paint(ctx: FrameContext, actor: ActorUpdate) -> None:
+    if isinstance(actor.value, int):
+        ctx.actor_team[actor.actor_id] = actor.value
+
+
+def _on_seconds_remaining(ctx: FrameContext, actor: ActorUpdate) -> None:
+    if isinstance(actor.value, int):
+        ctx.game_clock.append(ctx.frame_time, actor.value)
+
+
+def _on_position(ctx: FrameContext, actor: ActorUpdate) -> None:
+    rb = actor.value
+    if isinstance(rb, RigidBody):
+        ctx.actor_position.set(actor.actor_id, rb.location.x, rb.location.y)
+
+
+@dataclass(slots=True)
+class HookTiming:
+    calls: int = 0
+    seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class FrameProfile:
+    """Opt-in timings for analyze_frames, to see where the frame loop goes.
+
+    hooks maps (owner, hook) to its timing, where owner is a handler class
+    name or "shared state" for FrameContext upkeep. Update-phase work is
+    timed per route callback, so a handler's decoded-stream hooks (on_pickup
+    etc.) show up under their own names; decoding them is left in the
+    remainder of the loop time. updates_by_object counts every actor update
+    in the replay by object name, including ones nothing reads.
+    """
+
+    hooks: dict[tuple[str, str], HookTiming] = field(default_factory=dict)
+    updates_by_object: Counter[str] = field(default_factory=Counter)
+    frames: int = 0
+    loop_seconds: float = 0.0
+
+    def timed[**P](
+        self, owner: str, hook: str, fn: Callable[P, None]
+    ) -> Callable[P, None]:
+        """Wrap fn so that its calls are added to hooks[owner, hook]."""
+        timing = self.hooks.setdefault((owner, hook), HookTiming())
+        clock = time.perf_counter
+
+        def timed_fn(*args: P.args, **kwargs: P.kwargs) -> None:
+            start = clock()
+            fn(*args, **kwargs)
+            timing.seconds += clock() - start
+            timing.calls += 1
+
+        return timed_fn
+
+    def count_updates(
+        self, frames: Iterable[Frame], object_index: Mapping[str, int]
+    ) -> Iterator[Frame]:
+        names = {oid: name for name, oid in object_index.items()}
+        counts = self.updates_by_object
+        for frame in frames:
+            self.frames += 1
+            for actor in frame.updated_actors:
+                oid = actor.object_id
+                counts[names.get(oid, str(oid))] += 1  # pyright: ignore[reportArgumentType]
+            yield frame
+
+    def report(self) -> list[str]:
+        lines = [
+            f"{self.frames} frames, frame loop {self.loop_seconds * 1000:.1f} ms",
+            f"{'handler':<24} {'hook':<22} {'calls':>9} {'ms':>9} {'us/call':>8}",
+        ]
+        for (owner, hook), t in sorted(
+            self.hooks.items(), key=lambda item: -item[1].seconds
+        ):
+            per_call = t.seconds / t.calls * 1e6 if t.calls else 0.0
+            lines.append(
+                f"{owner:<24} {hook:<22} {t.calls:>9} "
+                f"{t.seconds * 1000:>9.1f} {per_call:>8.2f}"
+            )
+        lines.append("updates by object:")
+        lines.extend(
+            f"  {count:>9}  {name}"
+            for name, count in self.updates_by_object.most_common()
+        )
+        return lines
+
+
+def _chain_callbacks(callbacks: list[UpdateCallback]) -> UpdateCallback:
+    if len(callbacks) == 1:
+        return callbacks[0]
+    chained = tuple(callbacks)
+
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        for callback in chained:
+            callback(ctx, actor)
+
+    return route
+
+
+# Decoded event streams: each decodes an update once and fans the result out
+# to every subscribed handler.
+
+
+def _rigid_body_stream(
+    subscribers: list[Callable[[FrameContext, int, RigidBody], None]],
+    min_interval: float = 0.0,
+) -> UpdateCallback:
+    """Deliver rigid bodies, at most one per actor every min_interval seconds."""
+
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        rb = actor.value
+        if not isinstance(rb, RigidBody):
+            return
+        aid = actor.actor_id
+        if min_interval:
+            last = ctx.rigid_body_sampled_at.get(aid)
+            if last is not None and ctx.frame_time - last < min_interval:
+                return
+            ctx.rigid_body_sampled_at[aid] = ctx.frame_time
+        for subscriber in subscribers:
+            subscriber(ctx, aid, rb)
+
+    return route
+
+
+def _pickup_stream(
+    subscribers: list[Callable[[FrameContext, PadPickup], None]],
+    big_pads: Sequence[tuple[float, float]],
+    small_pads: Sequence[tuple[float, float]] = (),
+) -> UpdateCallback:
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        pickup = _decode_pickup(ctx, actor, big_pads, small_pads)
+        if pickup is not None:
+            for subscriber in subscribers:
+                subscriber(ctx, pickup)
+
+    return route
+
+
+def _demolish_stream(
+    subscribers: list[Callable[[FrameContext, Demolish], None]],
+) -> UpdateCallback:
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        demolish = _decode_demolish(ctx, actor)
+        if demolish is not None:
+            for subscriber in subscribers:
+                subscriber(ctx, demolish)
+
+    return route
+
+
+def _stat_counter_stream(
+    subscribers: list[Callable[[FrameContext, int, str, int, int], None]],
+    stat: str,
+) -> UpdateCallback:
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        prev, value = _decode_stat_counter(ctx, actor)
+        if value != prev:
+            for subscriber in subscribers:
+                subscriber(ctx, actor.actor_id, stat, prev, value)
+
+    return route
+
+
+def _subscribers[T](
+    handlers: Iterable[FrameHandler], hook: str, profile: FrameProfile | None = None
+) -> list[T]:
+    """Bound ``hook`` methods of the handlers that override it."""
+    default = getattr(FrameHandler, hook)
+    bound = [
+        (type(h).__name__, getattr(h, hook))
+        for h in handlers
+        if getattr(type(h), hook) is not default
+    ]
+    if profile is None:
+        return [fn for _, fn in bound]
+    return [cast(T, profile.timed(owner, hook, fn)) for owner, fn in bound]
+
+
+def _build_update_routes(
+    obj_ids: _FrameLoopObjectIds,
+    handlers: Iterable[FrameHandler],
+    big_pads: Sequence[tuple[float, float]] = BIG_PAD_POSITIONS["standard"],
+    small_pads: Sequence[tuple[float, float]] = SMALL_PAD_POSITIONS["standard"],
+    rigid_body_interval: float = 0.0,
+    profile: FrameProfile | None = None,
+) -> dict[int, UpdateCallback]:
+    """One callback per object ID for the frame loop to call directly.
+
+    Shared-state updates come first in each route, then the decoded event
+    streams, then handlers' own routes in order, so handlers see FrameContext
+    already updated for the frame. Shared state no handler needs is skipped.
+
+    rigid_body_interval decimates only the on_rigid_body stream;
+    ctx.actor_position stays exact so pickups are still classified from
+    every update. With a profile, every handler hook and shared-state
+    callback is timed.
+    """
+    handlers = list(handlers)
+    needs = _shared_state_needed(handlers)
+    callbacks: dict[int, list[UpdateCallback]] = {}
+    shared = (
+        (obj_ids.scored_obj_id, _on_scored, SharedState.PLAYING),
+        (obj_ids.countdown_obj_id, _on_countdown, SharedState.PLAYING),
+        (obj_ids.vehicle_obj_id, _on_vehicle, SharedState.COMPONENT_LINKS),
+        (obj_ids.pri_obj_id, _on_pri, SharedState.CAR_LINKS),
+        (obj_ids.uid_obj_id, _on_unique_id, SharedState.IDENTITIES),
+        (obj_ids.team_paint_obj_id, _on_team_paint, SharedState.TEAMS),
+        (obj_ids.rb_obj_id, _on_position, SharedState.POSITIONS),
+        (
+            obj_ids.seconds_remaining_obj_id,
+            _on_seconds_remaining,
+            SharedState.GAME_CLOCK,
+        ),
+    )
+    for oid, callback, state in shared:
+        if oid is not None and state in needs:
+            if profile is not None:
+                name = callback.__name__.removeprefix("_")
+                callback = profile.timed("shared state", name, callback)
+            callbacks.setdefault(oid, []).append(callback)
+
+    streams: list[tuple[int | None, UpdateCallback]] = []
+    if rb_subscribers := _subscribers(handlers, "on_rigid_body", profile):
+        streams.append(
+            (
+                obj_ids.rb_obj_id,
+                _rigid_body_stream(rb_subscribers, rigid_body_interval),
+            )
+        )
+    if pickup_subscribers := _subscribers(handlers, "on_pickup", profile):
+        streams.append(
+            (
+                obj_ids.pickup_obj_id,
+                _pickup_stream(pickup_subscribers, big_pads, small_pads),
+            )
+        )
+    if demolish_subscribers := _subscribers(handlers, "on_demolish", profile):
+        streams.append(
+            (obj_ids.demolish_obj_id, _demolish_stream(demolish_subscribers))
+        )
+    if counter_subscribers := _subscribers(handlers, "on_stat_counter", profile):
+        streams.extend(
+            (oid, _stat_counter_stream(counter_subscribers, stat))
+            for oid, stat in obj_ids.stat_counter_obj_ids
+        )
+    for oid, callback in streams:
+        if oid is not None:
+            callbacks.setdefault(oid, []).append(callback)
+
+    for h in handlers:
+        for oid, callback in h.update_routes().items():
+            if profile is not None:
+                callback = profile.timed(type(h).__name__, callback.__name__, callback)
+            callbacks.setdefault(oid, []).append(callback)
+    return {oid: _chain_callbacks(cbs) for oid, cbs in callbacks.items()}
 
 
 def _process_frame(
     ctx: FrameContext,
-    frame: FrameData,
+    frame: Frame,
     obj_ids: _FrameLoopObjectIds,
-    update_dispatch: dict[int, list[FrameHandler]],
-    deleted_actor_handlers: list[FrameHandler],
+    update_routes: dict[int, UpdateCallback],
+    deleted_actor_callbacks: Sequence[Callable[[FrameContext, int], None]],
 ) -> None:
     """Apply one frame to ctx, enforcing the three-phase ordering contract:
 
     1. new_actors    — register archetypes into FrameContext
     2. updated_actors — shared state first, then handler dispatch
+       (see _build_update_routes)
     3. deleted_actors — notify ALL handlers (two-pass), then purge ALL actor state
     """
-    ctx.frame_time = frame["time"]
+    ctx.frame_time = frame.time
 
     # 1. Process new_actors -> update shared archetype sets
-    for new_actor in frame.get("new_actors", []):
-        oid = new_actor.get("object_id")
-        aid = new_actor["actor_id"]
+    for aid, oid in frame.new_actors:
         if oid == obj_ids.car_archetype:
             ctx.car_actors.add(aid)
         elif oid == obj_ids.ball_archetype:
@@ -980,82 +2109,39 @@ def _process_frame(
         elif oid == obj_ids.boost_comp_archetype:
             ctx.boost_comp_actors.add(aid)
 
-    # 2. Process updated_actors -> shared state first, then handler dispatch.
-    #    Updates run before deletions so that handlers processing demolish
-    #    notifications can still resolve victim identity via car_actors
-    #    even when the victim's car is deleted in the same frame.
-    for actor in frame.get("updated_actors", []):
-        oid = actor.get("object_id")
-        aid = actor["actor_id"]
-
-        # Shared state updates (mutually exclusive obj_ids)
-        if oid == obj_ids.scored_obj_id:
-            team = actor.get("attribute", {}).get("Byte")
-            if team in (0, 1):
-                ctx.is_playing = False
-        elif oid == obj_ids.countdown_obj_id:
-            val = actor.get("attribute", {}).get("Int")
-            if val == 0:
-                ctx.is_playing = True
-        elif oid == obj_ids.vehicle_obj_id:
-            car_id = actor.get("attribute", {}).get("ActiveActor", {}).get("actor")
-            if car_id is not None and car_id >= 0:
-                ctx.resolver.link_component_to_car(aid, car_id)
-        elif oid == obj_ids.pri_obj_id:
-            pri_actor = actor.get("attribute", {}).get("ActiveActor", {}).get("actor")
-            if pri_actor is not None and pri_actor >= 0 and aid in ctx.car_actors:
-                ctx.resolver.link_car_to_pri(aid, pri_actor)
-        elif oid == obj_ids.uid_obj_id:
-            uid = actor.get("attribute", {}).get("UniqueId", {})
-            identity = from_network_frame(uid)
-            if identity:
-                ctx.resolver.set_identity(aid, *identity)
-        elif oid == obj_ids.team_paint_obj_id:
-            team = actor.get("attribute", {}).get("TeamPaint", {}).get("team")
-            if team is not None:
-                ctx.actor_team[aid] = team
-
-        # Position tracking (non-exclusive — runs for any RigidBody update)
-        if oid == obj_ids.rb_obj_id:
-            loc = actor.get("attribute", {}).get("RigidBody", {}).get("location")
-            if loc and "x" in loc and "y" in loc:
-                ctx.actor_position[aid] = (loc["x"], loc["y"])
-
-        # Handler dispatch
-        subscribers = update_dispatch.get(oid) if oid is not None else None
-        if subscribers:
-            for h in subscribers:
-                h.on_update(ctx, actor)
+    # 2. Process updated_actors. Updates run before deletions so that handlers
+    #    processing demolish notifications can still resolve victim identity
+    #    via car_actors even when the victim's car is deleted in the same frame.
+    for actor in frame.updated_actors:
+        route = update_routes.get(actor.object_id)  # pyright: ignore[reportArgumentType]
+        if route is not None:
+            route(ctx, actor)
 
     # 3. Process deleted_actors -> notify ALL handlers for ALL actors first,
     #    then clean shared state for all. This ensures that if a car and its
     #    boost component are deleted in the same frame, the boost component's
     #    handler can still resolve identity via the car mapping.
-    deleted_actors = frame.get("deleted_actors", [])
+    deleted_actors = frame.deleted_actors
     for aid in deleted_actors:
-        for h in deleted_actor_handlers:
-            h.on_deleted_actor(ctx, aid)
+        for on_deleted_actor in deleted_actor_callbacks:
+            on_deleted_actor(ctx, aid)
     for aid in deleted_actors:
-        ctx.car_actors.discard(aid)
-        ctx.ball_actors.discard(aid)
-        ctx.boost_comp_actors.discard(aid)
-        ctx.resolver.remove_actor(aid)
-        ctx.actor_team.pop(aid, None)
-        ctx.actor_position.pop(aid, None)
+        ctx.remove_actor(aid)
 
 
-def analyze_frames(
-    replay: ParsedReplay,
-    tracked_team: int | None,
-    tracked_identities: set[tuple[str, str]],
-    duration: int | None,
-    game_mode: str | None,
-) -> FrameAnalysis:
+# Resolved IDs per game build (see ParsedReplay.objects_digest). The dicts are
+# shared across replays and must not be mutated.
+_OBJECT_IDS_CACHE: dict[bytes, tuple[dict[str, int | None], _FrameLoopObjectIds]] = {}
+_OBJECT_IDS_CACHE_SIZE = 8
 
-    frames = replay.frames
 
-    if not replay.object_index or not frames:
-        return FrameAnalysis()
+def _object_ids(
+    replay: ParsedReplay,
+) -> tuple[dict[str, int | None], _FrameLoopObjectIds]:
+    """Handler and frame-loop object IDs for a replay, cached per game build."""
+    cached = _OBJECT_IDS_CACHE.get(replay.objects_digest)
+    if cached is not None:
+        return cached
 
     obj_ids = _resolve_obj_ids(replay)
 
@@ -1072,46 +2158,299 @@ def analyze_frames(
         uid_obj_id=obj_ids.get("Engine.PlayerReplicationInfo:UniqueId"),
         team_paint_obj_id=obj_ids.get("TAGame.Car_TA:TeamPaint"),
         rb_obj_id=obj_ids.get("TAGame.RBActor_TA:ReplicatedRBState"),
+        seconds_remaining_obj_id=obj_ids.get(
+            "TAGame.GameEvent_Soccar_TA:SecondsRemaining"
+        ),
+        pickup_obj_id=obj_ids.get("TAGame.VehiclePickup_TA:NewReplicatedPickupData"),
+        demolish_obj_id=obj_ids.get("TAGame.Car_TA:ReplicatedDemolishExtended"),
+        stat_counter_obj_ids=tuple(
+            (oid, stat)
+            for name, stat in STAT_COUNTERS.items()
+            if (oid := obj_ids.get(name)) is not None
+        ),
     )
 
-    big_pads = BIG_PAD_POSITIONS["hoops" if game_mode == "hoops" else "standard"]
+    resolved = (obj_ids, loop_obj_ids)
+    if replay.objects_digest:
+        if len(_OBJECT_IDS_CACHE) >= _OBJECT_IDS_CACHE_SIZE:
+            del _OBJECT_IDS_CACHE[next(iter(_OBJECT_IDS_CACHE))]
+        _OBJECT_IDS_CACHE[replay.objects_digest] = resolved
+    return resolved
+
+
+def _recording(
+    frames: Iterable[Frame], record: Callable[[Frame], None]
+) -> Iterator[Frame]:
+    for frame in frames:
+        record(frame)
+        yield frame
+
+
+class _FrameLoop:
+    """A FrameContext and the routes that drive a set of handlers through it."""
+
+    def __init__(
+        self,
+        obj_ids: _FrameLoopObjectIds,
+        handlers: list[FrameHandler],
+        big_pads: Sequence[tuple[float, float]],
+        small_pads: Sequence[tuple[float, float]] = (),
+        rigid_body_interval: float = 0.0,
+        profile: FrameProfile | None = None,
+    ) -> None:
+        self.obj_ids = obj_ids.spawns_for(_shared_state_needed(handlers))
+        self.handlers = handlers
+        self.update_routes = _build_update_routes(
+            obj_ids, handlers, big_pads, small_pads, rigid_body_interval, profile
+        )
+        # Only handlers that override on_deleted_actor need to be called on deletions
+        self.deleted_actor_callbacks: list[Callable[[FrameContext, int], None]] = (
+            _subscribers(handlers, "on_deleted_actor", profile)
+        )
+        self.ctx = FrameContext()
+
+    def run(self, frames: Iterable[Frame]) -> None:
+        for frame in frames:
+            _process_frame(
+                self.ctx,
+                frame,
+                self.obj_ids,
+                self.update_routes,
+                self.deleted_actor_callbacks,
+            )
+
+
+# The handler that computes each metric, whose version the DB records.
+METRIC_HANDLERS: dict[Metric, type[FrameHandler]] = {
+    Metric.POSSESSION: PossessionHandler,
+    Metric.BALL_ZONES: BallZonesHandler,
+    Metric.PLAYER_ZONES: PlayerZonesHandler,
+    Metric.DEMOLITIONS: DemolitionsHandler,
+    Metric.DEMOS_RECEIVED: DemosReceivedHandler,
+    Metric.BOOST: BoostStatsHandler,
+    Metric.MOVEMENT: MovementHandler,
+    Metric.MATCH_EVENTS: MatchEventsHandler,
+    Metric.GOAL_CONTEXT: GoalContextHandler,
+    Metric.HEATMAPS: HeatmapHandler,
+    Metric.SPACING: SpacingHandler,
+}
 
-    handlers: list[FrameHandler] = [
-        h
-        for h in [
-            PossessionHandler.create(obj_ids, tracked_team),
-            BallZonesHandler.create(obj_ids, tracked_team),
-            PlayerZonesHandler.create(obj_ids, tracked_team),
-            DemolitionsHandler.create(obj_ids),
-            BoostStatsHandler.create(obj_ids, tracked_team, big_pads),
-            MovementHandler.create(obj_ids, duration, big_pads),
-            DemosReceivedHandler.create(obj_ids),
-            MatchEventsHandler.create(obj_ids, tracked_team, tracked_identities),
-        ]
-        if h is not None
-    ]
 
-    # Build dispatch table: object_id -> list of handlers interested in that obj_id
-    update_dispatch: dict[int, list[FrameHandler]] = {}
+def metric_versions() -> dict[Metric, int]:
+    return {metric: h.version for metric, h in METRIC_HANDLERS.items()}
+
+
+# Handlers that share no state beyond FrameContext, for parallel_handlers.
+# Each group gets its own FrameContext, so the shared-state routes and
+# decoded streams run once per group.
+HANDLER_GROUPS: tuple[tuple[type[FrameHandler], ...], ...] = (
+    (
+        PossessionHandler,
+        BallZonesHandler,
+        PlayerZonesHandler,
+        GoalContextHandler,
+        HeatmapHandler,
+        SpacingHandler,
+    ),
+    (MovementHandler, BoostStatsHandler),
+    (MatchEventsHandler, DemolitionsHandler, DemosReceivedHandler),
+)
+_PARALLEL_BATCH_FRAMES = 512
+_PARALLEL_QUEUE_BATCHES = 8
+
+
+def free_threading_enabled() -> bool:
+    """True on a free-threaded build running with the GIL disabled."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _group_handlers(handlers: list[FrameHandler]) -> list[list[FrameHandler]]:
+    groups: dict[int, list[FrameHandler]] = {}
     for h in handlers:
-        for obj_id in h.update_obj_ids:
-            update_dispatch.setdefault(obj_id, []).append(h)
+        index = next(
+            (i for i, g in enumerate(HANDLER_GROUPS) if isinstance(h, g)),
+            len(HANDLER_GROUPS),
+        )
+        groups.setdefault(index, []).append(h)
+    return [groups[i] for i in sorted(groups)]
 
-    # Only handlers that override on_deleted_actor need to be called on deletions
-    deleted_actor_handlers = [
-        h
-        for h in handlers
-        if type(h).on_deleted_actor is not FrameHandler.on_deleted_actor
+
+def _consume(
+    loop: _FrameLoop, batches: "queue.Queue[tuple[Frame, ...] | None]"
+) -> None:
+    error: BaseException | None = None
+    while (batch := batches.get()) is not None:
+        if error is None:
+            try:
+                loop.run(batch)
+            except BaseException as exc:
+                # Keep draining so the producer never blocks on a full queue
+                error = exc
+    if error is not None:
+        raise error
+
+
+def _run_parallel(
+    frames: Iterable[Frame],
+    loops: list[_FrameLoop],
+    record: Callable[[Frame], None] | None = None,
+) -> None:
+    """Feed the same frame stream to each loop on its own thread.
+
+    Frames are read and projected once on the calling thread and handed out
+    in batches through bounded queues, so a slow group throttles reading
+    rather than buffering the whole replay. record, if given, sees each
+    projected frame on the calling thread before it is queued.
+    """
+    update_oids: set[int] = set()
+    spawn_oids: set[int] = set()
+    for loop in loops:
+        update_oids.update(loop.update_routes)
+        spawn_oids.update(loop.obj_ids.spawn_oids)
+    queues = [
+        queue.Queue[tuple[Frame, ...] | None](maxsize=_PARALLEL_QUEUE_BATCHES)
+        for _ in loops
     ]
+    with ThreadPoolExecutor(len(loops), thread_name_prefix="frame-loop") as pool:
+        futures = [
+            pool.submit(_consume, loop, q)
+            for loop, q in zip(loops, queues, strict=True)
+        ]
+        try:
+            projected = project_frames(frames, spawn_oids, update_oids)
+            if record is not None:
+                projected = _recording(projected, record)
+            for batch in itertools.batched(
+                projected, _PARALLEL_BATCH_FRAMES, strict=False
+            ):
+                for q in queues:
+                    q.put(batch)
+        finally:
+            for q in queues:
+                q.put(None)
+        for future in futures:
+            future.result()
 
-    ctx = FrameContext()
 
-    for frame in frames:
-        _process_frame(
-            ctx, frame, loop_obj_ids, update_dispatch, deleted_actor_handlers
-        )
+def analyze_frames(
+    replay: ParsedReplay,
+    tracked_team: int | None,
+    tracked_identities: set[tuple[str, str]],
+    duration: int | None,
+    game_mode: str | None,
+    parallel_handlers: bool = False,
+    rigid_body_hz: float | None = None,
+    metrics: Collection[Metric] | None = None,
+    profile: FrameProfile | None = None,
+    record: Callable[[Frame], None] | None = None,
+) -> FrameAnalysis:
+    """Run every applicable handler over the replay's frames.
+
+    metrics limits the work to the handlers (and shared state) those metrics
+    need; the other FrameAnalysis fields are left at their defaults. None
+    computes everything.
+
+    With parallel_handlers on a free-threaded build, each of HANDLER_GROUPS
+    consumes the frame stream on its own thread. Results are identical to the
+    sequential loop, which is used everywhere else.
+
+    rigid_body_hz samples each actor's position/velocity updates at that rate
+    instead of every network frame (~30 Hz). It only affects the time-weighted
+    stats (zones, speed, supersonic); discrete events are always processed in
+    full. See decimation_report in process.py for the error this introduces.
+
+    A profile records per-hook timings and update counts into it (see
+    FrameProfile). record is called with each frame as the handlers see it,
+    after projection (see frame_store). A profile runs the sequential loop.
+    """
+
+    # frames may be a single-use stream; peek rather than test its length.
+    frames = iter(replay.frames)
+    first_frame = next(frames, None)
+
+    if not replay.object_index or first_frame is None:
+        return FrameAnalysis()
+
+    obj_ids, loop_obj_ids = _object_ids(replay)
+
+    layout = "hoops" if game_mode == "hoops" else "standard"
+    big_pads, small_pads = BIG_PAD_POSITIONS[layout], SMALL_PAD_POSITIONS[layout]
 
+    factories: list[tuple[Metric, Callable[[], FrameHandler | None]]] = [
+        (Metric.POSSESSION, partial(PossessionHandler.create, obj_ids, tracked_team)),
+        (Metric.BALL_ZONES, partial(BallZonesHandler.create, obj_ids, tracked_team)),
+        (
+            Metric.PLAYER_ZONES,
+            partial(PlayerZonesHandler.create, obj_ids, tracked_team),
+        ),
+        (Metric.DEMOLITIONS, partial(DemolitionsHandler.create, obj_ids)),
+        (
+            Metric.BOOST,
+            partial(BoostStatsHandler.create, obj_ids, tracked_team),
+        ),
+        (
+            Metric.MOVEMENT,
+            partial(MovementHandler.create, obj_ids, duration),
+        ),
+        (Metric.DEMOS_RECEIVED, partial(DemosReceivedHandler.create, obj_ids)),
+        (
+            Metric.MATCH_EVENTS,
+            partial(
+                MatchEventsHandler.create, obj_ids, tracked_team, tracked_identities
+            ),
+        ),
+        (Metric.GOAL_CONTEXT, partial(GoalContextHandler.create, obj_ids)),
+        (
+            Metric.HEATMAPS,
+            partial(HeatmapHandler.create, obj_ids, tracked_team, tracked_identities),
+        ),
+        (Metric.SPACING, partial(SpacingHandler.create, obj_ids)),
+    ]
+    handlers: list[FrameHandler] = [
+        h
+        for metric, create in factories
+        if metrics is None or metric in metrics
+        if (h := create()) is not None
+    ]
+
+    rb_interval = 1 / rigid_body_hz if rigid_body_hz else 0.0
+    all_frames = itertools.chain((first_frame,), frames)
+    groups = _group_handlers(handlers)
+    if (
+        profile is None
+        and parallel_handlers
+        and len(groups) > 1
+        and free_threading_enabled()
+    ):
+        loops = [
+            _FrameLoop(loop_obj_ids, group, big_pads, small_pads, rb_interval)
+            for group in groups
+        ]
+        _run_parallel(all_frames, loops, record)
+    else:
+        loop = _FrameLoop(
+            loop_obj_ids, handlers, big_pads, small_pads, rb_interval, profile
+        )
+        source: Iterable[Frame] = all_frames
+        if profile is not None:
+            source = profile.count_updates(source, replay.object_index)
+        # Most updates are attributes nothing here reads; drop them up front.
+        projected = project_frames(source, loop.obj_ids.spawn_oids, loop.update_routes)
+        if record is not None:
+            projected = _recording(projected, record)
+        start = time.perf_counter()
+        loop.run(projected)
+        if profile is not None:
+            profile.loop_seconds += time.perf_counter() - start
+        loops = [loop]
+
+    # Finalize in handler order whatever the mode, so the merge is deterministic
+    ctx_for = {id(h): loop.ctx for loop in loops for h in loop.handlers}
     fa = FrameAnalysis()
     for h in handlers:
-        h.finalize(ctx, fa)
+        finalize = h.finalize
+        if profile is not None:
+            finalize = profile.timed(type(h).__name__, "finalize", finalize)
+        finalize(ctx_for[id(h)], fa)
     return fa
@@ -0,0 +1,327 @@
+"""Memory-mapped columnar store of the frames frame analysis reads.
+
+Ingest records each replay's projected frames (see project_frames) here, one
+file per match. A new metric can then be backfilled across every stored
+match by replaying the handlers over these files instead of running rrrocket
+again: loading maps the file and decodes updates straight from its columns.
+
+Each file is a small JSON header (the replay's header properties, objects
+list and column lengths) followed by fixed-width little-endian columns, each
+8-byte aligned:
+
+- per frame: time and the number of spawns, updates and deletions
+- spawns: actor and object id
+- deletions: actor id
+- updates: actor and object id, value kind and value. The value is the int
+  itself or an index into the column of its kind (rigid bodies, pickups,
+  demolishes, or the header's list of unique ids)
+
+Object IDs absent from the projection aren't stored, so a metric that reads
+a new object needs one more rrrocket pass; bump STORE_VERSION when the stored
+set changes, and older files are ignored.
+"""
+
+import contextlib
+import dataclasses
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+from rrrocket_schema import (
+    ActorSpawn,
+    ActorUpdate,
+    AttributeValue,
+    Demolish,
+    Frame,
+    ParsedReplay,
+    Pickup,
+    RigidBody,
+    Vector3,
+    parse,
+)
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+_MAGIC = b"RLFS"
+_PREAMBLE = struct.Struct("<4sII")  # magic, version, header length
+_SUFFIX = ".frames"
+_NONE = -1  # stands in for None in the int columns
+
+_KIND_NONE = 0
+_KIND_INT = 1
+_KIND_RIGID_BODY = 2
+_KIND_PICKUP = 3
+_KIND_DEMOLISH = 4
+_KIND_UNIQUE_ID = 5
+
+_DEMOLISH_ATTACKER_ACTIVE = 1
+_DEMOLISH_VICTIM_ACTIVE = 2
+_DEMOLISH_SELF = 4
+
+_COLUMNS = (
+    ("frame_time", "d"),
+    ("frame_spawns", "I"),
+    ("frame_updates", "I"),
+    ("frame_deletions", "I"),
+    ("spawn_actor", "i"),
+    ("spawn_object", "i"),
+    ("deleted_actor", "i"),
+    ("update_actor", "i"),
+    ("update_object", "i"),
+    ("update_kind", "B"),
+    ("update_value", "q"),
+    ("rb_location", "d"),
+    ("rb_velocity", "d"),  # NaN while the body is sleeping
+    ("pickup_instigator", "q"),
+    ("pickup_picked_up", "q"),
+    ("demolish_flags", "B"),
+    ("demolish_victim", "q"),
+)
+
+
+def _aligned(n: int) -> int:
+    return -(-n // 8) * 8
+
+
+def _or_none(value: int) -> int | None:
+    return None if value == _NONE else value
+
+
+class _FrameColumns:
+    """Columns being filled in frame by frame."""
+
+    def __init__(self) -> None:
+        self.columns = {name: array(code) for name, code in _COLUMNS}
+        self.unique_ids: list[dict[str, Any]] = []
+
+    def append(self, frame: Frame) -> None:
+        c = self.columns
+        c["frame_time"].append(frame.time)
+        c["frame_spawns"].append(len(frame.new_actors))
+        c["frame_updates"].append(len(frame.updated_actors))
+        c["frame_deletions"].append(len(frame.deleted_actors))
+        for spawn in frame.new_actors:
+            c["spawn_actor"].append(spawn.actor_id)
+            c["spawn_object"].append(
+                _NONE if spawn.object_id is None else spawn.object_id
+            )
+        c["deleted_actor"].extend(frame.deleted_actors)
+        for update in frame.updated_actors:
+            c["update_actor"].append(update.actor_id)
+            c["update_object"].append(
+                _NONE if update.object_id is None else update.object_id
+            )
+            kind, value = self._encode(update.value)
+            c["update_kind"].append(kind)
+            c["update_value"].append(value)
+
+    def _encode(self, value: AttributeValue) -> tuple[int, int]:
+        c = self.columns
+        match value:
+            case None:
+                return _KIND_NONE, 0
+            case int():
+                return _KIND_INT, value
+            case RigidBody(location, velocity):
+                c["rb_location"].extend(location)
+                c["rb_velocity"].extend(velocity or (math.nan,) * 3)
+                return _KIND_RIGID_BODY, len(c["rb_location"]) // 3 - 1
+            case Pickup(instigator, picked_up):
+                c["pickup_instigator"].append(
+                    _NONE if instigator is None else instigator
+                )
+                c["pickup_picked_up"].append(_NONE if picked_up is None else picked_up)
+                return _KIND_PICKUP, len(c["pickup_instigator"]) - 1
+            case Demolish():
+                flags = (
+                    value.attacker_active * _DEMOLISH_ATTACKER_ACTIVE
+                    | value.victim_active * _DEMOLISH_VICTIM_ACTIVE
+                    | value.self_demolish * _DEMOLISH_SELF
+                )
+                c["demolish_flags"].append(flags)
+                c["demolish_victim"].append(
+                    _NONE if value.victim is None else value.victim
+                )
+                return _KIND_DEMOLISH, len(c["demolish_flags"]) - 1
+            case dict():
+                self.unique_ids.append(value)
+                return _KIND_UNIQUE_ID, len(self.unique_ids) - 1
+        raise TypeError(f"can't store attribute value {value!r}")
+
+
+def _objects_list(replay: ParsedReplay) -> list[str]:
+    """The objects list behind replay.object_index, so that IDs line up."""
+    index = replay.object_index
+    objects = [""] * (max(index.values(), default=-1) + 1)
+    for name, oid in index.items():
+        objects[oid] = name
+    return objects
+
+
+def _read_frames(
+    path: Path, header_len: int, header: dict[str, Any]
+) -> Iterator[Frame]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        base = memoryview(mm)
+        views = [base]
+        col: dict[str, memoryview] = {}
+        offset = _aligned(_PREAMBLE.size + header_len)
+        for (name, code), length in zip(_COLUMNS, header["lengths"], strict=True):
+            size = length * array(code).itemsize
+            col[name] = base[offset : offset + size].cast(code)
+            views.append(col[name])
+            offset = _aligned(offset + size)
+        try:
+            yield from _decode_frames(col, header["unique_ids"])
+        finally:
+            for view in reversed(views):
+                view.release()
+
+
+def _decode_frames(
+    col: dict[str, memoryview], unique_ids: list[dict[str, Any]]
+) -> Iterator[Frame]:
+    spawn_actor, spawn_object = col["spawn_actor"], col["spawn_object"]
+    deleted_actor = col["deleted_actor"]
+    update_actor, update_object = col["update_actor"], col["update_object"]
+    update_kind, update_value = col["update_kind"], col["update_value"]
+    rb_location, rb_velocity = col["rb_location"], col["rb_velocity"]
+    pickup_instigator = col["pickup_instigator"]
+    pickup_picked_up = col["pickup_picked_up"]
+    demolish_flags, demolish_victim = col["demolish_flags"], col["demolish_victim"]
+
+    def value(i: int) -> AttributeValue:
+        kind, v = update_kind[i], update_value[i]
+        if kind == _KIND_INT:
+            return v
+        if kind == _KIND_RIGID_BODY:
+            j = 3 * v
+            velocity = None
+            if not math.isnan(rb_velocity[j]):
+                velocity = Vector3(*rb_velocity[j : j + 3])
+            return RigidBody(Vector3(*rb_location[j : j + 3]), velocity)
+        if kind == _KIND_PICKUP:
+            return Pickup(_or_none(pickup_instigator[v]), _or_none(pickup_picked_up[v]))
+        if kind == _KIND_DEMOLISH:
+            flags = demolish_flags[v]
+            return Demolish(
+                attacker_active=bool(flags & _DEMOLISH_ATTACKER_ACTIVE),
+                victim_active=bool(flags & _DEMOLISH_VICTIM_ACTIVE),
+                victim=_or_none(demolish_victim[v]),
+                self_demolish=bool(flags & _DEMOLISH_SELF),
+            )
+        if kind == _KIND_UNIQUE_ID:
+            return unique_ids[v]
+        return None
+
+    s = u = d = 0
+    for time, n_spawns, n_updates, n_deletions in zip(
+        col["frame_time"],
+        col["frame_spawns"],
+        col["frame_updates"],
+        col["frame_deletions"],
+        strict=True,
+    ):
+        new_actors = [
+            ActorSpawn(spawn_actor[i], _or_none(spawn_object[i]))
+            for i in range(s, s + n_spawns)
+        ]
+        updated_actors = [
+            ActorUpdate(update_actor[i], _or_none(update_object[i]), value(i))
+            for i in range(u, u + n_updates)
+        ]
+        deleted_actors = deleted_actor[d : d + n_deletions].tolist()
+        s, u, d = s + n_spawns, u + n_updates, d + n_deletions
+        yield Frame(time, new_actors, updated_actors, deleted_actors)
+
+
+class FrameStore:
+    def __init__(self, store_dir: Path) -> None:
+        self.store_dir = store_dir
+
+    def _path(self, replay_hash: str) -> Path:
+        # Match GUIDs come from replay headers; don't let them pick the path
+        name = hashlib.sha256(replay_hash.encode()).hexdigest()
+        return self.store_dir / f"{name}{_SUFFIX}"
+
+    def __contains__(self, replay_hash: str) -> bool:
+        return self._path(replay_hash).exists()
+
+    @contextlib.contextmanager
+    def writer(self, replay: ParsedReplay) -> Iterator[Callable[[Frame], None]]:
+        """Record a replay's frames, passed to the yielded callable in order.
+
+        The entry only replaces an earlier one for the match if the block
+        exits normally.
+        """
+        assert replay.match_guid is not None
+        columns = _FrameColumns()
+        yield columns.append
+        header = json.dumps(
+            {
+                "properties": replay.properties,
+                "debug_info": replay.debug_info,
+                "objects": _objects_list(replay),
+                "unique_ids": columns.unique_ids,
+                "lengths": [len(columns.columns[name]) for name, _ in _COLUMNS],
+            }
+        ).encode()
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_PREAMBLE.pack(_MAGIC, STORE_VERSION, len(header)))
+                f.write(header)
+                for name, _ in _COLUMNS:
+                    f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+                    column = columns.columns[name]
+                    if sys.byteorder != "little":
+                        column.byteswap()
+                    column.tofile(f)
+            os.replace(tmp, self._path(replay.match_guid))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def load(self, replay_hash: str) -> ParsedReplay | None:
+        """A stored match as a ParsedReplay whose frames are read from the map.
+
+        Returns None if the match isn't stored, or was stored by an older
+        STORE_VERSION. The frames can be iterated once.
+        """
+        path = self._path(replay_hash)
+        try:
+            with open(path, "rb") as f:
+                preamble = f.read(_PREAMBLE.size)
+                magic, version, header_len = _PREAMBLE.unpack(preamble)
+                header = json.loads(f.read(header_len))
+        except FileNotFoundError:
+            return None
+        except (struct.error, ValueError) as exc:
+            logger.warning("Ignoring unreadable frame store entry %s: %s", path, exc)
+            return None
+        if magic != _MAGIC or version != STORE_VERSION:
+            return None
+        if sys.byteorder != "little":
+            return None  # columns are read in place; no big-endian support
+        replay = parse(
+            {
+                "properties": header["properties"],
+                "objects": header["objects"],
+                "debug_info": header["debug_info"],
+            }
+        )
+        return dataclasses.replace(
+            replay, frames=_read_frames(path, header_len, header)
+        )
@@ -1,13 +1,28 @@
 # Replay Ingestion Pipeline
 # rrrocket JSON -> SQLite
 
+import contextlib
+import json
 import logging
 import sqlite3
+import sys
+from array import array
+from collections.abc import Callable, Collection, Iterable, Sequence
 from dataclasses import dataclass
 from enum import Enum
 from typing import Any
 
-from frame_analysis import FrameAnalysis, MatchEvent, PlayerMatchStats, analyze_frames
+from frame_analysis import (
+    FrameAnalysis,
+    FrameProfile,
+    MatchEvent,
+    Metric,
+    PlayerMatchStats,
+    TrajectorySample,
+    analyze_frames,
+    metric_versions,
+)
+from frame_store import FrameStore
 from player_identity import PlayerIdentity, from_player_stats
 from rrrocket_schema import ParsedReplay, PlayerStatEntry, ReplayProperties
 
@@ -18,6 +33,15 @@ class SkipReason(Enum):
     NO_MATCH_GUID = "no_match_guid"
     MISSING_DATE = "missing_date"
     NO_TRACKED_PLAYERS = "no_tracked_players"
+    ALREADY_INGESTED = "already_ingested"
+
+
+class AnalysisStatus(Enum):
+    """How far ingest has got with a match's frame-derived columns."""
+
+    PENDING = "pending"  # scoreboard stats only, frame analysis still to run
+    COMPLETE = "complete"
+    FAILED = "failed"
 
 
 PAIRING_WINDOW = 1.0  # seconds — max time between goal and assist to count as a pairing
@@ -45,6 +69,8 @@ class ReplayAnalysis:
     player_stats: dict[PlayerIdentity, PlayerStatEntry]
     tracked_names: dict[PlayerIdentity, str]
     perspective: MatchPerspective
+    # Rigid-body sample rate of the frame analysis; None is full rate
+    rigid_body_hz: float | None = None
 
 
 @dataclass(frozen=True)
@@ -211,6 +237,7 @@ def _upsert_match(
     map_name: str | None,
     game_mode: str | None,
     frame_analysis: FrameAnalysis,
+    analysis_status: AnalysisStatus,
 ) -> int:
     fa = frame_analysis
     return int(
@@ -224,8 +251,9 @@ def _upsert_match(
             team_possession_seconds, opponent_possession_seconds,
             defensive_zone_seconds, neutral_zone_seconds, offensive_zone_seconds,
             team_boost_collected, opponent_boost_collected,
-            team_boost_stolen, opponent_boost_stolen
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            team_boost_stolen, opponent_boost_stolen,
+            analysis_status
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(replay_hash) DO UPDATE SET
             played_at = excluded.played_at,
             duration_seconds = excluded.duration_seconds,
@@ -246,7 +274,8 @@ def _upsert_match(
             team_boost_collected = excluded.team_boost_collected,
             opponent_boost_collected = excluded.opponent_boost_collected,
             team_boost_stolen = excluded.team_boost_stolen,
-            opponent_boost_stolen = excluded.opponent_boost_stolen
+            opponent_boost_stolen = excluded.opponent_boost_stolen,
+            analysis_status = excluded.analysis_status
         RETURNING id
         """,
             (
@@ -271,6 +300,7 @@ def _upsert_match(
                 fa.opponent_boost_collected,
                 fa.team_boost_stolen,
                 fa.opponent_boost_stolen,
+                analysis_status.value,
             ),
         ).fetchone()[0]
     )
@@ -294,6 +324,23 @@ def _upsert_players(
     return player_id_map
 
 
+def encode_heatmap(cells: Sequence[float] | None) -> bytes | None:
+    """A heatmap (see frame_analysis.heatmap_cell) as a match_players blob."""
+    if cells is None:
+        return None
+    blob = array("f", cells)
+    if sys.byteorder != "little":
+        blob.byteswap()
+    return blob.tobytes()
+
+
+def decode_heatmap(blob: bytes) -> array[float]:
+    cells = array("f", blob)
+    if sys.byteorder != "little":
+        cells.byteswap()
+    return cells
+
+
 def _insert_match_players(
     conn: sqlite3.Connection,
     match_id: int,
@@ -309,6 +356,7 @@ def _insert_match_players(
         stats = per_player.get(identity, _empty)
         mv = stats.movement
         pz = stats.zone_seconds
+        sp = stats.spacing
         conn.execute(
             """
             INSERT INTO match_players (
@@ -316,8 +364,9 @@ def _insert_match_players(
                 goals, assists, saves, shots, score, demos, demos_received,
                 boost_per_minute, avg_speed, time_supersonic_pct,
                 small_pads, large_pads, stolen_small_pads, stolen_large_pads,
-                defensive_zone_seconds, neutral_zone_seconds, offensive_zone_seconds
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                defensive_zone_seconds, neutral_zone_seconds, offensive_zone_seconds,
+                avg_teammate_distance, shared_zone_seconds, heatmap
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(match_id, player_id) DO UPDATE SET
                 team = excluded.team,
                 goals = excluded.goals,
@@ -336,7 +385,10 @@ def _insert_match_players(
                 stolen_large_pads = excluded.stolen_large_pads,
                 defensive_zone_seconds = excluded.defensive_zone_seconds,
                 neutral_zone_seconds = excluded.neutral_zone_seconds,
-                offensive_zone_seconds = excluded.offensive_zone_seconds
+                offensive_zone_seconds = excluded.offensive_zone_seconds,
+                avg_teammate_distance = excluded.avg_teammate_distance,
+                shared_zone_seconds = excluded.shared_zone_seconds,
+                heatmap = excluded.heatmap
             """,
             (
                 match_id,
@@ -359,6 +411,9 @@ def _insert_match_players(
                 pz.defensive if pz else None,
                 pz.neutral if pz else None,
                 pz.offensive if pz else None,
+                sp.avg_teammate_distance if sp else None,
+                sp.shared_zone_seconds if sp else None,
+                encode_heatmap(stats.heatmap),
             ),
         )
 
@@ -373,9 +428,131 @@ def _build_player_stats(
     }
 
 
+def is_ingested(conn: sqlite3.Connection, replay_hash: str) -> bool:
+    """Whether a match is in the database with its frame analysis done.
+
+    Matches still pending (or whose analysis failed) are picked up again.
+    """
+    row = conn.execute(
+        "SELECT 1 FROM matches WHERE replay_hash = ? AND analysis_status = ?",
+        (replay_hash, AnalysisStatus.COMPLETE.value),
+    ).fetchone()
+    return row is not None
+
+
+def ingested_replay_hashes(conn: sqlite3.Connection) -> frozenset[str]:
+    return frozenset(
+        row[0]
+        for row in conn.execute(
+            "SELECT replay_hash FROM matches WHERE analysis_status = ?",
+            (AnalysisStatus.COMPLETE.value,),
+        )
+    )
+
+
+def stale_metrics(conn: sqlite3.Connection) -> dict[str, frozenset[Metric]]:
+    """Metrics of analyzed matches written by an older handler version.
+
+    Maps replay_hash to the metrics whose recorded handler version differs
+    from the current one (or that have none recorded). Metrics computed with
+    rigid bodies decimated (analyze_replay's rigid_body_hz) are stale too,
+    so a full-rate reprocess replaces them.
+    """
+    current = metric_versions()
+    recorded: dict[str, dict[str, int]] = {}
+    for replay_hash, metric, version, rigid_body_hz in conn.execute(
+        """SELECT m.replay_hash, v.metric, v.version, v.rigid_body_hz
+        FROM matches m LEFT JOIN match_metric_versions v ON v.match_id = m.id
+        WHERE m.analysis_status = ?""",
+        (AnalysisStatus.COMPLETE.value,),
+    ):
+        versions = recorded.setdefault(replay_hash, {})
+        if metric is not None and rigid_body_hz is None:
+            versions[metric] = version
+    stale = {
+        replay_hash: frozenset(
+            m for m, version in current.items() if versions.get(m.value) != version
+        )
+        for replay_hash, versions in recorded.items()
+    }
+    return {h: metrics for h, metrics in stale.items() if metrics}
+
+
+def _record_metric_versions(
+    conn: sqlite3.Connection,
+    match_id: int,
+    metrics: Iterable[Metric],
+    rigid_body_hz: float | None,
+) -> None:
+    current = metric_versions()
+    conn.executemany(
+        """INSERT INTO match_metric_versions (match_id, metric, version, rigid_body_hz)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(match_id, metric) DO UPDATE SET
+            version = excluded.version, rigid_body_hz = excluded.rigid_body_hz""",
+        [(match_id, m.value, current[m], rigid_body_hz) for m in metrics],
+    )
+
+
+def set_analysis_status(
+    conn: sqlite3.Connection, replay_hash: str, status: AnalysisStatus
+) -> None:
+    conn.execute(
+        "UPDATE matches SET analysis_status = ? WHERE replay_hash = ?",
+        (status.value, replay_hash),
+    )
+
+
+def is_known_replay(
+    conn: sqlite3.Connection, content_hash: str, match_guid: str | None
+) -> bool:
+    """Whether an upload repeats a replay file or match already on its way in.
+
+    A file counts from when its upload is queued (see record_replay_file), a
+    match from when it is published, pending or complete. Only a failed
+    analysis lets the same replay be uploaded again.
+    """
+    row = conn.execute(
+        """SELECT 1 FROM replay_files f LEFT JOIN matches m ON m.replay_hash = f.match_guid
+        WHERE (f.content_hash = ? OR f.match_guid = ?) AND m.analysis_status IS NOT ?""",
+        (content_hash, match_guid, AnalysisStatus.FAILED.value),
+    ).fetchone()
+    if row is None and match_guid is not None:
+        row = conn.execute(
+            "SELECT 1 FROM matches WHERE replay_hash = ? AND analysis_status != ?",
+            (match_guid, AnalysisStatus.FAILED.value),
+        ).fetchone()
+    return row is not None
+
+
+def record_replay_file(
+    conn: sqlite3.Connection, content_hash: str, match_guid: str | None
+) -> None:
+    """Remember which match a replay file holds.
+
+    Uploads are recorded when queued, with the MatchGUID sniffed from the
+    header (None if there was none), and again once ingested.
+    """
+    conn.execute(
+        """INSERT INTO replay_files (content_hash, match_guid) VALUES (?, ?)
+        ON CONFLICT(content_hash) DO UPDATE SET match_guid = excluded.match_guid""",
+        (content_hash, match_guid),
+    )
+
+
+def forget_replay_file(conn: sqlite3.Connection, content_hash: str) -> None:
+    """Drop a replay file's record, so the same file can be uploaded again."""
+    conn.execute("DELETE FROM replay_files WHERE content_hash = ?", (content_hash,))
+
+
 def validate_replay(
     replay: ParsedReplay, tracked_players: dict[PlayerIdentity, str]
 ) -> SkipReason | None:
+    """Decide whether a replay is worth analyzing.
+
+    Only header fields are consulted, so this can run on the result of a
+    header-only parse before paying for the network frames.
+    """
     if not replay.match_guid:
         return SkipReason.NO_MATCH_GUID
 
@@ -391,8 +568,19 @@ def validate_replay(
 
 
 def analyze_replay(
-    replay: ParsedReplay, tracked_players: dict[PlayerIdentity, str]
+    replay: ParsedReplay,
+    tracked_players: dict[PlayerIdentity, str],
+    parallel_handlers: bool = False,
+    rigid_body_hz: float | None = None,
+    metrics: Collection[Metric] | None = None,
+    profile: FrameProfile | None = None,
+    frame_store: FrameStore | None = None,
 ) -> ReplayAnalysis | None:
+    """Header-derived match data plus the frame analysis of one replay.
+
+    With a frame_store, the frames the handlers read are recorded there for
+    later backfills, unless only some metrics are being computed.
+    """
     skip = validate_replay(replay, tracked_players)
     if skip is not None:
         logger.debug("Skipping replay: %s", skip.value)
@@ -419,9 +607,24 @@ def analyze_replay(
         props.get("WinningTeam"),
     )
 
-    fa = analyze_frames(
-        replay, perspective.team, set(tracked_players.keys()), duration, game_mode
+    recorder = (
+        frame_store.writer(replay)
+        if frame_store is not None and metrics is None
+        else contextlib.nullcontext()
     )
+    with recorder as record:
+        fa = analyze_frames(
+            replay,
+            perspective.team,
+            set(tracked_players.keys()),
+            duration,
+            game_mode,
+            parallel_handlers,
+            rigid_body_hz,
+            metrics,
+            profile,
+            record,
+        )
 
     tracked_names = {
         k: tracked_players[k] for k in player_stats if k in tracked_players
@@ -439,10 +642,20 @@ def analyze_replay(
         player_stats=player_stats,
         tracked_names=tracked_names,
         perspective=perspective,
+        rigid_body_hz=rigid_body_hz or None,
     )
 
 
-def write_match(conn: sqlite3.Connection, analysis: ReplayAnalysis) -> None:
+def write_match(
+    conn: sqlite3.Connection,
+    analysis: ReplayAnalysis,
+    analysis_status: AnalysisStatus = AnalysisStatus.COMPLETE,
+) -> None:
+    """Write (or overwrite) everything stored for one match.
+
+    A header-only analysis is written with AnalysisStatus.PENDING so that its
+    scoreboard stats show up before the frame analysis has run.
+    """
     player_id_map = _upsert_players(conn, analysis.player_stats, analysis.tracked_names)
     perspective = analysis.perspective
     mvp_player_id = (
@@ -466,6 +679,7 @@ def write_match(conn: sqlite3.Connection, analysis: ReplayAnalysis) -> None:
         map_name=analysis.map_name,
         game_mode=analysis.game_mode,
         frame_analysis=analysis.frame_analysis,
+        analysis_status=analysis_status,
     )
 
     _insert_match_players(
@@ -476,6 +690,20 @@ def write_match(conn: sqlite3.Connection, analysis: ReplayAnalysis) -> None:
         analysis.frame_analysis.per_player(),
     )
 
+    _replace_match_events(conn, match_id, analysis, player_id_map)
+    _replace_goal_snapshots(conn, match_id, analysis, player_id_map)
+
+    conn.execute("DELETE FROM match_metric_versions WHERE match_id = ?", (match_id,))
+    if analysis_status is AnalysisStatus.COMPLETE:
+        _record_metric_versions(conn, match_id, Metric, analysis.rigid_body_hz)
+
+
+def _replace_match_events(
+    conn: sqlite3.Connection,
+    match_id: int,
+    analysis: ReplayAnalysis,
+    player_id_map: dict[PlayerIdentity, int],
+) -> None:
     conn.execute("DELETE FROM match_events WHERE match_id = ?", (match_id,))
     for e in analysis.frame_analysis.match_events:
         player_id = player_id_map.get(e.identity)
@@ -502,3 +730,135 @@ def write_match(conn: sqlite3.Connection, analysis: ReplayAnalysis) -> None:
                 "INSERT INTO offensive_pairings (match_id, game_seconds, scorer_player_id, assister_player_id, team) VALUES (?, ?, ?, ?, ?)",
                 (match_id, p.game_seconds, scorer_id, assister_id, p.team),
             )
+
+
+def _replace_goal_snapshots(
+    conn: sqlite3.Connection,
+    match_id: int,
+    analysis: ReplayAnalysis,
+    player_id_map: dict[PlayerIdentity, int],
+) -> None:
+    conn.execute("DELETE FROM goal_snapshots WHERE match_id = ?", (match_id,))
+    for goal in analysis.frame_analysis.goal_snapshots:
+        cars = [
+            {
+                "player_id": player_id,
+                "team": car.team,
+                "samples": _trajectory_rows(car.samples),
+            }
+            for car in goal.cars
+            if (player_id := player_id_map.get(car.identity)) is not None
+        ]
+        trajectories = {"ball": _trajectory_rows(goal.ball), "cars": cars}
+        conn.execute(
+            "INSERT INTO goal_snapshots (match_id, game_seconds, team, trajectories) VALUES (?, ?, ?, ?)",
+            (match_id, goal.game_seconds, goal.team, json.dumps(trajectories)),
+        )
+
+
+def _trajectory_rows(samples: Iterable[TrajectorySample]) -> list[list[float]]:
+    # Whole unreal units are plenty for display and keep the JSON small
+    return [
+        [s.seconds, round(s.x), round(s.y), round(s.z), round(s.speed)] for s in samples
+    ]
+
+
+# Columns written for each metric by write_metrics. matches columns are named
+# after the FrameAnalysis attribute they store.
+_MATCH_COLUMNS: dict[Metric, tuple[str, ...]] = {
+    Metric.POSSESSION: ("team_possession_seconds", "opponent_possession_seconds"),
+    Metric.BALL_ZONES: (
+        "defensive_zone_seconds",
+        "neutral_zone_seconds",
+        "offensive_zone_seconds",
+    ),
+    Metric.BOOST: (
+        "team_boost_collected",
+        "opponent_boost_collected",
+        "team_boost_stolen",
+        "opponent_boost_stolen",
+    ),
+}
+
+type _PlayerColumn = Callable[[PlayerMatchStats], Any]
+
+_MATCH_PLAYER_COLUMNS: dict[Metric, dict[str, _PlayerColumn]] = {
+    Metric.DEMOLITIONS: {"demos": lambda s: s.demos},
+    Metric.DEMOS_RECEIVED: {"demos_received": lambda s: s.demos_received},
+    Metric.MOVEMENT: {
+        column: (lambda s, column=column: getattr(s.movement, column, None))
+        for column in (
+            "boost_per_minute",
+            "avg_speed",
+            "time_supersonic_pct",
+            "small_pads",
+            "large_pads",
+            "stolen_small_pads",
+            "stolen_large_pads",
+        )
+    },
+    Metric.PLAYER_ZONES: {
+        f"{zone}_zone_seconds": (
+            lambda s, zone=zone: getattr(s.zone_seconds, zone, None)
+        )
+        for zone in ("defensive", "neutral", "offensive")
+    },
+    Metric.HEATMAPS: {"heatmap": lambda s: encode_heatmap(s.heatmap)},
+    Metric.SPACING: {
+        column: (lambda s, column=column: getattr(s.spacing, column, None))
+        for column in ("avg_teammate_distance", "shared_zone_seconds")
+    },
+}
+
+
+def write_metrics(
+    conn: sqlite3.Connection, analysis: ReplayAnalysis, metrics: Collection[Metric]
+) -> bool:
+    """Overwrite only the given metrics of an already-ingested match.
+
+    For analyses made with analyze_replay(..., metrics=...): everything else
+    stored for the match is left alone, and the metrics' handler versions are
+    recorded. Returns False, writing nothing, if
+    the match isn't in the database yet.
+    """
+    row = conn.execute(
+        "SELECT id FROM matches WHERE replay_hash = ?", (analysis.replay_hash,)
+    ).fetchone()
+    if row is None:
+        return False
+    match_id = row[0]
+    fa = analysis.frame_analysis
+    player_id_map = _upsert_players(conn, analysis.player_stats, analysis.tracked_names)
+
+    match_columns = [c for m in metrics for c in _MATCH_COLUMNS.get(m, ())]
+    if match_columns:
+        assignments = ", ".join(f"{c} = ?" for c in match_columns)
+        conn.execute(
+            f"UPDATE matches SET {assignments} WHERE id = ?",
+            [*(getattr(fa, c) for c in match_columns), match_id],
+        )
+
+    player_columns = {
+        c: get for m in metrics for c, get in _MATCH_PLAYER_COLUMNS.get(m, {}).items()
+    }
+    if player_columns:
+        assignments = ", ".join(f"{c} = ?" for c in player_columns)
+        per_player = fa.per_player()
+        _empty = PlayerMatchStats()
+        for identity in analysis.player_stats:
+            player_id = player_id_map.get(identity)
+            if player_id is None:
+                continue
+            stats = per_player.get(identity, _empty)
+            conn.execute(
+                f"UPDATE match_players SET {assignments}"
+                " WHERE match_id = ? AND player_id = ?",
+                [*(get(stats) for get in player_columns.values()), match_id, player_id],
+            )
+
+    if Metric.MATCH_EVENTS in metrics:
+        _replace_match_events(conn, match_id, analysis, player_id_map)
+    if Metric.GOAL_CONTEXT in metrics:
+        _replace_goal_snapshots(conn, match_id, analysis, player_id_map)
+    _record_metric_versions(conn, match_id, metrics, analysis.rigid_body_hz)
+    return True
@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS replay_files (
+    content_hash TEXT PRIMARY KEY,
+    match_guid TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_replay_files_match_guid ON replay_files(match_guid);
@@ -0,0 +1 @@
+ALTER TABLE matches ADD COLUMN analysis_status TEXT NOT NULL DEFAULT 'complete';
@@ -0,0 +1,14 @@
+CREATE TABLE IF NOT EXISTS match_metric_versions (
+    match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (match_id, metric)
+);
+
+-- Everything analyzed so far was computed by the first version of each handler
+INSERT OR IGNORE INTO match_metric_versions (match_id, metric, version)
+SELECT m.id, v.column1, 1
+FROM matches m,
+     (VALUES ('possession'), ('ball_zones'), ('player_zones'), ('demolitions'),
+             ('demos_received'), ('boost'), ('movement'), ('match_events')) v
+WHERE m.analysis_status = 'complete';
@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS goal_snapshots (
+    id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL REFERENCES matches(id) ON DELETE CASCADE,
+    game_seconds REAL NOT NULL,
+    team INTEGER NOT NULL,
+    -- JSON: {"ball": [[seconds, x, y, z, speed], ...],
+    --        "cars": [{"player_id": ..., "team": ..., "samples": [...]}, ...]}
+    trajectories TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_goal_snapshots_match ON goal_snapshots(match_id);
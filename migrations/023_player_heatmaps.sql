@@ -0,0 +1,2 @@
+-- Seconds per heatmap cell as little-endian float32s (see ingest.encode_heatmap)
+ALTER TABLE match_players ADD COLUMN heatmap BLOB;
@@ -0,0 +1,2 @@
+ALTER TABLE match_players ADD COLUMN avg_teammate_distance REAL;
+ALTER TABLE match_players ADD COLUMN shared_zone_seconds REAL;
@@ -0,0 +1,2 @@
+-- Rigid-body sample rate the metric was computed at; NULL is every network frame
+ALTER TABLE match_metric_versions ADD COLUMN rigid_body_hz REAL;
@@ -1,30 +1,88 @@
+import contextlib
+import dataclasses
 import functools
+import itertools
 import logging
 import os
+import queue
+import re
+import resource
 import sqlite3
+import struct
 import subprocess
+import sys
 import threading
+import time
+import weakref
+from collections import Counter
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping
 from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import cast
+from typing import IO, cast
 
 import orjson
 
 from config import load_tracked_players
+from frame_analysis import FrameAnalysis, FrameProfile, Metric
+from frame_store import FrameStore
 from ingest import (
+    AnalysisStatus,
     ReplayAnalysis,
+    SkipReason,
     analyze_replay,
+    forget_replay_file,
+    ingested_replay_hashes,
+    is_ingested,
+    record_replay_file,
+    set_analysis_status,
+    stale_metrics,
     sync_tracked_players,
+    validate_replay,
     write_match,
+    write_metrics,
 )
 from player_identity import PlayerIdentity
-from rrrocket_schema import ParsedReplay, ReplayJSON
+from replay_cache import CHUNK_SIZE, ReplayCache, content_hash
+from rrrocket_schema import Frame, ParsedReplay, ReplayJSON, iter_frames
 from rrrocket_schema import parse as _parse_rrrocket
 
 logger = logging.getLogger(__name__)
 
 _batch_lock = threading.Lock()
 
+RRROCKET_TIMEOUT = 30
+# Extra rrrocket time allowed per MiB of replay, so long matches on a busy box
+# aren't killed partway through.
+RRROCKET_TIMEOUT_PER_MB = 15
+# Replays whose headers are parsed by one rrrocket process.
+RRROCKET_BATCH_SIZE = 16
+# Pool workers are replaced after this many chunks, returning whatever memory
+# the allocator held on to.
+WORKER_MAX_TASKS = 8
+# Address-space cap per pool worker (inherited by its rrrocket children), so a
+# pathological replay raises MemoryError instead of waking the OOM killer.
+WORKER_MEMORY_LIMIT = 4 * 1024**3
+# Niceness added to the thread that fully analyzes uploads, so it yields the CPU
+# to request handling and to publishing the next upload's scoreboard stats.
+ANALYSIS_NICENESS = 10
+
+
+class RrrocketError(Exception):
+    """rrrocket failed partway through a streamed parse."""
+
+
+def _rrrocket_timeout(replay_paths: Iterable[Path]) -> float:
+    """Timeout for one rrrocket run over replay_paths, scaled by file size."""
+    count = size = 0
+    for p in replay_paths:
+        count += 1
+        try:
+            size += p.stat().st_size
+        except OSError:
+            pass
+    return RRROCKET_TIMEOUT * count + RRROCKET_TIMEOUT_PER_MB * size / 2**20
+
 
 def _open_write_conn(db_path: str | Path) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
@@ -33,61 +91,490 @@ def _open_write_conn(db_path: str | Path) -> sqlite3.Connection:
     return conn
 
 
-def parse_replay(replay_path: Path) -> tuple[ParsedReplay | None, str | None]:
-    """Run rrrocket on a .replay file and return the parsed JSON.
+@functools.cache
+def rrrocket_version() -> str | None:
+    """Return the installed rrrocket's version string, or None if unavailable."""
+    try:
+        result = subprocess.run(
+            ["rrrocket", "--version"], capture_output=True, timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        logger.warning("Could not determine rrrocket version: %s", exc)
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode(errors="replace").strip() or None
 
-    Returns (parsed_dict, None) on success. On failure, removes the corrupt
-    .replay file and returns (None, error_message).
+
+def _cache_key(
+    cache: ReplayCache | None, replay_path: Path, kind: str = "network"
+) -> str | None:
+    if cache is None or (version := rrrocket_version()) is None:
+        return None
+    return cache.key_for(replay_path, version, kind)
+
+
+def _rrrocket_failed(replay_path: Path, msg: str) -> tuple[None, str]:
+    logger.warning("%s: %s", replay_path.name, msg)
+    replay_path.unlink(missing_ok=True)
+    return None, msg
+
+
+def _run_rrrocket(
+    replay_path: Path, args: list[str]
+) -> tuple[bytes | None, str | None]:
+    """Run rrrocket to completion and return its stdout.
+
+    On failure, removes the corrupt .replay file and returns (None, error).
     """
     try:
         result = subprocess.run(
-            ["rrrocket", "-n", str(replay_path)],
+            ["rrrocket", *args, str(replay_path)],
             capture_output=True,
-            timeout=30,
+            timeout=_rrrocket_timeout([replay_path]),
         )
     except (OSError, subprocess.TimeoutExpired) as exc:
-        msg = f"rrrocket failed: {exc}"
-        logger.warning("rrrocket failed for %s: %s", replay_path.name, exc)
-        replay_path.unlink(missing_ok=True)
-        return None, msg
+        return _rrrocket_failed(replay_path, f"rrrocket failed: {exc}")
 
     if result.returncode != 0:
         stderr = result.stderr.decode(errors="replace").strip()
-        msg = f"rrrocket failed (exit {result.returncode}): {stderr}"
-        logger.warning(
-            "rrrocket failed for %s (exit %d): %s",
-            replay_path.name,
-            result.returncode,
-            stderr,
+        return _rrrocket_failed(
+            replay_path, f"rrrocket failed (exit {result.returncode}): {stderr}"
         )
-        replay_path.unlink(missing_ok=True)
-        return None, msg
+    return result.stdout, None
 
-    return _parse_rrrocket(cast(ReplayJSON, orjson.loads(result.stdout))), None
 
+def _replay_crcs(replay_path: Path) -> tuple[int, int] | None:
+    """Read the header and content CRCs from a .replay file's framing.
 
-def process_replay(
+    rrrocket echoes both as ``header_crc``/``content_crc`` in its JSON, which
+    is how batched output is matched back to the file it came from.
+    """
+    try:
+        with open(replay_path, "rb") as f:
+            framing = f.read(8)
+            if len(framing) < 8:
+                return None
+            header_size, header_crc = struct.unpack("<iI", framing)
+            f.seek(8 + header_size)
+            framing = f.read(8)
+    except OSError:
+        return None
+    if len(framing) < 8:
+        return None
+    _, content_crc = struct.unpack("<iI", framing)
+    return header_crc, content_crc
+
+
+# A MatchGUID header property: name FString, "StrProperty" type FString, then
+# an 8-byte size/index before the value FString.
+_MATCH_GUID_PROPERTY = re.compile(
+    rb"\x0a\x00\x00\x00Match(?:GUID|Guid)\x00\x0c\x00\x00\x00StrProperty\x00.{8}",
+    re.DOTALL,
+)
+
+
+def sniff_match_guid(data: bytes) -> str | None:
+    """Read the MatchGUID straight from a .replay file's header bytes.
+
+    Cheap enough to run on every upload, unlike an rrrocket header parse.
+    Returns None if the header is malformed or has no MatchGUID.
+    """
+    if len(data) < 8:
+        return None
+    (header_size,) = struct.unpack_from("<i", data)
+    header = data[8 : 8 + header_size]
+    m = _MATCH_GUID_PROPERTY.search(header)
+    if m is None or len(header) < m.end() + 4:
+        return None
+    (length,) = struct.unpack_from("<i", header, m.end())
+    raw = header[m.end() + 4 : m.end() + 4 + length]
+    if length <= 1 or len(raw) != length:
+        return None  # also rejects UTF-16 strings, which GUIDs never are
+    return raw[:-1].decode("ascii", errors="replace") or None
+
+
+def _sniff_replay_file(replay_path: Path) -> str | None:
+    """sniff_match_guid reading just the header of a .replay file."""
+    with open(replay_path, "rb") as f:
+        head = f.read(8)
+        if len(head) < 8:
+            return None
+        (header_size,) = struct.unpack_from("<i", head)
+        return sniff_match_guid(head + f.read(max(header_size, 0)))
+
+
+def _unwrap_replay_doc(doc: object) -> ReplayJSON:
+    """Find the replay document in one line of ``rrrocket -m -j`` output.
+
+    Accepts the document itself or an object wrapping it one level down
+    (e.g. alongside the file name).
+    """
+    if isinstance(doc, dict) and "header_crc" not in doc:
+        for value in cast(dict[str, object], doc).values():
+            if isinstance(value, dict) and "header_crc" in value:
+                return cast(ReplayJSON, value)
+    return cast(ReplayJSON, doc)
+
+
+# Keys nested in a JSON string would have their quotes escaped.
+_OUTPUT_CRC = re.compile(rb'(?<!\\)"(header_crc|content_crc)"\s*:\s*(\d+)')
+
+
+def _output_crcs(line: bytes) -> tuple[int, int] | None:
+    """Read header_crc/content_crc from one line of ``rrrocket -m -j`` output.
+
+    rrrocket writes both before the network frames, so this never has to
+    decode the document itself.
+    """
+    crcs: dict[bytes, int] = {}
+    for m in _OUTPUT_CRC.finditer(line):
+        crcs.setdefault(m[1], int(m[2]))
+        if len(crcs) == 2:
+            return crcs[b"header_crc"], crcs[b"content_crc"]
+    return None
+
+
+def _run_rrrocket_many(
+    replay_paths: list[Path], args: list[str]
+) -> dict[Path, tuple[bytes | None, str | None]]:
+    """Run rrrocket over several files in one process and split the output.
+
+    ``rrrocket -m -j`` writes one line per replay, read as it arrives and
+    matched to its file by CRC. A line may wrap the document (see
+    _unwrap_replay_doc). A file that produced no line (corrupt, or the batch
+    died) is retried on its own, so it gets its own error message and cleanup
+    without failing its neighbours.
+    """
+    if len(replay_paths) <= 1:
+        return {p: _run_rrrocket(p, args) for p in replay_paths}
+
+    by_crc: dict[tuple[int, int], list[Path]] = {}
+    for p in replay_paths:
+        if (crcs := _replay_crcs(p)) is not None:
+            by_crc.setdefault(crcs, []).append(p)
+    batched = [p for paths in by_crc.values() for p in paths]
+
+    outputs: dict[Path, tuple[bytes | None, str | None]] = {}
+    if len(batched) > 1:
+        try:
+            proc = subprocess.Popen(
+                ["rrrocket", *args, "-m", "-j", *map(str, batched)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as exc:
+            logger.warning("Batched rrrocket failed, retrying one by one: %s", exc)
+        else:
+            killer = threading.Timer(_rrrocket_timeout(batched), proc.kill)
+            killer.daemon = True
+            killer.start()
+            try:
+                for line in cast(IO[bytes], proc.stdout):
+                    if (crcs := _output_crcs(line)) is None:
+                        continue
+                    for p in by_crc.get(crcs, []):
+                        outputs[p] = (line.rstrip(b"\r\n"), None)
+            finally:
+                _reap(proc, killer)
+
+    return {p: outputs.get(p) or _run_rrrocket(p, args) for p in replay_paths}
+
+
+def _chunked(data: bytes) -> Iterator[bytes]:
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield data[start : start + CHUNK_SIZE]
+
+
+def _parse_many(
+    replay_paths: list[Path],
+    cache: ReplayCache | None,
+    kind: str,
+    headers: Mapping[Path, ParsedReplay] | None = None,
+) -> Iterator[tuple[Path, tuple[ParsedReplay | None, str | None]]]:
+    headers = headers or {}
+    keys: dict[Path, str | None] = {}
+    for path in replay_paths:
+        key = _cache_key(cache, path, kind)
+        if cache is not None and key is not None:
+            if (header := headers.get(path)) is not None:
+                chunks = cache.open(key)
+                if chunks is not None:
+                    frames = _decode_output(chunks, "cached rrrocket output")
+                    yield path, (dataclasses.replace(header, frames=frames), None)
+                    continue
+            elif (cached := cache.get(key)) is not None:
+                parsed = _parse_rrrocket(_unwrap_replay_doc(orjson.loads(cached)))
+                yield path, (parsed, None)
+                continue
+        keys[path] = key
+
+    outputs: Iterable[tuple[Path, tuple[bytes | None, str | None]]]
+    if kind == "network":
+        # Network output runs to hundreds of MB per replay; run rrrocket for
+        # each only once the previous one has been consumed, so a batch never
+        # holds more than one.
+        outputs = ((p, _run_rrrocket(p, ["-n"])) for p in keys)
+    else:
+        outputs = _run_rrrocket_many(list(keys), []).items()
+    for path, (stdout, error) in outputs:
+        if stdout is None:
+            yield path, (None, error)
+            continue
+        if cache is not None and (key := keys[path]) is not None:
+            cache.put(key, stdout)
+        if (header := headers.get(path)) is not None:
+            # Decoding the frames straight from the output bytes never builds
+            # the document's dict tree, which is several times its size.
+            frames = _decode_output(_chunked(stdout), "rrrocket output")
+            yield path, (dataclasses.replace(header, frames=frames), None)
+        else:
+            parsed = _parse_rrrocket(_unwrap_replay_doc(orjson.loads(stdout)))
+            yield path, (parsed, None)
+
+
+def iter_replays(
+    replay_paths: list[Path],
+    cache: ReplayCache | None = None,
+    headers: Mapping[Path, ParsedReplay] | None = None,
+) -> Iterator[tuple[Path, tuple[ParsedReplay | None, str | None]]]:
+    """parse_replay for several files, yielding (path, result) pairs.
+
+    Cached replays come first. The rest are parsed one at a time as the
+    previous result is consumed, so only one replay's output is in memory.
+    Replays with an entry in ``headers`` (from parse_replay_headers) take
+    their header fields from it, and their ``frames`` is a single-use
+    iterator decoding rrrocket's output one frame at a time (see
+    iter_frames); a malformed frame raises RrrocketError from it.
+    """
+    return _parse_many(replay_paths, cache, "network", headers)
+
+
+def parse_replays(
+    replay_paths: list[Path],
+    cache: ReplayCache | None = None,
+    headers: Mapping[Path, ParsedReplay] | None = None,
+) -> dict[Path, tuple[ParsedReplay | None, str | None]]:
+    """iter_replays collected into a dict, in the order of ``replay_paths``."""
+    results = dict(iter_replays(replay_paths, cache, headers))
+    return {p: results[p] for p in replay_paths}
+
+
+def parse_replay_headers(
+    replay_paths: list[Path], cache: ReplayCache | None = None
+) -> dict[Path, tuple[ParsedReplay | None, str | None]]:
+    """parse_replay_header for several files, sharing one rrrocket process."""
+    results = dict(_parse_many(replay_paths, cache, "header"))
+    return {p: results[p] for p in replay_paths}
+
+
+def parse_replay(
+    replay_path: Path, cache: ReplayCache | None = None
+) -> tuple[ParsedReplay | None, str | None]:
+    """Run rrrocket on a .replay file and return the parsed JSON.
+
+    Returns (parsed_dict, None) on success. On failure, removes the corrupt
+    .replay file and returns (None, error_message). With a cache, rrrocket is
+    skipped entirely when output for the same bytes and rrrocket version is
+    already stored.
+    """
+    return parse_replays([replay_path], cache)[replay_path]
+
+
+def parse_replay_header(
+    replay_path: Path, cache: ReplayCache | None = None
+) -> tuple[ParsedReplay | None, str | None]:
+    """Like parse_replay, but without decoding network frames.
+
+    The result carries properties, objects and debug_info with an empty frame
+    list. rrrocket skips the network data entirely, so this is cheap.
+    """
+    return parse_replay_headers([replay_path], cache)[replay_path]
+
+
+def _tee(chunks: Iterable[bytes], sink: IO[bytes]) -> Iterator[bytes]:
+    for chunk in chunks:
+        sink.write(chunk)
+        yield chunk
+
+
+def _reap(proc: subprocess.Popen[bytes], killer: threading.Timer) -> None:
+    killer.cancel()
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+    if proc.stdout is not None:
+        proc.stdout.close()
+
+
+def _stream_rrrocket_frames(
+    proc: subprocess.Popen[bytes],
+    killer: threading.Timer,
+    chunks: Iterator[bytes],
+    cache: ReplayCache | None,
+    key: str | None,
+) -> Iterator[Frame]:
+    """Decode frames from a running ``rrrocket -n`` and reap it afterwards.
+
+    The raw output is teed into the cache as it is read. It is only committed
+    once rrrocket exits cleanly, so an abandoned or failed stream leaves no
+    entry behind.
+    """
+    try:
+        with contextlib.ExitStack() as stack:
+            if cache is not None and key is not None:
+                chunks = _tee(chunks, stack.enter_context(cache.writer(key)))
+            try:
+                yield from iter_frames(chunks)
+            except ValueError as exc:
+                _reap(proc, killer)
+                raise RrrocketError(
+                    f"rrrocket output unreadable (exit {proc.returncode}): {exc}"
+                ) from exc
+            # Drain the rest of the document so the cache entry is complete
+            # and rrrocket isn't blocked on a full pipe.
+            for _ in chunks:
+                pass
+            if proc.wait() != 0:
+                raise RrrocketError(f"rrrocket failed (exit {proc.returncode})")
+    finally:
+        _reap(proc, killer)
+
+
+def stream_replay(
     replay_path: Path,
-    conn: sqlite3.Connection,
+    cache: ReplayCache | None = None,
+    header: ParsedReplay | None = None,
+) -> tuple[ParsedReplay | None, str | None]:
+    """Parse a replay with frames decoded lazily as they are iterated.
+
+    Header fields come from parse_replay_header (or ``header``, if the caller
+    already has it); ``frames`` is a single-use iterator over ``rrrocket -n``
+    output (or its cache entry) that decodes one frame at a time, so peak
+    memory no longer scales with replay length. Failures before the first
+    frame are reported like parse_replay's; failures partway through raise
+    RrrocketError from the iterator.
+    """
+    if header is None:
+        header, error = parse_replay_header(replay_path, cache)
+        if header is None:
+            return None, error
+
+    key = _cache_key(cache, replay_path)
+    if cache is not None and key is not None:
+        cached = cache.open(key)
+        if cached is not None:
+            return dataclasses.replace(
+                header, frames=_decode_output(cached, "cached rrrocket output")
+            ), None
+
+    try:
+        proc = subprocess.Popen(
+            ["rrrocket", "-n", str(replay_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError as exc:
+        return _rrrocket_failed(replay_path, f"rrrocket failed: {exc}")
+    killer = threading.Timer(_rrrocket_timeout([replay_path]), proc.kill)
+    killer.daemon = True
+    killer.start()
+
+    # rrrocket writes nothing until it has parsed the whole replay, so the
+    # first read is where corrupt files show up.
+    stdout = cast(IO[bytes], proc.stdout)
+    first = stdout.read(CHUNK_SIZE)
+    if not first:
+        _reap(proc, killer)
+        return _rrrocket_failed(
+            replay_path, f"rrrocket failed (exit {proc.returncode})"
+        )
+    # The parse is done; from here rrrocket only waits on the consumer, whose
+    # analysis time must not count against its timeout.
+    killer.cancel()
+
+    chunks = itertools.chain(
+        (first,), iter(functools.partial(stdout.read, CHUNK_SIZE), b"")
+    )
+    frames = _stream_rrrocket_frames(proc, killer, chunks, cache, key)
+    # A stream that is dropped without being iterated never runs its finally
+    # block; reap rrrocket when the generator is collected instead.
+    weakref.finalize(frames, _reap, proc, killer)
+    return dataclasses.replace(header, frames=frames), None
+
+
+def _decode_output(chunks: Iterable[bytes], source: str) -> Iterator[Frame]:
+    try:
+        yield from iter_frames(chunks)
+    except ValueError as exc:
+        raise RrrocketError(f"{source} unreadable: {exc}") from exc
+
+
+def _screen_header(
+    replay_path: Path,
+    header: ParsedReplay,
     tracked_players: dict[PlayerIdentity, str],
-) -> tuple[bool, str | None]:
-    """Run rrrocket on a .replay file, then ingest the parsed data.
+    already_ingested: Callable[[str], bool],
+) -> bool:
+    """Return True if a header-only parse shows the replay can be skipped."""
+    skip = validate_replay(header, tracked_players)
+    if skip is None and already_ingested(cast(str, header.match_guid)):
+        skip = SkipReason.ALREADY_INGESTED
+    if skip is None:
+        return False
+    logger.debug("Skipping %s: %s", replay_path.name, skip.value)
+    return True
 
-    Returns (True, None) when the file is resolved and a sentinel should be written:
-    either successfully ingested, or skipped (no tracked players, missing metadata).
-    Returns (False, error_message) on unexpected failure; the sentinel is not written
-    so the next run retries. Corrupt files that fail rrrocket parsing are deleted.
+
+def _screen_headers(
+    replay_paths: list[Path],
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None,
+    already_ingested: Callable[[str], bool],
+) -> tuple[dict[Path, ParsedReplay], dict[Path, str | None]]:
+    """Header-parse a group of replays and screen out the ones to skip.
+
+    Returns (survivors, resolved): survivors map to their header, resolved
+    map to an rrrocket error, or None if they were skipped. Replays sharing a
+    MatchGUID with an earlier survivor are skipped as already ingested.
     """
-    replay, error = parse_replay(replay_path)
-    if replay is None:
-        return False, error
+    survivors: dict[Path, ParsedReplay] = {}
+    resolved: dict[Path, str | None] = {}
+    seen: set[str] = set()
+    for path, (header, error) in parse_replay_headers(replay_paths, cache).items():
+        if header is None:
+            resolved[path] = error
+        elif _screen_header(
+            path, header, tracked_players, lambda g: g in seen or already_ingested(g)
+        ):
+            resolved[path] = None
+        else:
+            seen.add(cast(str, header.match_guid))
+            survivors[path] = header
+    return survivors, resolved
+
 
-    analysis = analyze_replay(replay, tracked_players)
+def _ingest_replay(
+    replay_path: Path,
+    replay: ParsedReplay,
+    conn: sqlite3.Connection,
+    tracked_players: dict[PlayerIdentity, str],
+    parallel_handlers: bool = False,
+    frame_store: FrameStore | None = None,
+) -> tuple[bool, str | None]:
+    try:
+        analysis = analyze_replay(
+            replay, tracked_players, parallel_handlers, frame_store=frame_store
+        )
+    except RrrocketError as exc:
+        logger.warning("Parse failed for %s: %s", replay_path.name, exc)
+        return False, str(exc)
     if analysis is None:
         return True, None
 
     try:
         write_match(conn, analysis)
+        record_replay_file(conn, content_hash(replay_path), analysis.replay_hash)
     except Exception as exc:
         msg = f"Ingest failed: {exc}"
         logger.warning("Ingest failed for %s: %s", replay_path.name, exc)
@@ -96,21 +583,81 @@ def process_replay(
     return True, None
 
 
+def process_replay(
+    replay_path: Path,
+    conn: sqlite3.Connection,
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+) -> tuple[bool, str | None]:
+    """Run rrrocket on a .replay file, then ingest the parsed data.
+
+    Returns (True, None) when the file is resolved and a sentinel should be written:
+    either successfully ingested, or skipped (no tracked players, missing metadata).
+    Returns (False, error_message) on unexpected failure; the sentinel is not written
+    so the next run retries. Corrupt files that fail rrrocket parsing are deleted.
+
+    A header-only parse runs first; replays without tracked players, or whose
+    match is already in the database, never get the full network parse.
+    """
+    return _process_files([replay_path], conn, tracked_players, cache)[replay_path]
+
+
+def _process_files(
+    files: list[Path],
+    conn: sqlite3.Connection,
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+    parallel_handlers: bool = False,
+    frame_store: FrameStore | None = None,
+    commit_each: bool = False,
+) -> dict[Path, tuple[bool, str | None]]:
+    """process_replay for several files, sharing rrrocket runs between them."""
+    results: dict[Path, tuple[bool, str | None]] = {}
+    for chunk in itertools.batched(files, RRROCKET_BATCH_SIZE, strict=False):
+        survivors, resolved = _screen_headers(
+            list(chunk), tracked_players, cache, functools.partial(is_ingested, conn)
+        )
+        results.update((p, (error is None, error)) for p, error in resolved.items())
+        for path, (replay, error) in iter_replays(list(survivors), cache, survivors):
+            if replay is None:
+                results[path] = (False, error)
+            else:
+                results[path] = _ingest_replay(
+                    path, replay, conn, tracked_players, parallel_handlers, frame_store
+                )
+                if commit_each:
+                    conn.commit()
+    return {p: results[p] for p in files}
+
+
 def process_batch(
     files: list[Path],
     conn: sqlite3.Connection,
     tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+    parallel_handlers: bool = False,
+    frame_store: FrameStore | None = None,
+    commit_each: bool = False,
 ) -> dict[str, tuple[bool, str | None]]:
     """Process a list of replay files in a single DB transaction.
 
     Returns a dict mapping filename to (success, error_message) for each file.
+    parallel_handlers is passed through to analyze_frames; frame_store
+    records each replay's frames for backfills. With commit_each, each match
+    is committed as soon as it's written instead, so the write lock isn't
+    held while the next replay is analyzed.
     """
-    results: dict[str, tuple[bool, str | None]] = {}
     with _batch_lock:
-        for replay_path in files:
-            results[replay_path.name] = process_replay(
-                replay_path, conn, tracked_players
-            )
+        by_path = _process_files(
+            files,
+            conn,
+            tracked_players,
+            cache,
+            parallel_handlers,
+            frame_store,
+            commit_each,
+        )
+        results = {p.name: r for p, r in by_path.items()}
         conn.commit()
         for replay_path in files:
             if results[replay_path.name][0]:
@@ -118,21 +665,82 @@ def process_batch(
     return results
 
 
+def publish_headers(
+    files: list[Path],
+    conn: sqlite3.Connection,
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+) -> dict[Path, str]:
+    """First ingest tier: write each new match's scoreboard stats right away.
+
+    Only headers are parsed, so the rows have no frame-derived columns yet
+    and are marked AnalysisStatus.PENDING until process_batch fills them in.
+    Returns the match GUID of each replay published, after committing.
+    """
+    published: dict[Path, str] = {}
+    for chunk in itertools.batched(files, RRROCKET_BATCH_SIZE, strict=False):
+        survivors, _ = _screen_headers(
+            list(chunk), tracked_players, cache, functools.partial(is_ingested, conn)
+        )
+        for path, header in survivors.items():
+            # A header has no frames, so this only takes the scoreboard stats
+            analysis = analyze_replay(header, tracked_players)
+            if analysis is None:
+                continue
+            write_match(conn, analysis, AnalysisStatus.PENDING)
+            published[path] = analysis.replay_hash
+    conn.commit()
+    return published
+
+
+def _lower_thread_priority(increment: int = ANALYSIS_NICENESS) -> None:
+    """Lower the calling thread's CPU priority.
+
+    Linux schedules threads individually, and rrrocket processes started from
+    the thread inherit its niceness. Elsewhere this does nothing.
+    """
+    if sys.platform != "linux":
+        return
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(
+            os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + increment
+        )
+    except OSError:
+        pass
+
+
 class UploadProcessor:
-    """Debounced batch processor for uploaded replay files."""
+    """Debounced batch processor for uploaded replay files.
+
+    Ingest runs in two tiers. A flush publishes each match's scoreboard stats
+    from a header-only parse straight away, then hands the batch to a
+    background thread that runs the full parse and frame analysis at lower
+    priority (see AnalysisStatus).
+    """
 
     def __init__(
         self,
         db_path: str | Path,
         tracked_players: dict[PlayerIdentity, str],
         delay: float = 2.0,
+        cache: ReplayCache | None = None,
+        parallel_handlers: bool = False,
+        frame_store: FrameStore | None = None,
     ):
         self.db_path = db_path
         self.tracked_players = tracked_players
         self.delay = delay
+        self.cache = cache
+        self.parallel_handlers = parallel_handlers
+        self.frame_store = frame_store
         self._queue: list[Path] = []
         self._lock = threading.Lock()
         self._timer: threading.Timer | None = None
+        self._pending: queue.Queue[
+            tuple[list[Path], dict[Path, str], dict[Path, str]]
+        ] = queue.Queue()
+        self._analysis_thread: threading.Thread | None = None
 
     def enqueue(self, path: Path):
         with self._lock:
@@ -148,28 +756,225 @@ class UploadProcessor:
             files = list(self._queue)
             self._queue.clear()
             self._timer = None
-        if files:
-            logger.info("Processing %d uploaded replay(s)", len(files))
-            conn = _open_write_conn(self.db_path)
+            if files and self._analysis_thread is None:
+                self._analysis_thread = threading.Thread(
+                    target=self._analyze_pending, name="replay-analysis", daemon=True
+                )
+                self._analysis_thread.start()
+        if not files:
+            return
+        # Hashed now: a replay rrrocket can't read is deleted when parsed
+        hashes = {p: content_hash(p) for p in files if p.exists()}
+        logger.info("Publishing %d uploaded replay(s)", len(files))
+        published: dict[Path, str] = {}
+        conn = _open_write_conn(self.db_path)
+        try:
+            published = publish_headers(files, conn, self.tracked_players, self.cache)
+        except Exception:
+            # The full analysis below writes the match regardless
+            logger.exception("Publishing uploaded replays failed")
+            conn.rollback()
+        finally:
+            conn.close()
+        self._pending.put((files, published, hashes))
+
+    def join(self) -> None:
+        """Block until every flushed batch has been fully analyzed."""
+        self._pending.join()
+
+    def _analyze_pending(self) -> None:
+        _lower_thread_priority()
+        while True:
+            files, published, hashes = self._pending.get()
             try:
-                process_batch(files, conn, self.tracked_players)
+                self._analyze(files, published, hashes)
+            except Exception:
+                logger.exception("Analyzing uploaded replays failed")
             finally:
-                conn.close()
+                self._pending.task_done()
 
+    def _analyze(
+        self, files: list[Path], published: dict[Path, str], hashes: dict[Path, str]
+    ) -> None:
+        logger.info("Analyzing %d uploaded replay(s)", len(files))
+        conn = _open_write_conn(self.db_path)
+        try:
+            results = process_batch(
+                files,
+                conn,
+                self.tracked_players,
+                self.cache,
+                self.parallel_handlers,
+                self.frame_store,
+                # Don't lock out flush publishing the next uploads meanwhile
+                commit_each=True,
+            )
+            for path in files:
+                if results[path.name][0]:
+                    continue
+                # Failed uploads may be uploaded again (see is_known_replay)
+                if path in hashes:
+                    forget_replay_file(conn, hashes[path])
+                if path in published:
+                    set_analysis_status(conn, published[path], AnalysisStatus.FAILED)
+            conn.commit()
+        finally:
+            conn.close()
 
-def _parse_and_analyze(
-    replay_path: Path, tracked_players: dict[PlayerIdentity, str]
+
+def _analyze_streamed(
+    replay_path: Path,
+    header: ParsedReplay,
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None,
+    rigid_body_hz: float | None = None,
+    metrics: Collection[Metric] | None = None,
+    frame_store: FrameStore | None = None,
 ) -> ReplayAnalysis | None:
-    """Worker for parallel processing: parse + analyze a replay without DB access."""
-    replay, _ = parse_replay(replay_path)
+    analyze = functools.partial(
+        analyze_replay,
+        tracked_players=tracked_players,
+        rigid_body_hz=rigid_body_hz,
+        metrics=metrics,
+        frame_store=frame_store,
+    )
+    replay, _ = stream_replay(replay_path, cache, header)
     if replay is None:
         return None
-    analysis = analyze_replay(replay, tracked_players)
-    if analysis is None:
-        logger.debug(
-            "Skipping %s: no tracked players or missing metadata", replay_path.name
+    try:
+        return analyze(replay)
+    except RrrocketError as exc:
+        # Retry with a full parse, which also takes care of deleting replays
+        # rrrocket genuinely can't read.
+        logger.warning(
+            "Streaming parse failed for %s, retrying: %s", replay_path.name, exc
         )
-    return analysis
+    replay, _ = parse_replay(replay_path, cache)
+    if replay is None:
+        return None
+    return analyze(replay)
+
+
+def _parse_and_analyze(
+    replay_paths: list[Path],
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+    stream: bool = False,
+    known_hashes: frozenset[str] = frozenset(),
+    rigid_body_hz: float | None = None,
+    metrics: Collection[Metric] | None = None,
+    frame_store: FrameStore | None = None,
+) -> list[ReplayAnalysis | None]:
+    """Worker for parallel processing: parse + analyze replays without DB access.
+
+    Each pass over the chunk shares one rrrocket process. A header-only pass
+    screens out replays that validate_replay rejects or whose match GUID is in
+    known_hashes before the network parse. With stream=True, survivors are
+    instead streamed one at a time (see stream_replay). rigid_body_hz,
+    metrics and frame_store are passed through to analyze_replay.
+    """
+    survivors, _ = _screen_headers(
+        replay_paths, tracked_players, cache, known_hashes.__contains__
+    )
+    analyses: dict[Path, ReplayAnalysis | None] = {}
+    if stream:
+        for path, header in survivors.items():
+            analyses[path] = _analyze_streamed(
+                path,
+                header,
+                tracked_players,
+                cache,
+                rigid_body_hz,
+                metrics,
+                frame_store,
+            )
+    else:
+        for path, (replay, _) in iter_replays(list(survivors), cache, survivors):
+            analyses[path] = (
+                None
+                if replay is None
+                else analyze_replay(
+                    replay,
+                    tracked_players,
+                    rigid_body_hz=rigid_body_hz,
+                    metrics=metrics,
+                    frame_store=frame_store,
+                )
+            )
+    return [analyses.get(p) for p in replay_paths]
+
+
+def _limit_worker_memory(max_bytes: int | None) -> None:
+    if max_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _run_pool(
+    worker: Callable[[list[Path]], list[ReplayAnalysis | None]],
+    chunks: list[list[Path]],
+    workers: int,
+    memory_limit: int | None,
+    results: dict[Path, ReplayAnalysis | None],
+) -> list[tuple[list[Path], BaseException]]:
+    """Run chunks on a fresh pool, filling results; return the failed chunks."""
+    if not chunks:
+        return []
+    failed: list[tuple[list[Path], BaseException]] = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        max_tasks_per_child=WORKER_MAX_TASKS,
+        initializer=_limit_worker_memory,
+        initargs=(memory_limit,),
+    ) as pool:
+        futures = [(chunk, pool.submit(worker, chunk)) for chunk in chunks]
+        for chunk, future in futures:
+            try:
+                results.update(zip(chunk, future.result(), strict=True))
+            except Exception as exc:
+                failed.append((chunk, exc))
+    return failed
+
+
+def _map_supervised(
+    worker: Callable[[list[Path]], list[ReplayAnalysis | None]],
+    chunks: list[list[Path]],
+    workers: int,
+    memory_limit: int | None = WORKER_MEMORY_LIMIT,
+) -> tuple[dict[Path, ReplayAnalysis | None], dict[Path, str]]:
+    """Map worker over chunks of replays, surviving bad replays.
+
+    A chunk that raises is retried one replay per task. A worker crash breaks
+    the whole pool and every unfinished chunk with it, without saying which
+    replay was responsible; those replays are resubmitted one per task to a
+    fresh pool, and any caught up in a second crash are retried in a pool of
+    their own. Returns (results, poisoned), poisoned mapping replays that
+    failed on their own to the reason.
+    """
+    results: dict[Path, ReplayAnalysis | None] = {}
+    poisoned: dict[Path, str] = {}
+    crashes: Counter[Path] = Counter()
+    pending = chunks
+    while pending:
+        suspects = [c for c in pending if crashes[c[0]] >= 2]
+        pending = [c for c in pending if crashes[c[0]] < 2]
+        failed = _run_pool(worker, pending, workers, memory_limit, results)
+        for (chunk,) in suspects:
+            failed += _run_pool(worker, [[chunk]], 1, memory_limit, results)
+        pending = []
+        for chunk, exc in failed:
+            crashed = isinstance(exc, BrokenProcessPool)
+            if len(chunk) > 1 or (crashed and crashes[chunk[0]] < 2):
+                if crashed:
+                    crashes.update(chunk)
+                pending += [[p] for p in chunk]
+                continue
+            (path,) = chunk
+            reason = "worker crashed" if crashed else f"{type(exc).__name__}: {exc}"
+            logger.error("Giving up on %s: %s", path.name, reason)
+            poisoned[path] = reason
+        if pending:
+            logger.warning("Retrying %d replay(s) after worker failure", len(pending))
+    return results, poisoned
 
 
 def process_unprocessed(
@@ -178,47 +983,312 @@ def process_unprocessed(
     tracked_players: dict[PlayerIdentity, str],
     *,
     force: bool = False,
+    cache: ReplayCache | None = None,
+    stream: bool = False,
+    workers: int | None = None,
+    memory_limit: int | None = WORKER_MEMORY_LIMIT,
+    rigid_body_hz: float | None = None,
+    metrics: Collection[Metric] | None = None,
+    frame_store: FrameStore | None = None,
 ):
     """Parse and ingest .replay files.
 
-    By default only processes files without an .ingested sentinel.
-    With force=True, reprocesses all .replay files.
+    By default only processes files without an .ingested or .failed marker,
+    and skips the network parse for replays whose match is already in the
+    database.
+    With force=True, reprocesses all .replay files. Passing a cache lets a
+    forced reprocess reuse earlier rrrocket output. stream=True decodes frames
+    incrementally so each worker's memory stays flat regardless of replay
+    length; workers defaults to half the CPUs.
+
+    Workers run under memory_limit and are recycled periodically. A replay
+    that crashes or errors its worker gets a .failed marker holding the reason
+    instead of aborting the run. rigid_body_hz trades accuracy of the
+    time-weighted stats for speed (see decimation_report).
+
+    With metrics, only those metrics are recomputed and written over matches
+    already in the database (see write_metrics); use with force=True.
+    frame_store records each fully analyzed replay's frames (see
+    backfill_metrics).
     """
     if force:
         replay_paths = sorted(replay_dir.glob("*.replay"))
     else:
-        already_ingested = {p.stem for p in replay_dir.glob("*.replay.ingested")}
+        resolved = {
+            p.stem
+            for pattern in ("*.replay.ingested", "*.replay.failed")
+            for p in replay_dir.glob(pattern)
+        }
         replay_paths = sorted(
-            p for p in replay_dir.glob("*.replay") if p.name not in already_ingested
+            p for p in replay_dir.glob("*.replay") if p.name not in resolved
         )
     if not replay_paths:
         return
 
     logger.info("Processing %d replay(s)...", len(replay_paths))
 
-    workers = max(1, (os.cpu_count() or 2) // 2)
-    worker = functools.partial(_parse_and_analyze, tracked_players=tracked_players)
-    with ProcessPoolExecutor(max_workers=workers) as pool:
-        results = list(pool.map(worker, replay_paths))
+    known_hashes: frozenset[str] = frozenset()
+    if not force:
+        conn = _open_write_conn(db_path)
+        try:
+            known_hashes = ingested_replay_hashes(conn)
+        finally:
+            conn.close()
+
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) // 2)
+    # Small enough chunks that every worker gets some
+    chunk_size = max(1, min(RRROCKET_BATCH_SIZE, -(-len(replay_paths) // workers)))
+    chunks = [
+        list(c) for c in itertools.batched(replay_paths, chunk_size, strict=False)
+    ]
+    worker = functools.partial(
+        _parse_and_analyze,
+        tracked_players=tracked_players,
+        cache=cache,
+        stream=stream,
+        known_hashes=known_hashes,
+        rigid_body_hz=rigid_body_hz,
+        metrics=metrics,
+        frame_store=frame_store,
+    )
+    results, poisoned = _map_supervised(worker, chunks, workers, memory_limit)
+    for replay_path, reason in poisoned.items():
+        replay_path.with_suffix(replay_path.suffix + ".failed").write_text(
+            reason + "\n"
+        )
 
     conn = _open_write_conn(db_path)
     try:
         sync_tracked_players(conn, tracked_players)
         ingested: list[Path] = []
         to_sentinel: list[Path] = []
-        for path, analysis in zip(replay_paths, results, strict=True):
-            if analysis is not None:
-                write_match(conn, analysis)
+        for path in replay_paths:
+            if path in poisoned:
+                continue
+            if (analysis := results.get(path)) is not None:
+                if metrics is None:
+                    write_match(conn, analysis)
+                    record_replay_file(conn, content_hash(path), analysis.replay_hash)
+                elif not write_metrics(conn, analysis, metrics):
+                    logger.warning(
+                        "%s is not ingested yet, skipping metric update", path.name
+                    )
+                    continue
                 ingested.append(path)
             elif path.exists():
                 to_sentinel.append(path)
         conn.commit()
         for replay_path in ingested + to_sentinel:
             replay_path.with_suffix(replay_path.suffix + ".ingested").touch()
+            replay_path.with_suffix(replay_path.suffix + ".failed").unlink(
+                missing_ok=True
+            )
     finally:
         conn.close()
 
 
+def backfill_metrics(
+    db_path: Path,
+    frame_store: FrameStore,
+    tracked_players: dict[PlayerIdentity, str],
+    metrics: Collection[Metric],
+) -> tuple[int, int]:
+    """Recompute metrics for every ingested match from the frame store.
+
+    No replay is parsed: handlers run over the stored frames, and the results
+    are written as with process_unprocessed(..., metrics=...). Returns
+    (updated, missing), where missing matches have no usable stored frames
+    and need a forced reprocess instead.
+    """
+    updated = missing = 0
+    conn = _open_write_conn(db_path)
+    try:
+        sync_tracked_players(conn, tracked_players)
+        for replay_hash in sorted(ingested_replay_hashes(conn)):
+            replay = frame_store.load(replay_hash)
+            if replay is None:
+                missing += 1
+                continue
+            analysis = analyze_replay(replay, tracked_players, metrics=metrics)
+            if analysis is not None and write_metrics(conn, analysis, metrics):
+                updated += 1
+        conn.commit()
+    finally:
+        conn.close()
+    return updated, missing
+
+
+def reprocess_stale(
+    db_path: Path,
+    replay_dir: Path,
+    tracked_players: dict[PlayerIdentity, str],
+    *,
+    frame_store: FrameStore | None = None,
+    cache: ReplayCache | None = None,
+    workers: int | None = None,
+    memory_limit: int | None = WORKER_MEMORY_LIMIT,
+) -> None:
+    """Recompute the metrics whose handler version changed (see stale_metrics).
+
+    Each match runs only its stale handlers, and only their columns are
+    rewritten (see write_metrics). Matches with stored frames are replayed
+    from the frame store; the rest are re-parsed from their replay files,
+    which are found by match GUID.
+    """
+    conn = _open_write_conn(db_path)
+    try:
+        sync_tracked_players(conn, tracked_players)
+        stale = stale_metrics(conn)
+        logger.info("%d match(es) have stale metrics", len(stale))
+
+        remaining = dict(stale)
+        if frame_store is not None:
+            for replay_hash, metrics in stale.items():
+                replay = frame_store.load(replay_hash)
+                if replay is None:
+                    continue
+                analysis = analyze_replay(replay, tracked_players, metrics=metrics)
+                if analysis is not None:
+                    write_metrics(conn, analysis, metrics)
+                del remaining[replay_hash]
+            conn.commit()
+
+        groups: dict[frozenset[Metric], list[Path]] = {}
+        if remaining:
+            for path in sorted(replay_dir.glob("*.replay")):
+                guid = _sniff_replay_file(path)
+                if guid is not None and guid in remaining:
+                    groups.setdefault(remaining.pop(guid), []).append(path)
+        if remaining:
+            logger.warning(
+                "%d match(es) have neither stored frames nor a replay file",
+                len(remaining),
+            )
+
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) // 2)
+        for metrics, paths in groups.items():
+            chunk_size = max(1, min(RRROCKET_BATCH_SIZE, -(-len(paths) // workers)))
+            worker = functools.partial(
+                _parse_and_analyze,
+                tracked_players=tracked_players,
+                cache=cache,
+                metrics=metrics,
+            )
+            results, _ = _map_supervised(
+                worker,
+                [list(c) for c in itertools.batched(paths, chunk_size, strict=False)],
+                workers,
+                memory_limit,
+            )
+            for analysis in results.values():
+                if analysis is not None:
+                    write_metrics(conn, analysis, metrics)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+# Frame-analysis outputs that rigid-body decimation can change
+_DECIMATED_TEAM_STATS = (
+    "team_possession_seconds",
+    "defensive_zone_seconds",
+    "neutral_zone_seconds",
+    "offensive_zone_seconds",
+)
+
+
+def _decimated_stats(fa: FrameAnalysis) -> dict[tuple[str, str], float]:
+    """(stat, player) -> value for the time-weighted stats; player "" for team."""
+    stats: dict[tuple[str, str], float] = {}
+    for name in _DECIMATED_TEAM_STATS:
+        value = getattr(fa, name)
+        if value is not None:
+            stats[name, ""] = value
+    for identity, player in fa.per_player().items():
+        key = f"{identity.platform}:{identity.platform_id}"
+        if player.movement is not None:
+            stats["avg_speed", key] = player.movement.avg_speed
+            stats["time_supersonic_pct", key] = player.movement.time_supersonic_pct
+        if player.zone_seconds is not None:
+            stats["player_defensive_seconds", key] = player.zone_seconds.defensive
+            stats["player_neutral_seconds", key] = player.zone_seconds.neutral
+            stats["player_offensive_seconds", key] = player.zone_seconds.offensive
+    return stats
+
+
+def decimation_report(
+    replay_paths: list[Path],
+    rates: list[float],
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+) -> list[str]:
+    """Compare rigid_body_hz analysis against full-rate analysis.
+
+    Each replay is parsed once and analyzed at full rate and at every rate.
+    Returns report lines: analysis CPU time per rate relative to full rate,
+    and the largest absolute error of each stat across all replays.
+    """
+    full_cpu = 0.0
+    cpu = dict.fromkeys(rates, 0.0)
+    errors: dict[float, dict[str, float]] = {rate: {} for rate in rates}
+    compared = 0
+    for path in replay_paths:
+        replay, error = parse_replay(path, cache)
+        if replay is None:
+            logger.warning("Skipping %s: %s", path.name, error)
+            continue
+        start = time.process_time()
+        full = analyze_replay(replay, tracked_players)
+        full_cpu += time.process_time() - start
+        if full is None:
+            continue
+        compared += 1
+        expected = _decimated_stats(full.frame_analysis)
+        for rate in rates:
+            start = time.process_time()
+            decimated = analyze_replay(replay, tracked_players, rigid_body_hz=rate)
+            cpu[rate] += time.process_time() - start
+            assert decimated is not None  # same replay, same validation
+            actual = _decimated_stats(decimated.frame_analysis)
+            worst = errors[rate]
+            for key, value in expected.items():
+                err = abs(actual.get(key, 0.0) - value)
+                worst[key[0]] = max(worst.get(key[0], 0.0), err)
+
+    lines = [f"{compared} replay(s), full rate: {full_cpu:.2f}s CPU"]
+    for rate in rates:
+        share = cpu[rate] / full_cpu * 100 if full_cpu else 0.0
+        lines.append(f"{rate:g} Hz: {cpu[rate]:.2f}s CPU ({share:.0f}% of full)")
+        lines.extend(
+            f"  {stat:<26} max abs error {err:.2f}"
+            for stat, err in sorted(errors[rate].items())
+        )
+    return lines
+
+
+def profile_report(
+    replay_path: Path,
+    tracked_players: dict[PlayerIdentity, str],
+    cache: ReplayCache | None = None,
+) -> list[str]:
+    """Profile the frame analysis of one replay (see FrameProfile).
+
+    Returns report lines: time and calls per handler hook, then the replay's
+    update counts by object name. Parsing is not included.
+    """
+    replay, error = parse_replay(replay_path, cache)
+    if replay is None:
+        return [f"{replay_path.name}: {error}"]
+    skip = validate_replay(replay, tracked_players)
+    if skip is not None:
+        return [f"{replay_path.name}: skipped ({skip.value})"]
+    profile = FrameProfile()
+    analyze_replay(replay, tracked_players, profile=profile)
+    return [replay_path.name, *profile.report()]
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -232,15 +1302,132 @@ if __name__ == "__main__":
     parser.add_argument(
         "--force", action="store_true", help="Reprocess all replays, not just new ones"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Decode network frames incrementally to bound per-worker memory",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Parallel workers (default: half the CPUs)"
+    )
+    parser.add_argument(
+        "--worker-memory-mb",
+        type=int,
+        default=WORKER_MEMORY_LIMIT // 2**20,
+        help="Address-space limit per worker in MiB (0 for none)",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=lambda value: [Metric(m) for m in value.split(",")],
+        metavar="METRIC[,METRIC...]",
+        help="With --force, recompute and overwrite only these metrics of "
+        f"already-ingested matches (choices: {', '.join(Metric)})",
+    )
+    parser.add_argument(
+        "--rigid-body-hz",
+        type=float,
+        help="Sample position/velocity updates at this rate instead of every "
+        "frame (faster, approximate time-weighted stats)",
+    )
+    parser.add_argument(
+        "--decimation-report",
+        type=float,
+        nargs="+",
+        metavar="HZ",
+        help="Compare stats at these rigid-body sampling rates against full rate "
+        "and exit, without touching the database",
+    )
+    parser.add_argument(
+        "--replay",
+        type=Path,
+        action="append",
+        help="Replay for --decimation-report (repeatable; default: all in replays/)",
+    )
+    parser.add_argument(
+        "--backfill",
+        type=lambda value: [Metric(m) for m in value.split(",")],
+        metavar="METRIC[,METRIC...]",
+        help="Recompute these metrics for every ingested match from the frame "
+        "store, without running rrrocket",
+    )
+    parser.add_argument(
+        "--reprocess-stale",
+        action="store_true",
+        help="Recompute only the metrics whose handler version changed since "
+        "each match was analyzed",
+    )
+    parser.add_argument(
+        "--profile-replay",
+        type=Path,
+        metavar="FILE",
+        help="Print per-handler frame analysis timings for one replay and exit, "
+        "without touching the database",
+    )
     args = parser.parse_args()
+    if args.metrics and not args.force:
+        parser.error("--metrics requires --force")
 
     db_path = Path("db/rl_stats.sqlite")
     replay_dir = Path("replays")
 
+    if args.decimation_report:
+        report = decimation_report(
+            args.replay or sorted(replay_dir.glob("*.replay")),
+            args.decimation_report,
+            load_tracked_players(),
+            ReplayCache(db_path.parent / "rrrocket_cache"),
+        )
+        print("\n".join(report))
+        raise SystemExit(0)
+
+    if args.profile_replay:
+        report = profile_report(
+            args.profile_replay,
+            load_tracked_players(),
+            ReplayCache(db_path.parent / "rrrocket_cache"),
+        )
+        print("\n".join(report))
+        raise SystemExit(0)
+
     db_path.parent.mkdir(exist_ok=True)
     conn = _open_write_conn(db_path)
     apply_migrations(conn)
     conn.close()
 
     tracked_players = load_tracked_players()
-    process_unprocessed(db_path, replay_dir, tracked_players, force=args.force)
+    frame_store = FrameStore(db_path.parent / "frame_store")
+    if args.backfill:
+        updated, missing = backfill_metrics(
+            db_path, frame_store, tracked_players, args.backfill
+        )
+        logger.info(
+            "Backfilled %d match(es); %d have no stored frames", updated, missing
+        )
+        raise SystemExit(0)
+
+    cache = ReplayCache(db_path.parent / "rrrocket_cache")
+    if args.reprocess_stale:
+        reprocess_stale(
+            db_path,
+            replay_dir,
+            tracked_players,
+            frame_store=frame_store,
+            cache=cache,
+            workers=args.workers,
+            memory_limit=args.worker_memory_mb * 2**20 or None,
+        )
+        raise SystemExit(0)
+
+    process_unprocessed(
+        db_path,
+        replay_dir,
+        tracked_players,
+        force=args.force,
+        cache=cache,
+        stream=args.stream,
+        workers=args.workers,
+        memory_limit=args.worker_memory_mb * 2**20 or None,
+        rigid_body_hz=args.rigid_body_hz,
+        metrics=args.metrics,
+        frame_store=frame_store,
+    )
@@ -0,0 +1,161 @@
+"""Content-addressed on-disk cache of rrrocket output.
+
+Running rrrocket is by far the most expensive step of ingest, and its output
+depends only on the replay's bytes and the rrrocket version. Entries are keyed
+by a hash of both and stored zstd-compressed, so a full reprocess after a
+frame_analysis.py change reads every replay from here instead of re-parsing.
+
+Eviction is least-recently-used by mtime: hits touch the entry, and writes
+trim the directory back under ``max_bytes``.
+
+Entries can also be read and written incrementally (``open``/``writer``) so
+that streaming ingest never holds a whole document in memory.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+from collections.abc import Iterator
+from compression import zstd
+from pathlib import Path
+from typing import BinaryIO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+CHUNK_SIZE = 1 << 20
+_SUFFIX = ".json.zst"
+
+
+def content_hash(replay_path: Path) -> str:
+    """SHA-256 of a replay file's bytes."""
+    with open(replay_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class ReplayCache:
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Running estimate of the directory size so that writes don't stat every
+        # entry. Each worker process keeps its own; a rescan corrects it.
+        self._size_estimate: int | None = None
+
+    def key_for(
+        self, replay_path: Path, rrrocket_version: str, kind: str = "network"
+    ) -> str:
+        """Key for rrrocket output of one replay.
+
+        ``kind`` separates the full network parse from the header-only parse
+        of the same file.
+        """
+        h = hashlib.sha256()
+        h.update(content_hash(replay_path).encode())
+        h.update(b"\0")
+        h.update(rrrocket_version.encode())
+        h.update(b"\0")
+        h.update(kind.encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            compressed = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            data = zstd.decompress(compressed)
+        except zstd.ZstdError:
+            logger.warning("Discarding corrupt cache entry %s", path.name)
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another worker in the meantime
+        return data
+
+    def open(self, key: str) -> Iterator[bytes] | None:
+        """Stream an entry's decompressed bytes in chunks, or None on a miss.
+
+        A corrupt entry is discarded and raises ValueError partway through.
+        """
+        path = self._path(key)
+        try:
+            f = zstd.open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return self._read_chunks(f, path)
+
+    def _read_chunks(self, f: BinaryIO, path: Path) -> Iterator[bytes]:
+        with f:
+            try:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+            except zstd.ZstdError, EOFError:
+                logger.warning("Discarding corrupt cache entry %s", path.name)
+                path.unlink(missing_ok=True)
+                raise ValueError(f"corrupt cache entry {path.name}") from None
+
+    def put(self, key: str, data: bytes) -> None:
+        with self.writer(key) as f:
+            f.write(data)
+
+    @contextlib.contextmanager
+    def writer(self, key: str) -> Iterator[BinaryIO]:
+        """Write an entry incrementally.
+
+        The entry only becomes visible if the block exits normally; on an
+        exception (including an abandoned generator) the partial file is
+        dropped.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with zstd.ZstdFile(raw, "wb") as f:
+                    yield f
+                size = raw.tell()
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if self._size_estimate is None:
+            self._size_estimate = self._scan_size()
+        else:
+            self._size_estimate += size
+        if self._size_estimate > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.cache_dir.glob(f"*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size_estimate = total
@@ -7,17 +7,29 @@ place to update when the rrrocket format changes.
 The `attribute` field on UpdatedActor is intentionally left as dict[str, Any]:
 it's a discriminated union keyed on rrrocket attribute type names ("Byte",
 "Int", "RigidBody", etc.) dispatched at runtime by object_id, and is too
-polymorphic to type exhaustively without a full discriminated union.
+polymorphic to type exhaustively without a full discriminated union. Frames
+are instead decoded (`decode_frame`) into NamedTuples carrying just the
+attribute variants frame_analysis uses.
 
 Call `parse(raw)` to convert a raw `ReplayJSON` dict into a `ParsedReplay`
 dataclass. All downstream consumers (ingest.py, frame_analysis.py) accept
 `ParsedReplay`; `ReplayJSON` is only used at the boundary where rrrocket JSON
-is first read.
+is first read. Unused properties, PlayerStats fields and debug_info entries
+are dropped there.
+
+`iter_frames(chunks)` is the streaming alternative for the network frames:
+it decodes one frame at a time from rrrocket's output as it arrives, so the
+whole document never has to be held in memory.
 """
 
+import codecs
 import datetime
+import hashlib
+import json
+import re
+from collections.abc import Callable, Iterable, Iterator, Mapping
 from dataclasses import dataclass
-from typing import Any, NotRequired, TypedDict
+from typing import Any, NamedTuple, NotRequired, TypedDict, cast
 
 
 class PlayerStatEntry(TypedDict, total=False):
@@ -84,14 +96,154 @@ class ReplayJSON(TypedDict, total=False):
     objects: list[str]
 
 
+# -- Decoded frames --
+#
+# Handlers never see the raw frame dicts above. decode_frame projects each
+# frame onto compact tuples holding only what frame_analysis reads: attribute
+# payloads are reduced to a single value per update, and variants no handler
+# uses are dropped to None without being walked.
+
+
+class Vector3(NamedTuple):
+    x: float
+    y: float
+    z: float
+
+
+class RigidBody(NamedTuple):
+    location: Vector3
+    linear_velocity: Vector3 | None  # absent while the body is sleeping
+
+
+class Pickup(NamedTuple):
+    instigator: int | None
+    picked_up: int | None  # 255 while the pad is respawning
+
+
+class Demolish(NamedTuple):
+    attacker_active: bool
+    victim_active: bool
+    victim: int | None
+    self_demolish: bool
+
+
+# Byte, Int, ReplicatedBoost and TeamPaint decode to int; ActiveActor to the
+# referenced actor id; UniqueId stays a dict for player_identity.
+type AttributeValue = int | RigidBody | Pickup | Demolish | dict[str, Any] | None
+
+
+class ActorSpawn(NamedTuple):
+    actor_id: int
+    object_id: int | None
+
+
+class ActorUpdate(NamedTuple):
+    actor_id: int
+    object_id: int | None
+    value: AttributeValue
+
+
+class Frame(NamedTuple):
+    time: float
+    new_actors: list[ActorSpawn]
+    updated_actors: list[ActorUpdate]
+    deleted_actors: list[int]
+
+
+def _vector(raw: dict[str, float] | None) -> Vector3 | None:
+    if not raw or "x" not in raw or "y" not in raw or "z" not in raw:
+        return None
+    return Vector3(raw["x"], raw["y"], raw["z"])
+
+
+def _decode_rigid_body(raw: dict[str, Any]) -> RigidBody | None:
+    location = _vector(raw.get("location"))
+    if location is None:
+        return None
+    return RigidBody(location, _vector(raw.get("linear_velocity")))
+
+
+def _decode_demolish(raw: dict[str, Any]) -> Demolish:
+    attacker = raw.get("attacker") or {}
+    victim = raw.get("victim") or {}
+    return Demolish(
+        attacker_active=bool(attacker.get("active")),
+        victim_active=bool(victim.get("active")),
+        victim=victim.get("actor"),
+        self_demolish=bool(raw.get("self_demolish")),
+    )
+
+
+def _scalar(raw: int) -> int:
+    return raw
+
+
+_ATTRIBUTE_DECODERS: dict[str, Callable[[Any], AttributeValue]] = {
+    "Byte": _scalar,
+    "Int": _scalar,
+    "ActiveActor": lambda raw: raw.get("actor"),
+    "ReplicatedBoost": lambda raw: raw.get("boost_amount"),
+    "TeamPaint": lambda raw: raw.get("team"),
+    "UniqueId": lambda raw: raw,
+    "RigidBody": _decode_rigid_body,
+    "PickupNew": lambda raw: Pickup(raw.get("instigator"), raw.get("picked_up")),
+    "DemolishExtended": _decode_demolish,
+}
+
+
+def decode_update(raw: UpdatedActor) -> ActorUpdate:
+    value: AttributeValue = None
+    # An attribute is a single-key object naming its variant
+    for kind, payload in raw.get("attribute", {}).items():
+        decode = _ATTRIBUTE_DECODERS.get(kind)
+        if decode is not None:
+            value = decode(payload)
+        break
+    return ActorUpdate(raw["actor_id"], raw.get("object_id"), value)
+
+
+def decode_frame(raw: FrameData) -> Frame:
+    return Frame(
+        raw["time"],
+        [
+            ActorSpawn(a["actor_id"], a.get("object_id"))
+            for a in raw.get("new_actors", ())
+        ],
+        [decode_update(a) for a in raw.get("updated_actors", ())],
+        raw.get("deleted_actors", []),
+    )
+
+
 @dataclass(frozen=True)
 class ParsedReplay:
     match_guid: str | None
     played_at: datetime.datetime | None
     properties: ReplayProperties
-    object_index: dict[str, int]
-    frames: list[FrameData]
+    # Shared between replays with the same objects list; treat as read-only.
+    object_index: Mapping[str, int]
+    # A list when parsed from a whole document; a single-use iterator when the
+    # frames are streamed (see iter_frames).
+    frames: Iterable[Frame]
     debug_info: list[DebugInfoEntry]
+    # Identifies the objects list (and so the game build); keys per-build caches.
+    objects_digest: bytes = b""
+
+
+# Replays from one game build share an identical objects list, so each worker
+# builds the index once per build rather than once per replay.
+_OBJECT_INDEX_CACHE: dict[bytes, dict[str, int]] = {}
+_OBJECT_INDEX_CACHE_SIZE = 8
+
+
+def _object_index(objects: list[str]) -> tuple[bytes, dict[str, int]]:
+    digest = hashlib.blake2b("\0".join(objects).encode(), digest_size=16).digest()
+    index = _OBJECT_INDEX_CACHE.get(digest)
+    if index is None:
+        if len(_OBJECT_INDEX_CACHE) >= _OBJECT_INDEX_CACHE_SIZE:
+            del _OBJECT_INDEX_CACHE[next(iter(_OBJECT_INDEX_CACHE))]
+        index = {name: i for i, name in enumerate(objects)}
+        _OBJECT_INDEX_CACHE[digest] = index
+    return digest, index
 
 
 def _resolve_played_at(
@@ -114,15 +266,99 @@ def _resolve_played_at(
     return None
 
 
+_PROPERTY_KEYS = ReplayProperties.__required_keys__ | ReplayProperties.__optional_keys__
+_PLAYER_STAT_KEYS = (
+    PlayerStatEntry.__required_keys__ | PlayerStatEntry.__optional_keys__
+)
+
+
+def _project_properties(raw: dict[str, Any]) -> ReplayProperties:
+    """Keep only the header properties ingest reads."""
+    props = {k: raw[k] for k in _PROPERTY_KEYS & raw.keys()}
+    if "PlayerStats" in props:
+        props["PlayerStats"] = [
+            {k: p[k] for k in _PLAYER_STAT_KEYS & p.keys()}
+            for p in props["PlayerStats"]
+        ]
+    return cast(ReplayProperties, props)
+
+
 def parse(raw: ReplayJSON) -> ParsedReplay:
-    props: ReplayProperties = raw.get("properties") or {}
+    props = _project_properties(cast(dict[str, Any], raw.get("properties") or {}))
     objects = raw.get("objects") or []
-    debug_info = raw.get("debug_info") or []
+    debug_info = [
+        entry
+        for entry in raw.get("debug_info") or []
+        if entry.get("user") == "GameStartTime"
+    ]
+    raw_frames = (raw.get("network_frames") or {}).get("frames") or []
+    objects_digest, object_index = _object_index(objects)
     return ParsedReplay(
         match_guid=props.get("MatchGUID") or props.get("MatchGuid"),
         played_at=_resolve_played_at(props, debug_info),
         properties=props,
-        object_index={name: i for i, name in enumerate(objects)},
-        frames=(raw.get("network_frames") or {}).get("frames") or [],
+        object_index=object_index,
+        frames=[decode_frame(f) for f in raw_frames],
         debug_info=debug_info,
+        objects_digest=objects_digest,
     )
+
+
+_FRAMES_START = re.compile(r'"network_frames"\s*:\s*\{\s*"frames"\s*:\s*\[')
+_FRAME_SEPARATOR = re.compile(r"[\s,]*")
+# Enough trailing text to hold a _FRAMES_START match split across two chunks.
+_MARKER_OVERLAP = 64
+
+
+def iter_frames(chunks: Iterable[bytes]) -> Iterator[Frame]:
+    """Decode network frames one at a time from chunks of rrrocket -n output.
+
+    Only the frame being decoded (plus one chunk of lookahead) is held in
+    memory. Everything before ``network_frames.frames`` is skipped and nothing
+    after the frames array is read, so header fields must come from a separate
+    header-only parse. Raises ValueError if the output ends before the frames
+    array is closed.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+    source = iter(chunks)
+    buf = ""
+    exhausted = False
+
+    def more() -> bool:
+        nonlocal buf, exhausted
+        for chunk in source:
+            if chunk:
+                buf += utf8.decode(chunk)
+                return True
+        buf += utf8.decode(b"", final=True)
+        exhausted = True
+        return False
+
+    while (m := _FRAMES_START.search(buf)) is None:
+        buf = buf[-_MARKER_OVERLAP:]
+        if not more():
+            raise ValueError("rrrocket output has no network frames")
+
+    pos = m.end()
+    while True:
+        pos = _FRAME_SEPARATOR.match(buf, pos).end()  # pyright: ignore[reportOptionalMemberAccess]
+        if pos >= len(buf):
+            if not more():
+                raise ValueError("rrrocket output ended inside network frames")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            frame, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Frame straddles the end of the buffer: pull another chunk and
+            # decode it again from the start.
+            if exhausted or not more():
+                raise ValueError("rrrocket output ended inside a frame") from None
+            continue
+        yield decode_frame(frame)
+        pos = end
+        if pos > len(buf) // 2:
+            buf = buf[pos:]
+            pos = 0
@@ -1,5 +1,6 @@
 import hashlib
 import hmac
+import json
 import logging
 import os
 import re
@@ -12,11 +13,16 @@ from typing import Annotated, Any
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, UploadFile
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 
 import config
 from db import apply_migrations, queries
-from process import UploadProcessor, process_unprocessed
+from frame_analysis import HEATMAP_COLUMNS, HEATMAP_ROWS
+from frame_store import FrameStore
+from ingest import decode_heatmap, is_known_replay, record_replay_file
+from process import UploadProcessor, process_unprocessed, sniff_match_guid
+from replay_cache import ReplayCache
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +50,8 @@ def validate_upload(filename: str, size: int) -> tuple[str, str | None, int]:
 
 
 DB_PATH = Path("db/rl_stats.sqlite")
+CACHE_DIR = DB_PATH.parent / "rrrocket_cache"
+FRAME_STORE_DIR = DB_PATH.parent / "frame_store"
 STATIC_DIR = Path(__file__).parent / "static"
 REPLAY_DIR = Path("replays")
 
@@ -166,6 +174,7 @@ def query_match_detail(
             "opponent_boost_collected": match["opponent_boost_collected"],
             "team_boost_stolen": match["team_boost_stolen"],
             "opponent_boost_stolen": match["opponent_boost_stolen"],
+            "analysis_status": match["analysis_status"],
         },
         "events": events,
         "team_players": team_players,
@@ -173,6 +182,55 @@ def query_match_detail(
     }
 
 
+def query_goal_snapshots(
+    conn: sqlite3.Connection, match_id: int
+) -> list[dict[str, Any]] | None:
+    if not queries.match_metadata(conn, match_id=match_id):
+        return None
+    names = {
+        r["id"]: r["name"] for r in queries.match_player_names(conn, match_id=match_id)
+    }
+    goals = []
+    for g in queries.goal_snapshots(conn, match_id=match_id):
+        trajectories = json.loads(g["trajectories"])
+        goals.append(
+            {
+                "game_seconds": g["game_seconds"],
+                "team": g["team"],
+                "ball": trajectories["ball"],
+                "cars": [
+                    {
+                        "name": names.get(car["player_id"]),
+                        "team": car["team"],
+                        "samples": car["samples"],
+                    }
+                    for car in trajectories["cars"]
+                ],
+            }
+        )
+    return goals
+
+
+def query_player_heatmap(
+    conn: sqlite3.Connection, player_name: str, game_mode: str
+) -> dict[str, Any]:
+    """The player's heatmaps summed over their matches in game_mode."""
+    total = [0.0] * (HEATMAP_COLUMNS * HEATMAP_ROWS)
+    matches = 0
+    for row in queries.player_heatmaps(
+        conn, player_name=player_name, game_mode=game_mode
+    ):
+        cells = decode_heatmap(row["heatmap"])
+        total = [a + b for a, b in zip(total, cells, strict=True)]
+        matches += 1
+    return {
+        "columns": HEATMAP_COLUMNS,
+        "rows": HEATMAP_ROWS,
+        "matches": matches,
+        "seconds": [round(seconds, 1) for seconds in total],
+    }
+
+
 STAT_ROUTES = {
     "/api/stats/shooting": queries.shooting_pct,
     "/api/stats/players": queries.player_stats,
@@ -195,6 +253,37 @@ def _get_conn(db_path: str | Path) -> sqlite3.Connection:
     return conn
 
 
+def _store_upload(db_path: str | Path, dest: Path, content: bytes) -> str | None:
+    """Write an upload to dest unless it's a duplicate; return why if it is.
+
+    Same bytes or same match under another name are answered here rather than
+    paying for a parse that would only upsert the existing match. A stored
+    upload is recorded straight away, so a repeat is caught while the first
+    is still queued.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    match_guid = sniff_match_guid(content)
+    conn = _get_conn(db_path)
+    try:
+        # Check and record under one write lock, so racing repeats can't both pass
+        conn.execute("BEGIN IMMEDIATE")
+        if is_known_replay(conn, digest, match_guid):
+            return "Replay already ingested"
+        try:
+            fd = os.open(str(dest), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return "File already exists"
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
+        record_replay_file(conn, digest, match_guid)
+        conn.commit()
+    finally:
+        conn.close()
+    return None
+
+
 def create_app(
     db_path: str | Path,
     replay_dir: Path | None = None,
@@ -327,16 +416,9 @@ def create_app(
         if error:
             return JSONResponse({"error": error}, status_code=status_code)
         dest = upload_dir / safe_name
-        try:
-            fd = os.open(str(dest), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
-            try:
-                os.write(fd, content)
-            finally:
-                os.close(fd)
-        except FileExistsError:
-            return JSONResponse(
-                {"error": "File already exists", "duplicate": True}, status_code=409
-            )
+        error = await run_in_threadpool(_store_upload, db_path, dest, content)
+        if error:
+            return JSONResponse({"error": error, "duplicate": True}, status_code=409)
         if processor is not None:
             processor.enqueue(dest)
         return JSONResponse({"filename": safe_name}, status_code=201)
@@ -355,7 +437,8 @@ def create_app(
         ingested_path = replay_path.with_suffix(replay_path.suffix + ".ingested")
         if ingested_path.exists():
             return {"status": "processed"}
-        if not replay_path.exists():
+        failed_path = replay_path.with_suffix(replay_path.suffix + ".failed")
+        if failed_path.exists() or not replay_path.exists():
             return {"status": "error"}
         return {"status": "pending"}
 
@@ -389,6 +472,15 @@ def create_app(
     ):
         return query_match_players(conn, match_id)
 
+    @app.get("/api/matches/{match_id}/goals")
+    async def goal_snapshots_route(
+        match_id: int, conn: Annotated[sqlite3.Connection, Depends(get_conn)]
+    ):
+        data = query_goal_snapshots(conn, match_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        return data
+
     @app.get("/api/matches/{match_id}")
     async def match_detail(
         match_id: int, conn: Annotated[sqlite3.Connection, Depends(get_conn)]
@@ -506,6 +598,14 @@ def create_app(
         rows = queries.player_time_series(conn, player_name=player_name, game_mode=mode)
         return [dict(r) for r in rows]
 
+    @app.get("/api/players/{player_name}/heatmap")
+    async def player_heatmap_route(
+        player_name: Annotated[str, Depends(get_tracked_player)],
+        conn: Annotated[sqlite3.Connection, Depends(get_conn)],
+        mode: Annotated[str, Depends(game_mode)],
+    ):
+        return query_player_heatmap(conn, player_name, mode)
+
     # -- Exception handlers --
 
     @app.exception_handler(HTTPException)
@@ -534,9 +634,19 @@ def main():
     conn.close()
 
     settings = config.load_settings()
-    process_unprocessed(DB_PATH, REPLAY_DIR, settings.players)
+    cache = ReplayCache(CACHE_DIR)
+    frame_store = FrameStore(FRAME_STORE_DIR)
+    process_unprocessed(
+        DB_PATH, REPLAY_DIR, settings.players, cache=cache, frame_store=frame_store
+    )
 
-    processor = UploadProcessor(DB_PATH, settings.players)
+    processor = UploadProcessor(
+        DB_PATH,
+        settings.players,
+        cache=cache,
+        parallel_handlers=settings.parallel_handlers,
+        frame_store=frame_store,
+    )
     app = create_app(DB_PATH, processor=processor, settings=settings)
     print(f"Serving on http://{host}:{port}")
     uvicorn.run(app, host=host, port=port)
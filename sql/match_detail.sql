@@ -18,7 +18,8 @@ SELECT
     m.team_boost_collected,
     m.opponent_boost_collected,
     m.team_boost_stolen,
-    m.opponent_boost_stolen
+    m.opponent_boost_stolen,
+    m.analysis_status
 FROM matches m
 WHERE m.id = :match_id;
 
@@ -54,8 +55,24 @@ SELECT
     mp.stolen_large_pads,
     mp.defensive_zone_seconds,
     mp.neutral_zone_seconds,
-    mp.offensive_zone_seconds
+    mp.offensive_zone_seconds,
+    mp.avg_teammate_distance,
+    mp.shared_zone_seconds
 FROM match_players mp
 JOIN players p ON mp.player_id = p.id
 WHERE mp.match_id = :match_id
 ORDER BY mp.score DESC;
+
+-- name: goal_snapshots(match_id)
+-- Car and ball trajectories before each goal; trajectories is JSON.
+SELECT g.game_seconds, g.team, g.trajectories
+FROM goal_snapshots g
+WHERE g.match_id = :match_id
+ORDER BY g.game_seconds;
+
+-- name: match_player_names(match_id)
+-- Names of the players in a match by player ID.
+SELECT p.id, p.name
+FROM match_players mp
+JOIN players p ON mp.player_id = p.id
+WHERE mp.match_id = :match_id;
@@ -49,3 +49,14 @@ WHERE p.name = :player_name
   AND p.is_tracked = 1
   AND m.game_mode = :game_mode
 GROUP BY p.id, p.name;
+
+-- name: player_heatmaps(player_name, game_mode)
+-- Per-match heatmap blobs for a single tracked player, summed by the caller.
+SELECT mp.heatmap
+FROM match_players mp
+JOIN matches m ON m.id = mp.match_id
+JOIN players p ON p.id = mp.player_id
+WHERE p.name = :player_name
+  AND p.is_tracked = 1
+  AND m.game_mode = :game_mode
+  AND mp.heatmap IS NOT NULL;
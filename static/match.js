@@ -203,7 +203,7 @@ function matchTimeline(events, teamNum, durationSeconds) {
     </div>`;
 }
 
-function barChart(allPlayers, key, label, fmt) {
+function barChart(allPlayers, key, label, fmt, hint) {
   const vals = allPlayers.map((p) => p[key]);
   if (vals.every((v) => v == null)) return "";
   const maxVal = Math.max(...vals.filter((v) => v != null));
@@ -235,7 +235,7 @@ function barChart(allPlayers, key, label, fmt) {
 
   return `
     <div class="player-chart">
-      <div class="chart-label">${label}</div>
+      <div class="chart-label"${hint ? ` title="${esc(hint)}"` : ""}>${label}</div>
       ${rows}
     </div>`;
 }
@@ -250,6 +250,22 @@ function boostPerMinChart(allPlayers) {
   );
 }
 
+function teammateDistanceChart(allPlayers) {
+  return barChart(allPlayers, "avg_teammate_distance", "NEAREST TEAMMATE", (v) =>
+    Math.round(v),
+  );
+}
+
+function sharedZoneChart(allPlayers) {
+  return barChart(
+    allPlayers,
+    "shared_zone_seconds",
+    "SHARED ZONE (S)",
+    (v) => Math.round(v),
+    "Seconds in the same third of the field as at least one teammate",
+  );
+}
+
 function padStatsChart(allPlayers) {
   const hasData = allPlayers.some(
     (p) =>
@@ -403,6 +419,7 @@ async function loadMatch() {
         ${formatUTCDateTime(m.played_at, { weekday: true })}
         ${m.game_mode ? ' &middot; <span class="mode-tag">' + esc(m.game_mode.toUpperCase()) + "</span>" : ""}
         ${m.duration_seconds ? " &middot; " + formatDuration(m.duration_seconds) : ""}
+        ${m.analysis_status === "pending" ? " &middot; Analyzing replay&hellip;" : ""}
       </div>
     </div>
 
@@ -472,8 +489,10 @@ async function loadMatch() {
   const speedChart = avgSpeedChart(allPlayers);
   const boostChart = boostPerMinChart(allPlayers);
   const padChart = padStatsChart(allPlayers);
+  const distanceChart = teammateDistanceChart(allPlayers);
+  const zoneChart = sharedZoneChart(allPlayers);
 
-  if (speedChart || boostChart || padChart) {
+  if (speedChart || boostChart || padChart || distanceChart || zoneChart) {
     const topRow =
       speedChart || boostChart
         ? `
@@ -482,10 +501,19 @@ async function loadMatch() {
           ${boostChart}
         </div>`
         : "";
+    const spacingRow =
+      distanceChart || zoneChart
+        ? `
+        <div class="player-charts-row">
+          ${distanceChart}
+          ${zoneChart}
+        </div>`
+        : "";
     html += `
       <div class="player-charts">
         ${topRow}
         ${padChart}
+        ${spacingRow}
       </div>`;
   }
 
@@ -229,18 +229,61 @@ function renderZoneCard(career) {
       : '<p style="padding:1rem;color:var(--text-dim)">—</p>';
 }
 
+// Own goal on the left, like pitchDiagram; rows run goal to goal
+function heatmapDiagram(heatmap, color) {
+  const { columns, rows, seconds } = heatmap;
+  const max = Math.max(...seconds);
+  if (!(max > 0)) return "";
+
+  const w = 560;
+  const h = 240;
+  const cellW = w / rows;
+  const cellH = h / columns;
+  const cells = seconds
+    .map((s, i) => {
+      if (s <= 0) return "";
+      const row = Math.floor(i / columns);
+      const col = i % columns;
+      return `<rect x="${row * cellW}" y="${col * cellH}" width="${cellW}" height="${cellH}"
+        fill="${rgba(color, (0.85 * s) / max)}"/>`;
+    })
+    .join("");
+
+  return `
+    <div class="pitch-diagram">
+      <svg width="${w}" height="${h}" viewBox="0 0 ${w} ${h}">
+        ${cells}
+        <rect x="0" y="0" width="${w}" height="${h}"
+          fill="none" stroke="rgba(255,255,255,0.12)" stroke-width="2"/>
+        <line x1="${w / 2}" y1="0" x2="${w / 2}" y2="${h}"
+          stroke="rgba(255,255,255,0.15)" stroke-width="1" stroke-dasharray="6,4"/>
+      </svg>
+    </div>`;
+}
+
+function renderHeatmapCard(heatmap) {
+  const el = document.getElementById("player-heatmap-display");
+  if (!el) return;
+  const color = PLAYER_COLORS[playerName] || { r: 0, g: 229, b: 255 };
+  el.innerHTML =
+    heatmapDiagram(heatmap, color) ||
+    '<p style="padding:1rem;color:var(--text-dim)">—</p>';
+}
+
 async function renderAll() {
   destroyCharts();
 
-  const [career, timeSeries] = await Promise.all([
+  const [career, timeSeries, heatmap] = await Promise.all([
     fetchJSON(`/api/players/${encodeURIComponent(playerName)}?mode=${currentMode}`),
     fetchJSON(`/api/players/${encodeURIComponent(playerName)}/time-series?mode=${currentMode}`),
+    fetchJSON(`/api/players/${encodeURIComponent(playerName)}/heatmap?mode=${currentMode}`),
   ]);
 
   renderCareerBar(career);
   renderDemosCard(career);
   renderBoostSpeedCard(career);
   renderZoneCard(career);
+  renderHeatmapCard(heatmap);
   renderGAS(timeSeries);
   renderAvgScore(timeSeries);
   renderMVP(timeSeries);
@@ -14,16 +14,19 @@ def test_loads_fixture_file():
     assert s.players[PlayerIdentity("steam", "76561197969365901")] == "Drew"
     assert s.upload_password is None
     assert s.secret_key is None
+    assert s.parallel_handlers is False
 
 
 def test_server_section_parsed(tmp_path: Path):
     (tmp_path / "settings.toml").write_text(
-        '[server]\nupload_password = "secret"\nsecret_key = "key123"\n\n'
+        '[server]\nupload_password = "secret"\nsecret_key = "key123"\n'
+        "parallel_handlers = true\n\n"
         '[[players]]\nplatform = "steam"\nplatform_id = "1"\nname = "A"\n'
     )
     s = load_settings(tmp_path)
     assert s.upload_password == "secret"
     assert s.secret_key == "key123"
+    assert s.parallel_handlers is True
     assert s.players == {PlayerIdentity("steam", "1"): "A"}
 
 
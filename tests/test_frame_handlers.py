@@ -2,27 +2,51 @@
 
 These exercise handlers in isolation: construct via __init__ with resolved
 obj IDs, set up a minimal FrameContext with only the fields the handler
-reads, drive on_update/on_deleted_actor directly, and assert finalize output.
+reads, deliver updates through the frame loop's routes (see _router), drive
+on_deleted_actor directly, and assert finalize output.
 
 The integration tests in test_ingest.py exercise the orchestrator and
 frame-loop ordering invariants; these tests cover handler logic.
 """
 
+import time
+from collections.abc import Callable, Sequence
+from typing import cast
+
+import pytest
+
 from frame_analysis import (
+    BIG_PAD_POSITIONS,
+    GOAL_CONTEXT_INTERVAL,
+    GOAL_CONTEXT_SECONDS,
+    HEATMAP_COLUMNS,
+    HEATMAP_ROWS,
+    ActorIntMap,
+    ActorPointMap,
     BallZonesHandler,
     BoostStatsHandler,
     DemolitionsHandler,
     DemosReceivedHandler,
     FrameAnalysis,
     FrameContext,
+    FrameHandler,
+    GameClock,
+    GoalContextHandler,
+    HeatmapHandler,
     IdentityResolver,
     MatchEventsHandler,
     MovementHandler,
     PlayerZonesHandler,
     PossessionHandler,
+    RingBuffer,
+    SpacingHandler,
+    TrajectorySample,
+    _build_update_routes,  # type: ignore[reportPrivateUsage]
+    _FrameLoopObjectIds,  # type: ignore[reportPrivateUsage]
+    heatmap_cell,
 )
 from player_identity import PlayerIdentity
-from rrrocket_schema import UpdatedActor
+from rrrocket_schema import ActorUpdate, decode_update
 
 HIT_TEAM_OID = 100
 RB_OID = 101
@@ -35,10 +59,65 @@ TEAM_OID = 107
 GOALS_OID = 108
 
 BIG_PADS = [(-3072.0, -4096.0), (3072.0, 4096.0)]
+SCORED_OID = 109
+
+_OBJ_IDS = _FrameLoopObjectIds(
+    car_archetype=None,
+    ball_archetype=None,
+    boost_comp_archetype=None,
+    scored_obj_id=None,
+    countdown_obj_id=None,
+    vehicle_obj_id=None,
+    pri_obj_id=None,
+    uid_obj_id=None,
+    team_paint_obj_id=None,
+    rb_obj_id=RB_OID,
+    seconds_remaining_obj_id=SR_OID,
+    pickup_obj_id=PICKUP_OID,
+    demolish_obj_id=DEMOLISH_OID,
+    stat_counter_obj_ids=((DEMO_OID, "demo"), (GOALS_OID, "goal")),
+)
+
+
+def _router(
+    h: FrameHandler, big_pads: Sequence[tuple[float, float]] = BIG_PADS
+) -> Callable[[FrameContext, ActorUpdate], None]:
+    """Deliver updates to h as the frame loop would, decoded streams and all."""
+    routes = _build_update_routes(_OBJ_IDS, [h], big_pads)
+
+    def route(ctx: FrameContext, actor: ActorUpdate) -> None:
+        routes[cast(int, actor.object_id)](ctx, actor)
+
+    return route
+
+
+def _hit(team_num: int) -> ActorUpdate:
+    return decode_update(
+        {"actor_id": 1, "object_id": HIT_TEAM_OID, "attribute": {"Byte": team_num}}
+    )
+
 
+# -- Actor-indexed maps --
 
-def _hit(team_num: int) -> UpdatedActor:
-    return {"actor_id": 1, "object_id": HIT_TEAM_OID, "attribute": {"Byte": team_num}}
+
+def test_actor_int_map_grows_and_pops():
+    m = ActorIntMap()
+    assert m.get(5) is None
+    m[5] = 0
+    m[300] = -1
+    assert (m.get(5), m.get(300), m.get(6)) == (0, -1, None)
+    assert m.pop(5) == 0
+    assert 5 not in m
+    assert m.pop(5) is None
+
+
+def test_actor_point_map_round_trips():
+    m = ActorPointMap()
+    m[3] = (1.5, -2.0)
+    assert m.get(3) == (1.5, -2.0)
+    assert m.get(-1) is None
+    assert m.pop(3) == (1.5, -2.0)
+    assert m.get(3) is None
 
 
 # -- IdentityResolver --
@@ -116,12 +195,13 @@ def test_find_pri_ids_for_returns_matching_ids():
 
 def test_possession_handler_splits_time_by_last_hit_team():
     h = PossessionHandler(HIT_TEAM_OID, tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _hit(0))
+    route(ctx, _hit(0))
     ctx.frame_time = 10.0
-    h.on_update(ctx, _hit(1))
+    route(ctx, _hit(1))
     ctx.frame_time = 20.0
 
     fa = FrameAnalysis()
@@ -141,11 +221,12 @@ def test_possession_handler_no_touches_returns_none():
 
 def test_possession_handler_inverts_for_team_1():
     h = PossessionHandler(HIT_TEAM_OID, tracked_team=1)
+    route = _router(h)
     ctx = FrameContext()
     ctx.frame_time = 0.0
-    h.on_update(ctx, _hit(0))
+    route(ctx, _hit(0))
     ctx.frame_time = 6.0
-    h.on_update(ctx, _hit(1))
+    route(ctx, _hit(1))
     ctx.frame_time = 10.0
 
     fa = FrameAnalysis()
@@ -157,24 +238,27 @@ def test_possession_handler_inverts_for_team_1():
 # -- BallZonesHandler --
 
 
-def _ball_update(actor_id: int, y: float) -> UpdatedActor:
-    return {
-        "actor_id": actor_id,
-        "object_id": RB_OID,
-        "attribute": {"RigidBody": {"location": {"x": 0.0, "y": y, "z": 0.0}}},
-    }
+def _ball_update(actor_id: int, y: float) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": actor_id,
+            "object_id": RB_OID,
+            "attribute": {"RigidBody": {"location": {"x": 0.0, "y": y, "z": 0.0}}},
+        }
+    )
 
 
 def test_ball_zones_handler_ignores_non_ball_actors():
-    h = BallZonesHandler(RB_OID, tracked_team=0)
+    h = BallZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.ball_actors.add(99)
     ctx.is_playing = True
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _ball_update(actor_id=42, y=-2500.0))  # not in ball_actors
+    route(ctx, _ball_update(actor_id=42, y=-2500.0))  # not in ball_actors
     ctx.frame_time = 5.0
-    h.on_update(ctx, _ball_update(actor_id=42, y=2500.0))
+    route(ctx, _ball_update(actor_id=42, y=2500.0))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -184,15 +268,16 @@ def test_ball_zones_handler_ignores_non_ball_actors():
 
 
 def test_ball_zones_handler_ignores_frames_not_playing():
-    h = BallZonesHandler(RB_OID, tracked_team=0)
+    h = BallZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.ball_actors.add(7)
     ctx.is_playing = False
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _ball_update(7, -2500.0))
+    route(ctx, _ball_update(7, -2500.0))
     ctx.frame_time = 5.0
-    h.on_update(ctx, _ball_update(7, 2500.0))
+    route(ctx, _ball_update(7, 2500.0))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -202,20 +287,21 @@ def test_ball_zones_handler_ignores_frames_not_playing():
 
 
 def test_ball_zones_handler_buckets_time_by_zone():
-    h = BallZonesHandler(RB_OID, tracked_team=0)
+    h = BallZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.ball_actors.add(7)
     ctx.is_playing = True
 
     # dt values kept < 2.0s so they pass the cross-period gap threshold
     ctx.frame_time = 0.0
-    h.on_update(ctx, _ball_update(7, -2500.0))  # defensive (y < -1707 for team 0)
+    route(ctx, _ball_update(7, -2500.0))  # defensive (y < -1707 for team 0)
     ctx.frame_time = 1.5
-    h.on_update(ctx, _ball_update(7, 0.0))  # neutral; 1.5s in defensive
+    route(ctx, _ball_update(7, 0.0))  # neutral; 1.5s in defensive
     ctx.frame_time = 2.5
-    h.on_update(ctx, _ball_update(7, 2500.0))  # offensive; 1.0s in neutral
+    route(ctx, _ball_update(7, 2500.0))  # offensive; 1.0s in neutral
     ctx.frame_time = 4.0
-    h.on_update(ctx, _ball_update(7, 2500.0))  # 1.5s in offensive
+    route(ctx, _ball_update(7, 2500.0))  # 1.5s in offensive
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -227,20 +313,21 @@ def test_ball_zones_handler_buckets_time_by_zone():
 def test_ball_zones_handler_skips_cross_period_gap():
     # A dt >= 2.0s between samples means the is_playing gate stopped collecting
     # (kickoff countdown gap) — that interval must not be counted.
-    h = BallZonesHandler(RB_OID, tracked_team=0)
+    h = BallZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.ball_actors.add(7)
     ctx.is_playing = True
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _ball_update(7, -2500.0))  # defensive
+    route(ctx, _ball_update(7, -2500.0))  # defensive
     ctx.frame_time = 1.0
-    h.on_update(ctx, _ball_update(7, -2500.0))  # 1.0s in defensive
+    route(ctx, _ball_update(7, -2500.0))  # 1.0s in defensive
     # Simulated kickoff gap: no sample at t=1.0 to t=4.0 (is_playing was False)
     ctx.frame_time = 4.0
-    h.on_update(ctx, _ball_update(7, 2500.0))  # gap dt=3.0 → skipped; now offensive
+    route(ctx, _ball_update(7, 2500.0))  # gap dt=3.0 → skipped; now offensive
     ctx.frame_time = 5.0
-    h.on_update(ctx, _ball_update(7, 2500.0))  # 1.0s in offensive
+    route(ctx, _ball_update(7, 2500.0))  # 1.0s in offensive
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -255,24 +342,27 @@ def test_ball_zones_handler_skips_cross_period_gap():
 # -- PlayerZonesHandler --
 
 
-def _car_rb_update(actor_id: int, y: float) -> UpdatedActor:
-    return {
-        "actor_id": actor_id,
-        "object_id": RB_OID,
-        "attribute": {"RigidBody": {"location": {"x": 0.0, "y": y, "z": 0.0}}},
-    }
+def _car_rb_update(actor_id: int, y: float) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": actor_id,
+            "object_id": RB_OID,
+            "attribute": {"RigidBody": {"location": {"x": 0.0, "y": y, "z": 0.0}}},
+        }
+    )
 
 
 def test_player_zones_handler_ignores_non_car_actors():
-    h = PlayerZonesHandler(RB_OID, tracked_team=0)
+    h = PlayerZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(10)
     ctx.is_playing = True
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_rb_update(actor_id=99, y=-2500.0))  # not in car_actors
+    route(ctx, _car_rb_update(actor_id=99, y=-2500.0))  # not in car_actors
     ctx.frame_time = 5.0
-    h.on_update(ctx, _car_rb_update(actor_id=99, y=2500.0))
+    route(ctx, _car_rb_update(actor_id=99, y=2500.0))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -280,7 +370,8 @@ def test_player_zones_handler_ignores_non_car_actors():
 
 
 def test_player_zones_handler_ignores_frames_not_playing():
-    h = PlayerZonesHandler(RB_OID, tracked_team=0)
+    h = PlayerZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(10)
     ctx.resolver.set_identity(20, "steam", "AAA")
@@ -288,9 +379,9 @@ def test_player_zones_handler_ignores_frames_not_playing():
     ctx.is_playing = False
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_rb_update(10, -2500.0))
+    route(ctx, _car_rb_update(10, -2500.0))
     ctx.frame_time = 5.0
-    h.on_update(ctx, _car_rb_update(10, 2500.0))
+    route(ctx, _car_rb_update(10, 2500.0))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -298,7 +389,8 @@ def test_player_zones_handler_ignores_frames_not_playing():
 
 
 def test_player_zones_handler_buckets_time_team0():
-    h = PlayerZonesHandler(RB_OID, tracked_team=0)
+    h = PlayerZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(10)
     ctx.resolver.set_identity(20, "steam", "AAA")
@@ -307,13 +399,13 @@ def test_player_zones_handler_buckets_time_team0():
 
     # dt values kept < 2.0s so they pass the cross-period gap threshold
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_rb_update(10, -2500.0))  # defensive
+    route(ctx, _car_rb_update(10, -2500.0))  # defensive
     ctx.frame_time = 1.5
-    h.on_update(ctx, _car_rb_update(10, 0.0))  # neutral; 1.5s defensive
+    route(ctx, _car_rb_update(10, 0.0))  # neutral; 1.5s defensive
     ctx.frame_time = 2.5
-    h.on_update(ctx, _car_rb_update(10, 2500.0))  # offensive; 1.0s neutral
+    route(ctx, _car_rb_update(10, 2500.0))  # offensive; 1.0s neutral
     ctx.frame_time = 4.0
-    h.on_update(ctx, _car_rb_update(10, 2500.0))  # 1.5s offensive
+    route(ctx, _car_rb_update(10, 2500.0))  # 1.5s offensive
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -325,7 +417,8 @@ def test_player_zones_handler_buckets_time_team0():
 
 
 def test_player_zones_handler_reversed_for_team1():
-    h = PlayerZonesHandler(RB_OID, tracked_team=1)
+    h = PlayerZonesHandler(tracked_team=1)
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(10)
     ctx.resolver.set_identity(20, "steam", "BBB")
@@ -335,13 +428,11 @@ def test_player_zones_handler_reversed_for_team1():
     # For team 1: y > 1707 is defensive, y < -1707 is offensive
     # dt values kept < 2.0s
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_rb_update(10, 2500.0))  # defensive for team 1
+    route(ctx, _car_rb_update(10, 2500.0))  # defensive for team 1
     ctx.frame_time = 1.5
-    h.on_update(
-        ctx, _car_rb_update(10, -2500.0)
-    )  # offensive for team 1; 1.5s defensive
+    route(ctx, _car_rb_update(10, -2500.0))  # offensive for team 1; 1.5s defensive
     ctx.frame_time = 3.0
-    h.on_update(ctx, _car_rb_update(10, -2500.0))  # 1.5s offensive
+    route(ctx, _car_rb_update(10, -2500.0))  # 1.5s offensive
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -353,7 +444,8 @@ def test_player_zones_handler_reversed_for_team1():
 
 
 def test_player_zones_handler_accumulates_across_respawn():
-    h = PlayerZonesHandler(RB_OID, tracked_team=0)
+    h = PlayerZonesHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.resolver.set_identity(20, "steam", "AAA")
 
@@ -362,9 +454,9 @@ def test_player_zones_handler_accumulates_across_respawn():
     ctx.resolver.link_car_to_pri(10, 20)
     ctx.is_playing = True
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_rb_update(10, -2500.0))
+    route(ctx, _car_rb_update(10, -2500.0))
     ctx.frame_time = 1.5
-    h.on_update(ctx, _car_rb_update(10, -2500.0))  # 1.5s defensive
+    route(ctx, _car_rb_update(10, -2500.0))  # 1.5s defensive
 
     # Car deleted (demo'd), re-spawns as car_id=11
     h.on_deleted_actor(ctx, 10)
@@ -375,9 +467,9 @@ def test_player_zones_handler_accumulates_across_respawn():
     ctx.car_actors.add(11)
     ctx.resolver.link_car_to_pri(11, 20)
     ctx.frame_time = 5.0
-    h.on_update(ctx, _car_rb_update(11, 2500.0))  # offensive
+    route(ctx, _car_rb_update(11, 2500.0))  # offensive
     ctx.frame_time = 6.5
-    h.on_update(ctx, _car_rb_update(11, 2500.0))  # 1.5s offensive
+    route(ctx, _car_rb_update(11, 2500.0))  # 1.5s offensive
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -388,20 +480,53 @@ def test_player_zones_handler_accumulates_across_respawn():
     assert zones.neutral == 0.0
 
 
+# CPU seconds PlayerZonesHandler's finalize may spend reducing a 20-minute
+# overtime match sampled at 30 Hz for six cars, several times what it takes on
+# a developer machine (~40ms).
+_ZONE_REDUCE_BUDGET = 0.25
+
+
+@pytest.mark.benchmark
+def test_player_zones_reducer_stays_within_budget_on_long_replay():
+    h = PlayerZonesHandler(tracked_team=0)
+    route = _router(h)
+    ctx = _spacing_ctx({car: car % 2 for car in range(1, 7)})
+    for i in range(20 * 60 * 30):
+        ctx.frame_time = i / 30
+        for car in range(1, 7):
+            route(ctx, _car_rb_update(car, (i * car) % 8000 - 4000.0))
+
+    start = time.process_time()
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    elapsed = time.process_time() - start
+
+    assert len(fa.player_zone_seconds) == 6
+    assert elapsed < _ZONE_REDUCE_BUDGET, f"finalize took {elapsed:.3f}s"
+
+
 # -- DemolitionsHandler --
 
 
 def test_demolitions_handler_maps_counter_max_to_identity():
-    h = DemolitionsHandler(DEMO_OID)
+    h = DemolitionsHandler()
+    route = _router(h)
     ctx = FrameContext()
     ctx.resolver.set_identity(5, "steam", "AAA")
     ctx.resolver.set_identity(6, "steam", "BBB")
 
-    h.on_update(ctx, {"actor_id": 5, "object_id": DEMO_OID, "attribute": {"Int": 2}})
-    h.on_update(
-        ctx, {"actor_id": 5, "object_id": DEMO_OID, "attribute": {"Int": 1}}
+    route(
+        ctx,
+        decode_update({"actor_id": 5, "object_id": DEMO_OID, "attribute": {"Int": 2}}),
+    )
+    route(
+        ctx,
+        decode_update({"actor_id": 5, "object_id": DEMO_OID, "attribute": {"Int": 1}}),
     )  # not max
-    h.on_update(ctx, {"actor_id": 6, "object_id": DEMO_OID, "attribute": {"Int": 3}})
+    route(
+        ctx,
+        decode_update({"actor_id": 6, "object_id": DEMO_OID, "attribute": {"Int": 3}}),
+    )
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -411,10 +536,14 @@ def test_demolitions_handler_maps_counter_max_to_identity():
 
 
 def test_demolitions_handler_skips_unknown_identities():
-    h = DemolitionsHandler(DEMO_OID)
+    h = DemolitionsHandler()
+    route = _router(h)
     ctx = FrameContext()
     # No pri_identity for actor 9
-    h.on_update(ctx, {"actor_id": 9, "object_id": DEMO_OID, "attribute": {"Int": 4}})
+    route(
+        ctx,
+        decode_update({"actor_id": 9, "object_id": DEMO_OID, "attribute": {"Int": 4}}),
+    )
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
     assert fa.per_player() == {}
@@ -429,34 +558,37 @@ def _demolish(
     victim_actor: int,
     attacker_active: bool = True,
     self_demolish: bool = False,
-) -> UpdatedActor:
-    return {
-        "actor_id": actor_id,
-        "object_id": DEMOLISH_OID,
-        "attribute": {
-            "DemolishExtended": {
-                "victim": {"active": victim_active, "actor": victim_actor},
-                "attacker": {"active": attacker_active, "actor": 0},
-                "self_demolish": self_demolish,
-            }
-        },
-    }
+) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": actor_id,
+            "object_id": DEMOLISH_OID,
+            "attribute": {
+                "DemolishExtended": {
+                    "victim": {"active": victim_active, "actor": victim_actor},
+                    "attacker": {"active": attacker_active, "actor": 0},
+                    "self_demolish": self_demolish,
+                }
+            },
+        }
+    )
 
 
 def test_demos_received_handler_counts_active_transitions():
-    h = DemosReceivedHandler(DEMOLISH_OID)
+    h = DemosReceivedHandler()
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(7)
     ctx.resolver.link_car_to_pri(7, 100)
     ctx.resolver.set_identity(100, "steam", "VICTIM")
 
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
+    route(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
     # Still active — not a new transition
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
+    route(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
     # Reset
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=False, victim_actor=7))
+    route(ctx, _demolish(actor_id=7, victim_active=False, victim_actor=7))
     # Second hit
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
+    route(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -464,13 +596,14 @@ def test_demos_received_handler_counts_active_transitions():
 
 
 def test_demos_received_handler_skips_self_demolish():
-    h = DemosReceivedHandler(DEMOLISH_OID)
+    h = DemosReceivedHandler()
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(7)
     ctx.resolver.link_car_to_pri(7, 100)
     ctx.resolver.set_identity(100, "steam", "VICTIM")
 
-    h.on_update(
+    route(
         ctx,
         _demolish(actor_id=7, victim_active=True, victim_actor=7, self_demolish=True),
     )
@@ -480,13 +613,14 @@ def test_demos_received_handler_skips_self_demolish():
 
 
 def test_demos_received_handler_skips_when_attacker_inactive():
-    h = DemosReceivedHandler(DEMOLISH_OID)
+    h = DemosReceivedHandler()
+    route = _router(h)
     ctx = FrameContext()
     ctx.car_actors.add(7)
     ctx.resolver.link_car_to_pri(7, 100)
     ctx.resolver.set_identity(100, "steam", "VICTIM")
 
-    h.on_update(
+    route(
         ctx,
         _demolish(
             actor_id=7, victim_active=True, victim_actor=7, attacker_active=False
@@ -497,18 +631,21 @@ def test_demos_received_handler_skips_when_attacker_inactive():
     assert fa.per_player() == {}
 
 
-def test_demos_received_handler_cleans_up_on_delete():
-    h = DemosReceivedHandler(DEMOLISH_OID)
+def test_demos_received_state_cleared_on_delete():
+    h = DemosReceivedHandler()
+    route = _router(h)
     ctx = FrameContext()
-    ctx.car_actors.add(7)
     ctx.resolver.link_car_to_pri(7, 100)
     ctx.resolver.set_identity(100, "steam", "VICTIM")
 
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
-    h.on_deleted_actor(ctx, 7)
+    ctx.car_actors.add(7)
+    route(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
+    ctx.remove_actor(7)
     # After deletion, the next "active=True" should count as a NEW hit
     # (previous active state was cleared)
-    h.on_update(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
+    ctx.resolver.link_car_to_pri(7, 100)
+    ctx.car_actors.add(7)
+    route(ctx, _demolish(actor_id=7, victim_active=True, victim_actor=7))
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
     assert fa.per_player()[PlayerIdentity("steam", "VICTIM")].demos_received == 2
@@ -521,23 +658,26 @@ def _pickup(
     pickup_actor_id: int,
     instigator: int,
     picked_up_state: int,
-) -> UpdatedActor:
-    return {
-        "actor_id": pickup_actor_id,
-        "object_id": PICKUP_OID,
-        "attribute": {
-            "PickupNew": {"picked_up": picked_up_state, "instigator": instigator}
-        },
-    }
+) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": pickup_actor_id,
+            "object_id": PICKUP_OID,
+            "attribute": {
+                "PickupNew": {"picked_up": picked_up_state, "instigator": instigator}
+            },
+        }
+    )
 
 
 def test_boost_stats_handler_attributes_big_pad_to_team():
-    h = BoostStatsHandler(PICKUP_OID, tracked_team=0, big_pads=BIG_PADS)
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.actor_team[1] = 0  # team 0 player
     ctx.actor_position[1] = (-3072.0, -4096.0)  # on a big pad, defensive half
 
-    h.on_update(ctx, _pickup(pickup_actor_id=50, instigator=1, picked_up_state=1))
+    route(ctx, _pickup(pickup_actor_id=50, instigator=1, picked_up_state=1))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -548,12 +688,13 @@ def test_boost_stats_handler_attributes_big_pad_to_team():
 
 
 def test_boost_stats_handler_detects_stolen():
-    h = BoostStatsHandler(PICKUP_OID, tracked_team=0, big_pads=BIG_PADS)
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.actor_team[1] = 0
     ctx.actor_position[1] = (3072.0, 4096.0)  # on a big pad in opponent half (y > 0)
 
-    h.on_update(ctx, _pickup(50, instigator=1, picked_up_state=1))
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -564,28 +705,100 @@ def test_boost_stats_handler_detects_stolen():
 
 
 def test_boost_stats_handler_small_pad_when_far_from_big():
-    h = BoostStatsHandler(PICKUP_OID, tracked_team=0, big_pads=BIG_PADS)
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.actor_team[1] = 0
     ctx.actor_position[1] = (0.0, -1000.0)  # not near any big pad
 
-    h.on_update(ctx, _pickup(50, instigator=1, picked_up_state=1))
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert fa.team_boost_collected == 12
+
+
+def test_boost_stats_handler_classifies_each_pad_once():
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
+    ctx = FrameContext()
+    ctx.actor_team[1] = 0
+    ctx.actor_team[2] = 1
+    ctx.actor_position[1] = (-3000.0, -4000.0)  # jittery, still on the pad
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
+
+    # Later pickups come from the pad, not the instigator's position
+    ctx.actor_position[2] = (-2500.0, 100.0)
+    route(ctx, _pickup(50, instigator=2, picked_up_state=2))
+
+    assert ctx.pads[50].is_big and (ctx.pads[50].x, ctx.pads[50].y) == (-3072, -4096)
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert fa.team_boost_collected == 100
+    assert fa.opponent_boost_collected == 100
+    assert fa.team_boost_stolen == 0
+    assert fa.opponent_boost_stolen == 100
+
+
+def test_boost_stats_handler_halfway_big_pad_is_never_stolen():
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h, BIG_PAD_POSITIONS["standard"])
+    ctx = FrameContext()
+    ctx.actor_team[1] = 0
+    ctx.actor_position[1] = (3584.0, 150.0)  # over the line on the side pad
+
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert fa.team_boost_collected == 100
+    assert fa.team_boost_stolen == 0
+
 
+def test_boost_stats_handler_halfway_small_pad_is_never_stolen():
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
+    ctx = FrameContext()
+    ctx.actor_team[1] = 0
+    ctx.actor_team[2] = 1
+    ctx.actor_position[1] = (1010.0, 30.0)  # just past the line on (1024, 0)
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
+    ctx.actor_position[2] = (1040.0, -20.0)
+    route(ctx, _pickup(50, instigator=2, picked_up_state=2))
+
+    assert ctx.pads[50] == (1024, 0, False)
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
     assert fa.team_boost_collected == 12
+    assert fa.opponent_boost_collected == 12
+    assert fa.team_boost_stolen == 0
+    assert fa.opponent_boost_stolen == 0
+
+
+def test_boost_stats_handler_unlisted_small_pad_near_halfway_is_never_stolen():
+    h = BoostStatsHandler(tracked_team=0)
+    routes = _build_update_routes(_OBJ_IDS, [h], BIG_PADS, small_pads=())
+    ctx = FrameContext()
+    ctx.actor_team[1] = 0
+    ctx.actor_position[1] = (500.0, 30.0)
+
+    routes[PICKUP_OID](ctx, _pickup(50, instigator=1, picked_up_state=1))
+
+    assert ctx.pads[50].half is None
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert fa.team_boost_stolen == 0
 
 
 def test_boost_stats_handler_dedupes_same_pickup_state():
-    h = BoostStatsHandler(PICKUP_OID, tracked_team=0, big_pads=BIG_PADS)
+    h = BoostStatsHandler(tracked_team=0)
+    route = _router(h)
     ctx = FrameContext()
     ctx.actor_team[1] = 0
     ctx.actor_position[1] = (-3072.0, -4096.0)
 
-    h.on_update(ctx, _pickup(50, instigator=1, picked_up_state=1))
-    h.on_update(
-        ctx, _pickup(50, instigator=1, picked_up_state=1)
-    )  # same state -> ignored
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))
+    route(ctx, _pickup(50, instigator=1, picked_up_state=1))  # same state -> ignored
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -593,7 +806,7 @@ def test_boost_stats_handler_dedupes_same_pickup_state():
 
 
 def test_boost_stats_handler_returns_none_when_nothing_collected():
-    h = BoostStatsHandler(PICKUP_OID, tracked_team=0, big_pads=BIG_PADS)
+    h = BoostStatsHandler(tracked_team=0)
     ctx = FrameContext()
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -606,40 +819,44 @@ def test_boost_stats_handler_returns_none_when_nothing_collected():
 # -- MovementHandler --
 
 
-def _boost_amount(comp_id: int, amount: int) -> UpdatedActor:
-    return {
-        "actor_id": comp_id,
-        "object_id": BOOST_OID,
-        "attribute": {"ReplicatedBoost": {"boost_amount": amount}},
-    }
+def _boost_amount(comp_id: int, amount: int) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": comp_id,
+            "object_id": BOOST_OID,
+            "attribute": {"ReplicatedBoost": {"boost_amount": amount}},
+        }
+    )
 
 
 def _car_velocity(
     car_id: int, x: float = 0.0, y: float = 0.0, z: float = 0.0
-) -> UpdatedActor:
-    return {
-        "actor_id": car_id,
-        "object_id": RB_OID,
-        "attribute": {"RigidBody": {"linear_velocity": {"x": x, "y": y, "z": z}}},
-    }
+) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": car_id,
+            "object_id": RB_OID,
+            "attribute": {
+                "RigidBody": {
+                    "location": {"x": 0.0, "y": 0.0, "z": 17.0},
+                    "linear_velocity": {"x": x, "y": y, "z": z},
+                }
+            },
+        }
+    )
 
 
 def test_movement_handler_attributes_boost_consumption_on_delete():
-    h = MovementHandler(
-        rb_obj_id=RB_OID,
-        boost_obj_id=BOOST_OID,
-        pickup_obj_id=PICKUP_OID,
-        duration=300,
-        big_pads=BIG_PADS,
-    )
+    h = MovementHandler(boost_obj_id=BOOST_OID, duration=300)
+    route = _router(h)
     ctx = FrameContext(is_playing=True)
     ctx.boost_comp_actors.add(10)
     ctx.resolver.link_component_to_car(10, 1)
     ctx.resolver.link_car_to_pri(1, 100)
     ctx.resolver.set_identity(100, "steam", "PLAYER")
 
-    h.on_update(ctx, _boost_amount(10, 255))
-    h.on_update(ctx, _boost_amount(10, 200))  # 55 consumed
+    route(ctx, _boost_amount(10, 255))
+    route(ctx, _boost_amount(10, 200))  # 55 consumed
     h.on_deleted_actor(ctx, 10)
 
     fa = FrameAnalysis()
@@ -651,12 +868,13 @@ def test_movement_handler_attributes_boost_consumption_on_delete():
 
 
 def test_movement_handler_skips_boost_when_not_playing():
-    h = MovementHandler(RB_OID, BOOST_OID, PICKUP_OID, duration=300, big_pads=BIG_PADS)
+    h = MovementHandler(BOOST_OID, duration=300)
+    route = _router(h)
     ctx = FrameContext(is_playing=False)
     ctx.boost_comp_actors.add(10)
 
-    h.on_update(ctx, _boost_amount(10, 255))
-    h.on_update(ctx, _boost_amount(10, 200))
+    route(ctx, _boost_amount(10, 255))
+    route(ctx, _boost_amount(10, 200))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -664,18 +882,19 @@ def test_movement_handler_skips_boost_when_not_playing():
 
 
 def test_movement_handler_accumulates_speed_samples():
-    h = MovementHandler(RB_OID, BOOST_OID, PICKUP_OID, duration=60, big_pads=BIG_PADS)
+    h = MovementHandler(BOOST_OID, duration=60)
+    route = _router(h)
     ctx = FrameContext(is_playing=True)
     ctx.car_actors.add(1)
     ctx.resolver.link_car_to_pri(1, 100)
     ctx.resolver.set_identity(100, "steam", "PLAYER")
 
     ctx.frame_time = 0.0
-    h.on_update(ctx, _car_velocity(1, x=2300.0))  # supersonic
+    route(ctx, _car_velocity(1, x=2300.0))  # supersonic
     ctx.frame_time = 1.0
-    h.on_update(ctx, _car_velocity(1, x=2300.0))
+    route(ctx, _car_velocity(1, x=2300.0))
     ctx.frame_time = 2.0
-    h.on_update(ctx, _car_velocity(1, x=1000.0))
+    route(ctx, _car_velocity(1, x=1000.0))
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -690,30 +909,33 @@ def test_movement_handler_accumulates_speed_samples():
 
 
 def test_match_events_handler_emits_goal_event_with_game_time():
-    h = MatchEventsHandler(
-        sr_obj_id=SR_OID,
-        team_obj_id=TEAM_OID,
-        counter_obj_ids={GOALS_OID: "goal"},
-        tracked_team=0,
-        tracked_identities={("steam", "TRACKED")},
-    )
+    h = MatchEventsHandler(TEAM_OID, 0, tracked_identities={("steam", "TRACKED")})
+    route = _router(h)
     ctx = FrameContext()
     ctx.resolver.set_identity(5, "steam", "TRACKED")
 
     # Establish clock: starts at 300s, ticks down
-    h.on_update(ctx, {"actor_id": 0, "object_id": SR_OID, "attribute": {"Int": 300}})
+    route(
+        ctx,
+        decode_update({"actor_id": 0, "object_id": SR_OID, "attribute": {"Int": 300}}),
+    )
     # Team actor assignment for tracked player (PRI 5 -> team actor 200)
-    h.on_update(
+    route(
         ctx,
-        {
-            "actor_id": 5,
-            "object_id": TEAM_OID,
-            "attribute": {"ActiveActor": {"actor": 200}},
-        },
+        decode_update(
+            {
+                "actor_id": 5,
+                "object_id": TEAM_OID,
+                "attribute": {"ActiveActor": {"actor": 200}},
+            }
+        ),
     )
     # Player scores
     ctx.frame_time = 10.0
-    h.on_update(ctx, {"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 1}})
+    route(
+        ctx,
+        decode_update({"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 1}}),
+    )
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -725,16 +947,14 @@ def test_match_events_handler_emits_goal_event_with_game_time():
 
 
 def test_match_events_handler_emits_nothing_without_clock():
-    h = MatchEventsHandler(
-        sr_obj_id=SR_OID,
-        team_obj_id=TEAM_OID,
-        counter_obj_ids={GOALS_OID: "goal"},
-        tracked_team=0,
-        tracked_identities={("steam", "TRACKED")},
-    )
+    h = MatchEventsHandler(TEAM_OID, 0, tracked_identities={("steam", "TRACKED")})
+    route = _router(h)
     ctx = FrameContext()
     ctx.resolver.set_identity(5, "steam", "TRACKED")
-    h.on_update(ctx, {"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 1}})
+    route(
+        ctx,
+        decode_update({"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 1}}),
+    )
 
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
@@ -742,27 +962,272 @@ def test_match_events_handler_emits_nothing_without_clock():
 
 
 def test_match_events_handler_emits_multiple_when_counter_jumps():
-    h = MatchEventsHandler(
-        sr_obj_id=SR_OID,
-        team_obj_id=TEAM_OID,
-        counter_obj_ids={GOALS_OID: "goal"},
-        tracked_team=0,
-        tracked_identities={("steam", "TRACKED")},
-    )
+    h = MatchEventsHandler(TEAM_OID, 0, tracked_identities={("steam", "TRACKED")})
+    route = _router(h)
     ctx = FrameContext()
     ctx.resolver.set_identity(5, "steam", "TRACKED")
-    h.on_update(ctx, {"actor_id": 0, "object_id": SR_OID, "attribute": {"Int": 300}})
-    h.on_update(
+    route(
         ctx,
-        {
-            "actor_id": 5,
-            "object_id": TEAM_OID,
-            "attribute": {"ActiveActor": {"actor": 200}},
-        },
+        decode_update({"actor_id": 0, "object_id": SR_OID, "attribute": {"Int": 300}}),
+    )
+    route(
+        ctx,
+        decode_update(
+            {
+                "actor_id": 5,
+                "object_id": TEAM_OID,
+                "attribute": {"ActiveActor": {"actor": 200}},
+            }
+        ),
     )
     ctx.frame_time = 10.0
-    h.on_update(ctx, {"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 3}})
+    route(
+        ctx,
+        decode_update({"actor_id": 5, "object_id": GOALS_OID, "attribute": {"Int": 3}}),
+    )
     fa = FrameAnalysis()
     h.finalize(ctx, fa)
     assert len(fa.match_events) == 3
     assert all(e.event_type == "goal" for e in fa.match_events)
+
+
+# -- SpacingHandler --
+
+
+def _spacing_ctx(cars: dict[int, int]) -> FrameContext:
+    """A playing FrameContext with car actor -> team, car N being player "pN"."""
+    ctx = FrameContext(is_playing=True)
+    for car, team in cars.items():
+        ctx.car_actors.add(car)
+        ctx.resolver.link_car_to_pri(car, car + 100)
+        ctx.resolver.set_identity(car + 100, "steam", f"p{car}")
+        ctx.actor_team[car] = team
+    return ctx
+
+
+def test_spacing_handler_measures_nearest_teammate_and_shared_zone():
+    h = SpacingHandler()
+    route = _router(h)
+    ctx = _spacing_ctx({1: 0, 2: 0, 3: 0, 4: 1})
+    for i in range(101):  # 10 seconds
+        ctx.frame_time = i * 0.1
+        route(ctx, _rb_at(1, x=0.0, y=-3000.0))  # defensive zone
+        route(ctx, _rb_at(2, x=1000.0, y=-3000.0))  # 1000uu away, same zone
+        route(ctx, _rb_at(3, x=0.0, y=0.0))  # 3000uu away, neutral
+        route(ctx, _rb_at(4, x=0.0, y=-3000.0))  # alone on its team
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert fa.player_spacing.keys() == {
+        ("steam", "p1"),
+        ("steam", "p2"),
+        ("steam", "p3"),
+    }
+    p1, p3 = fa.player_spacing[("steam", "p1")], fa.player_spacing[("steam", "p3")]
+    assert p1.avg_teammate_distance == 1000.0
+    assert p1.shared_zone_seconds == pytest.approx(10.1)
+    assert p3.avg_teammate_distance == 3000.0
+    assert p3.shared_zone_seconds == 0.0
+
+
+def test_spacing_handler_ignores_stale_positions():
+    h = SpacingHandler()
+    route = _router(h)
+    ctx = _spacing_ctx({1: 0, 2: 0})
+    ctx.frame_time = 0.0
+    route(ctx, _rb_at(2, x=500.0, y=0.0))  # demolished straight away
+    for i in range(50):
+        ctx.frame_time = i * 0.1
+        route(ctx, _rb_at(1, x=0.0, y=0.0))
+    h.on_deleted_actor(ctx, 2)
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    p1 = fa.player_spacing[("steam", "p1")]
+    assert p1.avg_teammate_distance == 500.0
+    assert p1.shared_zone_seconds == pytest.approx(0.6)  # ticks until 0.5s stale
+
+
+# CPU seconds SpacingHandler may spend on one 10-minute 3v3 replay, several
+# times what it takes on a developer machine (~0.2s), and its finalize's share.
+_SPACING_REPLAY_BUDGET = 1.0
+_SPACING_FINALIZE_BUDGET = 0.25
+
+
+@pytest.mark.benchmark
+def test_spacing_handler_stays_within_per_replay_budget():
+    h = SpacingHandler()
+    route = _router(h)
+    ctx = _spacing_ctx({car: car % 2 for car in range(1, 7)})
+    updates = [
+        [_rb_at(car, x=100.0 * car, y=(i * car) % 8000 - 4000.0) for car in range(1, 7)]
+        for i in range(0, 18_000, 60)
+    ]
+    start = time.process_time()
+    for i in range(18_000):
+        ctx.frame_time = i / 30
+        for update in updates[i % len(updates)]:
+            route(ctx, update)
+    finalize_start = time.process_time()
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    end = time.process_time()
+
+    assert len(fa.player_spacing) == 6
+    assert end - finalize_start < _SPACING_FINALIZE_BUDGET, (
+        f"finalize took {end - finalize_start:.3f}s"
+    )
+    assert end - start < _SPACING_REPLAY_BUDGET, f"replay took {end - start:.3f}s"
+
+
+# -- GoalContextHandler --
+
+
+def _rb_at(actor_id: int, x: float, y: float, vx: float = 0.0) -> ActorUpdate:
+    return decode_update(
+        {
+            "actor_id": actor_id,
+            "object_id": RB_OID,
+            "attribute": {
+                "RigidBody": {
+                    "location": {"x": x, "y": y, "z": 17.0},
+                    "linear_velocity": {"x": vx, "y": 0.0, "z": 0.0},
+                }
+            },
+        }
+    )
+
+
+def _scored_on(team: int) -> ActorUpdate:
+    return decode_update(
+        {"actor_id": 3, "object_id": SCORED_OID, "attribute": {"Byte": team}}
+    )
+
+
+def test_ring_buffer_keeps_last_rows_in_order():
+    buf = RingBuffer(capacity=3, width=2)
+    assert buf.last() is None and buf.rows() == []
+    for i in range(5):
+        buf.push(i, i * 10)
+    assert len(buf) == 3
+    assert buf.rows() == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert buf.last() == (4.0, 40.0)
+
+
+def test_goal_context_handler_snapshots_recent_positions():
+    h = GoalContextHandler(SCORED_OID)
+    route = _router(h)
+    ctx = FrameContext()
+    ctx.car_actors.add(10)
+    ctx.ball_actors.add(20)
+    ctx.resolver.link_car_to_pri(10, 100)
+    ctx.resolver.set_identity(100, "steam", "abc")
+    ctx.actor_team[10] = 1
+    ctx.game_clock.append(0.0, 300)
+
+    # Ten minutes at 30 Hz; only the last few seconds are kept
+    for i in range(18_000):
+        ctx.frame_time = i / 30
+        route(ctx, _rb_at(10, x=float(i), y=0.0, vx=2000.0))
+        route(ctx, _rb_at(20, x=0.0, y=float(i)))
+        route(ctx, _rb_at(30, x=0.0, y=0.0))  # neither car nor ball
+    assert len(h.buffers) == 2
+    assert all(len(b) == b.capacity for b in h.buffers.values())
+    route(ctx, _scored_on(0))
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    (goal,) = fa.goal_snapshots
+    assert goal.team == 1
+    assert goal.game_seconds == 0  # clock never ticked
+    (car,) = goal.cars
+    assert car.identity == PlayerIdentity("steam", "abc") and car.team == 1
+    assert car.samples[-1] == TrajectorySample(0.0, 17_999.0, 0.0, 17.0, 2000.0)
+    assert -GOAL_CONTEXT_SECONDS <= car.samples[0].seconds < -2.8
+    assert all(
+        b.seconds - a.seconds >= GOAL_CONTEXT_INTERVAL - 1e-9
+        for a, b in zip(car.samples, car.samples[1:], strict=False)
+    )
+    assert goal.ball[-1].y == 17_999.0
+
+
+def test_goal_context_handler_drops_deleted_actors():
+    h = GoalContextHandler(SCORED_OID)
+    route = _router(h)
+    ctx = FrameContext()
+    ctx.ball_actors.add(20)
+    route(ctx, _rb_at(20, x=0.0, y=0.0))
+    h.on_deleted_actor(ctx, 20)
+    route(ctx, _scored_on(1))
+
+    fa = FrameAnalysis()
+    ctx.game_clock.append(0.0, 300)
+    h.finalize(ctx, fa)
+    assert fa.goal_snapshots[0].ball == ()
+    assert h.buffers == {}
+
+
+# -- HeatmapHandler --
+
+
+def test_heatmap_cell_orients_grid_from_own_goal():
+    own_corner = heatmap_cell(-4096.0, -5120.0, team=0)
+    assert own_corner == 0
+    assert heatmap_cell(4096.0, 5120.0, team=1) == own_corner
+    # Past the wall and into the opponent goal: clamped to the far edge cells
+    assert heatmap_cell(5000.0, 6000.0, team=0) == HEATMAP_COLUMNS * HEATMAP_ROWS - 1
+    assert heatmap_cell(0.0, 0.0, team=0) == (HEATMAP_ROWS // 2) * HEATMAP_COLUMNS + (
+        HEATMAP_COLUMNS // 2
+    )
+
+
+def test_heatmap_handler_time_weights_tracked_players_only():
+    h = HeatmapHandler(tracked_team=1, tracked_identities={("steam", "me")})
+    route = _router(h)
+    ctx = FrameContext(is_playing=True)
+    for car, pri, uid in ((10, 100, "me"), (11, 101, "them")):
+        ctx.car_actors.add(car)
+        ctx.resolver.link_car_to_pri(car, pri)
+        ctx.resolver.set_identity(pri, "steam", uid)
+
+    for t, y in ((0.0, 4000.0), (1.5, 4000.0), (2.0, 0.0), (10.0, 0.0)):
+        ctx.frame_time = t
+        route(ctx, _rb_at(10, x=0.0, y=y))
+        route(ctx, _rb_at(11, x=0.0, y=y))
+    assert 11 not in h.car_tracks  # known and untracked: never sampled
+    h.on_deleted_actor(ctx, 10)
+
+    fa = FrameAnalysis()
+    h.finalize(ctx, fa)
+    assert list(fa.player_heatmaps) == [("steam", "me")]
+    grid = fa.player_heatmaps[("steam", "me")]
+    near_own_goal = heatmap_cell(0.0, 4000.0, team=1)
+    assert grid[near_own_goal] == 2.0
+    assert sum(grid) == 2.0  # the 8s gap from t=2 isn't counted
+
+
+# -- GameClock --
+
+
+def test_game_clock_counts_up_from_first_value():
+    clock = GameClock()
+    clock.append(1.0, 300)
+    clock.append(2.0, 299)
+    clock.append(61.0, 240)
+
+    assert clock.game_seconds(0.5) == 0  # before the first update
+    assert clock.game_seconds(1.0) == 0
+    assert clock.game_seconds(1.9) == 0
+    assert clock.game_seconds(2.0) == 1
+    assert clock.game_seconds(100.0) == 60
+
+
+def test_game_clock_overtime_counts_past_regulation():
+    clock = GameClock()
+    clock.append(0.0, 300)
+    clock.append(300.0, 0)
+    clock.append(320.0, 0)  # overtime kickoff, clock still at 0
+    clock.append(335.0, 15)
+
+    assert clock.game_seconds(310.0) == 300
+    assert clock.game_seconds(340.0) == 315
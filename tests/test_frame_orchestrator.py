@@ -5,16 +5,30 @@ objects list required. The goal is to pin the three-phase ordering invariant
 so that a refactor of _process_frame fails here before it fails in fixtures.
 """
 
-from typing import Any, cast
+import dataclasses
+from typing import Any
 
+import pytest
+
+import frame_analysis
 from frame_analysis import (
     FrameAnalysis,
     FrameContext,
     FrameHandler,
+    FrameProfile,
+    Metric,
+    PadPickup,
+    SharedState,
+    _build_update_routes,  # type: ignore[reportPrivateUsage]
+    _FrameLoop,  # type: ignore[reportPrivateUsage]
     _FrameLoopObjectIds,  # type: ignore[reportPrivateUsage]
+    _object_ids,  # type: ignore[reportPrivateUsage]
     _process_frame,  # type: ignore[reportPrivateUsage]
+    _run_parallel,  # type: ignore[reportPrivateUsage]
+    analyze_frames,
+    project_frames,
 )
-from rrrocket_schema import FrameData, UpdatedActor
+from rrrocket_schema import ActorUpdate, RigidBody, decode_frame, parse
 
 _EMPTY_OBJ_IDS = _FrameLoopObjectIds(
     car_archetype=None,
@@ -35,8 +49,8 @@ class _SpyHandler(FrameHandler):
         self.update_obj_ids = frozenset({watch_obj_id}) if watch_obj_id else frozenset()
         self.calls: list[Any] = []
 
-    def on_update(self, ctx: FrameContext, actor: UpdatedActor) -> None:
-        self.calls.append(("on_update", actor["actor_id"]))
+    def on_update(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+        self.calls.append(("on_update", actor.actor_id))
 
     def on_deleted_actor(self, ctx: FrameContext, aid: int) -> None:
         self.calls.append(("on_deleted_actor", aid, ctx.resolver.resolve_car(aid)))
@@ -53,8 +67,8 @@ def test_deleted_actor_sees_identity_before_resolver_cleanup() -> None:
     ctx.resolver.set_identity(20, "steam", "abc123")
 
     spy = _SpyHandler()
-    frame = cast(FrameData, {"time": 1.0, "deleted_actors": [10]})
-    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, {}, [spy])
+    frame = decode_frame({"time": 1.0, "deleted_actors": [10]})
+    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, {}, [spy.on_deleted_actor])
 
     assert spy.calls == [("on_deleted_actor", 10, ("steam", "abc123"))]
     assert ctx.resolver.resolve_car(10) is None
@@ -82,8 +96,8 @@ def test_two_pass_deletion_second_actor_sees_first_in_same_frame() -> None:
                 car_present_when_boost_comp_notified.append(10 in ctx.car_actors)
 
     spy = BoostCompSpy()
-    frame = cast(FrameData, {"time": 1.0, "deleted_actors": [10, 11]})
-    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, {}, [spy])
+    frame = decode_frame({"time": 1.0, "deleted_actors": [10, 11]})
+    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, {}, [spy.on_deleted_actor])
 
     assert car_present_when_boost_comp_notified == [True]
     assert 10 not in ctx.car_actors
@@ -97,16 +111,397 @@ def test_updated_actors_processed_before_deleted_actors() -> None:
 
     ORDER_OID = 99
     spy = _SpyHandler(watch_obj_id=ORDER_OID)
-    frame = cast(
-        FrameData,
+    frame = decode_frame(
         {
             "time": 1.0,
             "updated_actors": [
                 {"actor_id": 10, "object_id": ORDER_OID, "attribute": {}}
             ],
             "deleted_actors": [10],
-        },
+        }
     )
-    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, {ORDER_OID: [spy]}, [spy])
+    routes = _build_update_routes(_EMPTY_OBJ_IDS, [spy])
+    _process_frame(ctx, frame, _EMPTY_OBJ_IDS, routes, [spy.on_deleted_actor])
 
     assert [c[0] for c in spy.calls] == ["on_update", "on_deleted_actor"]
+
+
+def test_shared_state_updated_before_handler_route() -> None:
+    """A handler subscribed to the RigidBody ID sees ctx.actor_position already set."""
+    RB_OID = 7
+    obj_ids = dataclasses.replace(_EMPTY_OBJ_IDS, rb_obj_id=RB_OID)
+    ctx = FrameContext()
+    seen: list[tuple[float, float] | None] = []
+
+    class PositionSpy(_SpyHandler):
+        def on_update(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+            seen.append(ctx.actor_position.get(actor.actor_id))
+
+    routes = _build_update_routes(obj_ids, [PositionSpy(watch_obj_id=RB_OID)])
+    frame = decode_frame(
+        {
+            "time": 1.0,
+            "updated_actors": [
+                {
+                    "actor_id": 10,
+                    "object_id": RB_OID,
+                    "attribute": {
+                        "RigidBody": {"location": {"x": 1.0, "y": 2.0, "z": 3.0}}
+                    },
+                }
+            ],
+        }
+    )
+    _process_frame(ctx, frame, obj_ids, routes, [])
+
+    assert seen == [(1.0, 2.0)]
+
+
+def test_pickup_decoded_once_for_all_subscribers() -> None:
+    """Every on_pickup subscriber gets the same decoded pickup; repeats are dropped."""
+    PICKUP_OID = 8
+    obj_ids = dataclasses.replace(_EMPTY_OBJ_IDS, pickup_obj_id=PICKUP_OID)
+    ctx = FrameContext()
+    ctx.actor_team[1] = 0
+    ctx.actor_position[1] = (0.0, 2000.0)
+
+    class PickupSpy(_SpyHandler):
+        def on_pickup(self, ctx: FrameContext, pickup: PadPickup) -> None:
+            self.calls.append(pickup)
+
+    spies = [PickupSpy(), PickupSpy()]
+    routes = _build_update_routes(obj_ids, spies)
+    pickup = {
+        "actor_id": 50,
+        "object_id": PICKUP_OID,
+        "attribute": {"PickupNew": {"picked_up": 1, "instigator": 1}},
+    }
+    for t in (1.0, 1.1):
+        frame = decode_frame({"time": t, "updated_actors": [pickup]})
+        _process_frame(ctx, frame, obj_ids, routes, [])
+
+    expected = [PadPickup(instigator=1, team=0, is_big=False, is_stolen=True)]
+    assert [spy.calls for spy in spies] == [expected, expected]
+
+
+def test_rigid_body_interval_decimates_stream_but_not_positions() -> None:
+    RB_OID = 7
+    obj_ids = dataclasses.replace(_EMPTY_OBJ_IDS, rb_obj_id=RB_OID)
+    ctx = FrameContext()
+    sampled: list[float] = []
+
+    class RigidBodySpy(_SpyHandler):
+        def on_rigid_body(self, ctx: FrameContext, aid: int, rb: RigidBody) -> None:
+            sampled.append(ctx.frame_time)
+
+    routes = _build_update_routes(obj_ids, [RigidBodySpy()], rigid_body_interval=0.25)
+    for i in range(31):
+        rb = {"location": {"x": 0.0, "y": float(i), "z": 0.0}}
+        frame = decode_frame(
+            {
+                "time": i / 30,
+                "updated_actors": [
+                    {
+                        "actor_id": 10,
+                        "object_id": RB_OID,
+                        "attribute": {"RigidBody": rb},
+                    }
+                ],
+            }
+        )
+        _process_frame(ctx, frame, obj_ids, routes, [])
+
+    assert [round(t * 30) for t in sampled] == [0, 8, 16, 24]
+    assert ctx.actor_position.get(10) == (0.0, 30.0)
+
+
+def test_object_ids_resolved_once_per_build() -> None:
+    objects = ["Archetypes.Car.Car_Default", "TAGame.RBActor_TA:ReplicatedRBState"]
+    first = _object_ids(parse({"objects": objects}))
+    second = _object_ids(parse({"objects": list(objects)}))
+
+    assert second is first
+    obj_ids, loop_obj_ids = first
+    assert obj_ids["TAGame.RBActor_TA:ReplicatedRBState"] == 1
+    assert loop_obj_ids.car_archetype == 0
+    assert loop_obj_ids.ball_archetype is None
+
+
+def test_project_frames_keeps_only_subscribed_actors() -> None:
+    CAR, OTHER_ARCHETYPE, RB, CHURN = 1, 2, 3, 4
+    raw: list[Any] = [
+        {
+            "time": 0.0,
+            "new_actors": [
+                {"actor_id": 10, "object_id": CAR},
+                {"actor_id": 11, "object_id": OTHER_ARCHETYPE},
+            ],
+        },
+        {
+            "time": 0.1,
+            "updated_actors": [
+                {"actor_id": 10, "object_id": CHURN, "attribute": {}},
+                {"actor_id": 12, "object_id": RB, "attribute": {}},
+            ],
+        },
+        {"time": 0.2, "deleted_actors": [11, 10]},
+        {"time": 0.3, "deleted_actors": [12]},
+    ]
+
+    projected = list(
+        project_frames(map(decode_frame, raw), frozenset({CAR}), frozenset({RB}))
+    )
+
+    assert [f.time for f in projected] == [0.0, 0.1, 0.2, 0.3]
+    assert [a.actor_id for a in projected[0].new_actors] == [10]
+    assert [a.actor_id for a in projected[1].updated_actors] == [12]
+    assert projected[2].deleted_actors == [10]
+    assert projected[3].deleted_actors == [12]
+
+
+def test_project_frames_drops_empty_frames_but_keeps_last() -> None:
+    RB = 3
+    raw: list[Any] = [
+        {
+            "time": 0.0,
+            "updated_actors": [{"actor_id": 1, "object_id": RB, "attribute": {}}],
+        },
+        {
+            "time": 0.1,
+            "updated_actors": [{"actor_id": 1, "object_id": 4, "attribute": {}}],
+        },
+        {"time": 0.2, "deleted_actors": [7]},
+        {"time": 0.3},
+    ]
+
+    projected = list(project_frames(map(decode_frame, raw), (), frozenset({RB})))
+
+    assert [(f.time, len(f.updated_actors)) for f in projected] == [
+        (0.0, 1),
+        (0.3, 0),
+    ]
+
+
+def _updates(oid: int, *actor_ids: int, t: float) -> dict[str, Any]:
+    return {
+        "time": t,
+        "updated_actors": [
+            {"actor_id": aid, "object_id": oid, "attribute": {"Int": 0}}
+            for aid in actor_ids
+        ],
+    }
+
+
+def test_run_parallel_feeds_every_loop_the_same_stream() -> None:
+    A, B = 1, 2
+    frames = [decode_frame(_updates(A, t, t=t)) for t in range(1000)]
+    frames.append(decode_frame(_updates(B, 5, t=1000.0)))
+    spy_a, spy_b = _SpyHandler(watch_obj_id=A), _SpyHandler(watch_obj_id=B)
+    loops = [
+        _FrameLoop(_EMPTY_OBJ_IDS, [spy_a], []),
+        _FrameLoop(_EMPTY_OBJ_IDS, [spy_b], []),
+    ]
+
+    _run_parallel(frames, loops)
+
+    assert spy_a.calls == [("on_update", aid) for aid in range(1000)]
+    assert spy_b.calls == [("on_update", 5)]
+    assert loops[0].ctx.frame_time == loops[1].ctx.frame_time == 1000.0
+
+
+def test_run_parallel_propagates_handler_errors() -> None:
+    class Broken(_SpyHandler):
+        def on_update(self, ctx: FrameContext, actor: ActorUpdate) -> None:
+            raise RuntimeError("boom")
+
+    frames = [decode_frame(_updates(1, 1, t=t)) for t in range(2000)]
+    loops = [
+        _FrameLoop(_EMPTY_OBJ_IDS, [Broken(watch_obj_id=1)], []),
+        _FrameLoop(_EMPTY_OBJ_IDS, [_SpyHandler(watch_obj_id=1)], []),
+    ]
+
+    with pytest.raises(RuntimeError, match="boom"):
+        _run_parallel(frames, loops)
+
+
+def _rb(aid: int, y: float) -> dict[str, Any]:
+    return {
+        "actor_id": aid,
+        "object_id": 2,
+        "attribute": {
+            "RigidBody": {
+                "location": {"x": 0.0, "y": y, "z": 0.0},
+                "linear_velocity": {"x": 1000.0, "y": 0.0, "z": 0.0},
+            }
+        },
+    }
+
+
+def test_parallel_handlers_match_sequential(monkeypatch: pytest.MonkeyPatch) -> None:
+    objects = [
+        "Archetypes.Ball.Ball_Default",
+        "Archetypes.Car.Car_Default",
+        "TAGame.RBActor_TA:ReplicatedRBState",
+        "TAGame.Ball_TA:HitTeamNum",
+        "TAGame.GameEvent_TA:ReplicatedRoundCountDownNumber",
+        "TAGame.VehiclePickup_TA:NewReplicatedPickupData",
+        "TAGame.Car_TA:TeamPaint",
+    ]
+    frames: list[Any] = [
+        {
+            "time": 0.0,
+            "new_actors": [
+                {"actor_id": 1, "object_id": 0},
+                {"actor_id": 2, "object_id": 1},
+            ],
+            "updated_actors": [
+                {"actor_id": 9, "object_id": 4, "attribute": {"Int": 0}},
+                {
+                    "actor_id": 2,
+                    "object_id": 6,
+                    "attribute": {"TeamPaint": {"team": 0}},
+                },
+            ],
+        }
+    ]
+    for i in range(1, 200):
+        frames.append(
+            {
+                "time": i * 0.1,
+                "updated_actors": [
+                    _rb(1, (i * 97) % 8000 - 4000.0),
+                    _rb(2, (i * 31) % 8000 - 4000.0),
+                    {"actor_id": 1, "object_id": 3, "attribute": {"Byte": i % 2}},
+                    {
+                        "actor_id": 50 + i % 7,
+                        "object_id": 5,
+                        "attribute": {
+                            "PickupNew": {"picked_up": i % 3, "instigator": 2}
+                        },
+                    },
+                ],
+            }
+        )
+    replay = parse({"objects": objects, "network_frames": {"frames": frames}})
+    sequential = analyze_frames(replay, 0, set(), 60, None)
+
+    runs: list[int] = []
+
+    def spy_run_parallel(frames: Any, loops: list[Any], record: Any = None) -> None:
+        runs.append(len(loops))
+        _run_parallel(frames, loops, record)
+
+    monkeypatch.setattr(frame_analysis, "free_threading_enabled", lambda: True)
+    monkeypatch.setattr(frame_analysis, "_run_parallel", spy_run_parallel)
+    parallel = analyze_frames(replay, 0, set(), 60, None, parallel_handlers=True)
+
+    assert runs == [2]
+    assert sequential.team_possession_seconds is not None
+    assert sequential.defensive_zone_seconds is not None
+    assert sequential.team_boost_collected
+    assert parallel == sequential
+
+
+def test_shared_state_skipped_when_no_handler_needs_it() -> None:
+    class NeedsNothing(_SpyHandler):
+        needs = SharedState(0)
+
+    class NeedsTeams(_SpyHandler):
+        needs = SharedState.TEAMS
+
+    obj_ids = dataclasses.replace(_EMPTY_OBJ_IDS, uid_obj_id=1, team_paint_obj_id=2)
+
+    assert _build_update_routes(obj_ids, [NeedsNothing()]) == {}
+    assert set(_build_update_routes(obj_ids, [NeedsTeams()])) == {2}
+
+
+def test_metrics_limit_handlers() -> None:
+    objects = [
+        "Archetypes.Ball.Ball_Default",
+        "TAGame.RBActor_TA:ReplicatedRBState",
+        "TAGame.Ball_TA:HitTeamNum",
+    ]
+    frames: list[Any] = [
+        {"time": 0.0, "new_actors": [{"actor_id": 1, "object_id": 0}]},
+        {
+            "time": 1.0,
+            "updated_actors": [
+                {"actor_id": 1, "object_id": 2, "attribute": {"Byte": 0}},
+                _rb(1, 3000.0),
+            ],
+        },
+        {"time": 2.0},
+    ]
+    replay = parse({"objects": objects, "network_frames": {"frames": frames}})
+
+    fa = analyze_frames(replay, 0, set(), 60, None, metrics={Metric.POSSESSION})
+
+    assert fa.team_possession_seconds == 1.0
+    assert fa.defensive_zone_seconds is None
+
+
+def test_sequential_loop_drops_spawns_no_handler_needs() -> None:
+    objects = [
+        "Archetypes.Ball.Ball_Default",
+        "Archetypes.Car.Car_Default",
+        "TAGame.RBActor_TA:ReplicatedRBState",
+        "TAGame.Ball_TA:HitTeamNum",
+    ]
+    frames: list[Any] = [
+        {
+            "time": 0.0,
+            "new_actors": [
+                {"actor_id": 1, "object_id": 0},
+                {"actor_id": 2, "object_id": 1},
+            ],
+        },
+        {"time": 1.0, "updated_actors": [_rb(1, 3000.0)]},
+    ]
+    replay = parse({"objects": objects, "network_frames": {"frames": frames}})
+    seen: list[Any] = []
+
+    analyze_frames(
+        replay, 0, set(), 60, None, metrics={Metric.BALL_ZONES}, record=seen.append
+    )
+
+    # Ball zones track balls, not cars
+    assert [a.actor_id for f in seen for a in f.new_actors] == [1]
+
+
+def test_profile_times_handler_hooks_and_counts_updates() -> None:
+    objects = [
+        "Archetypes.Ball.Ball_Default",
+        "TAGame.Ball_TA:HitTeamNum",
+        "TAGame.RBActor_TA:ReplicatedRBState",
+        "TAGame.Car_TA:TeamPaint",
+    ]
+    frames: list[Any] = [
+        {"time": 0.0, "new_actors": [{"actor_id": 1, "object_id": 0}]},
+        {
+            "time": 1.0,
+            "updated_actors": [
+                {"actor_id": 1, "object_id": 1, "attribute": {"Byte": 0}},
+                {"actor_id": 7, "object_id": 3, "attribute": {"TeamPaint": {}}},
+                _rb(1, 3000.0),
+            ],
+        },
+        {"time": 2.0, "updated_actors": [_rb(1, 0.0)]},
+    ]
+    replay = parse({"objects": objects, "network_frames": {"frames": frames}})
+    profile = FrameProfile()
+
+    fa = analyze_frames(
+        replay, 0, set(), 60, None, metrics={Metric.POSSESSION}, profile=profile
+    )
+
+    assert fa.team_possession_seconds == 1.0
+    assert profile.frames == 3
+    assert profile.hooks["PossessionHandler", "on_update"].calls == 1
+    assert profile.hooks["PossessionHandler", "finalize"].calls == 1
+    # Updates nothing reads are still counted
+    assert profile.updates_by_object == {
+        "TAGame.RBActor_TA:ReplicatedRBState": 2,
+        "TAGame.Ball_TA:HitTeamNum": 1,
+        "TAGame.Car_TA:TeamPaint": 1,
+    }
+    assert any("PossessionHandler" in line for line in profile.report())
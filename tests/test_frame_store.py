@@ -0,0 +1,174 @@
+from pathlib import Path
+from typing import Any
+
+import frame_store
+from frame_analysis import analyze_frames
+from frame_store import FrameStore
+from rrrocket_schema import (
+    ActorSpawn,
+    ActorUpdate,
+    Demolish,
+    Frame,
+    Pickup,
+    RigidBody,
+    Vector3,
+    parse,
+)
+
+_OBJECTS = [
+    "Archetypes.Ball.Ball_Default",
+    "Archetypes.Car.Car_Default",
+    "TAGame.RBActor_TA:ReplicatedRBState",
+    "TAGame.Ball_TA:HitTeamNum",
+    "TAGame.VehiclePickup_TA:NewReplicatedPickupData",
+    "TAGame.Car_TA:TeamPaint",
+    "Engine.Actor:bHidden",
+]
+
+
+def _rb(aid: int, y: float) -> dict[str, Any]:
+    return {
+        "actor_id": aid,
+        "object_id": 2,
+        "attribute": {
+            "RigidBody": {
+                "location": {"x": 0.0, "y": y, "z": 17.5},
+                "linear_velocity": {"x": 1000.0, "y": 0.0, "z": 0.0},
+            }
+        },
+    }
+
+
+def _replay(guid: str = "GUID") -> Any:
+    frames: list[Any] = [
+        {
+            "time": 0.0,
+            "new_actors": [
+                {"actor_id": 1, "object_id": 0},
+                {"actor_id": 2, "object_id": 1},
+            ],
+            "updated_actors": [
+                {"actor_id": 2, "object_id": 5, "attribute": {"TeamPaint": {"team": 0}}}
+            ],
+        }
+    ]
+    for i in range(1, 100):
+        frames.append(
+            {
+                "time": i * 0.1,
+                "updated_actors": [
+                    _rb(1, (i * 97) % 8000 - 4000.0),
+                    _rb(2, (i * 31) % 8000 - 4000.0),
+                    {"actor_id": 1, "object_id": 3, "attribute": {"Byte": i % 2}},
+                    {"actor_id": 1, "object_id": 6, "attribute": {"Boolean": False}},
+                    {
+                        "actor_id": 50 + i % 7,
+                        "object_id": 4,
+                        "attribute": {
+                            "PickupNew": {"picked_up": i % 3, "instigator": 2}
+                        },
+                    },
+                ],
+                "deleted_actors": [2] if i == 99 else [],
+            }
+        )
+    return parse(
+        {
+            "properties": {"MatchGUID": guid, "TeamSize": 3},
+            "objects": _OBJECTS,
+            "network_frames": {"frames": frames},
+        }
+    )
+
+
+def _store(store: FrameStore, replay: Any, frames: list[Frame]) -> None:
+    with store.writer(replay) as record:
+        for frame in frames:
+            record(frame)
+
+
+def test_round_trips_every_value_kind(tmp_path: Path):
+    store = FrameStore(tmp_path / "frames")
+    frames = [
+        Frame(0.0, [ActorSpawn(1, 0), ActorSpawn(2, None)], [], []),
+        Frame(
+            0.5,
+            [],
+            [
+                ActorUpdate(1, 2, RigidBody(Vector3(1.5, -2.25, 3.0), None)),
+                ActorUpdate(
+                    2, 2, RigidBody(Vector3(0.0, 0.0, 0.0), Vector3(2300.0, 0, 1))
+                ),
+                ActorUpdate(3, 3, 255),
+                ActorUpdate(4, 4, Pickup(instigator=None, picked_up=1)),
+                ActorUpdate(5, None, Demolish(True, False, 9, True)),
+                ActorUpdate(6, 5, {"remote_id": {"Epic": "abc"}}),
+                ActorUpdate(7, 5, None),
+            ],
+            [1, 2],
+        ),
+        Frame(1.0, [], [], []),
+    ]
+    replay = _replay()
+    _store(store, replay, frames)
+
+    loaded = store.load("GUID")
+
+    assert loaded is not None
+    assert loaded.match_guid == "GUID"
+    assert loaded.properties == replay.properties
+    assert loaded.object_index == replay.object_index
+    assert list(loaded.frames) == frames
+
+
+def test_backfill_matches_analysis_of_the_replay(tmp_path: Path):
+    store = FrameStore(tmp_path / "frames")
+    replay = _replay()
+    with store.writer(replay) as record:
+        expected = analyze_frames(replay, 0, set(), 60, None, record=record)
+
+    loaded = store.load("GUID")
+    reloaded = store.load("GUID")
+
+    assert loaded is not None and reloaded is not None
+    # Only the updates the handlers read are kept
+    stored = sum(len(f.updated_actors) for f in reloaded.frames)
+    assert stored < sum(len(f.updated_actors) for f in _replay().frames)
+    assert analyze_frames(loaded, 0, set(), 60, None) == expected
+    assert expected.team_possession_seconds is not None
+    assert expected.team_boost_collected
+
+
+def test_failed_write_keeps_previous_entry(tmp_path: Path):
+    store = FrameStore(tmp_path / "frames")
+    replay = _replay()
+    _store(store, replay, [Frame(0.0, [], [], [])])
+
+    try:
+        with store.writer(replay) as record:
+            record(Frame(1.0, [], [], []))
+            raise RuntimeError("analysis broke")
+    except RuntimeError:
+        pass
+
+    loaded = store.load("GUID")
+    assert loaded is not None
+    assert [f.time for f in loaded.frames] == [0.0]
+    assert not list((tmp_path / "frames").glob("*.tmp"))
+
+
+def test_missing_or_outdated_entries_are_ignored(tmp_path: Path, monkeypatch: Any):
+    store = FrameStore(tmp_path / "frames")
+    assert store.load("GUID") is None
+
+    _store(store, _replay(), [])
+    monkeypatch.setattr(frame_store, "STORE_VERSION", frame_store.STORE_VERSION + 1)
+    assert store.load("GUID") is None
+
+
+def test_match_guid_does_not_pick_the_path(tmp_path: Path):
+    store = FrameStore(tmp_path / "frames")
+    _store(store, _replay("../escape"), [])
+
+    assert "../escape" in store
+    assert [p.parent for p in (tmp_path / "frames").iterdir()] == [tmp_path / "frames"]
@@ -1,21 +1,37 @@
 import copy
+import json
 import sqlite3
 from typing import cast
 
 import pytest
 
-from frame_analysis import MatchEvent, analyze_frames
+from frame_analysis import (
+    HEATMAP_COLUMNS,
+    HEATMAP_ROWS,
+    CarTrajectory,
+    GoalSnapshot,
+    MatchEvent,
+    Metric,
+    PlayerSpacing,
+    PlayerZonesHandler,
+    TrajectorySample,
+    analyze_frames,
+)
 from ingest import (
+    AnalysisStatus,
     MatchPerspective,
     OffensivePairing,
     SkipReason,
     analyze_replay,
     correlate_pairings,
+    decode_heatmap,
     get_or_create_player,
     resolve_perspective,
+    stale_metrics,
     sync_tracked_players,
     validate_replay,
     write_match,
+    write_metrics,
 )
 from player_identity import PlayerIdentity
 from rrrocket_schema import PlayerStatEntry, ReplayJSON, ReplayProperties
@@ -293,6 +309,165 @@ def test_match_events_stored_in_db():
     assert len(goals) == 9
 
 
+def test_write_metrics_overwrites_only_selected_metrics():
+    conn = ingest_fixture("match.json")
+    possession = conn.execute("SELECT team_possession_seconds FROM matches").fetchone()
+    events = conn.execute("SELECT COUNT(*) FROM match_events").fetchone()
+    conn.execute("DELETE FROM match_events")
+
+    analysis = analyze_replay(
+        parse_replay(load_replay("match.json")),
+        TRACKED_PLAYERS,
+        metrics={Metric.MATCH_EVENTS},
+    )
+    assert analysis is not None
+    assert analysis.frame_analysis.team_possession_seconds is None
+    assert write_metrics(conn, analysis, {Metric.MATCH_EVENTS})
+
+    assert conn.execute("SELECT COUNT(*) FROM match_events").fetchone() == events
+    assert (
+        conn.execute("SELECT team_possession_seconds FROM matches").fetchone()
+        == possession
+    )
+
+
+def test_write_metrics_skips_matches_not_ingested():
+    analysis = analyze_replay(
+        parse_replay(load_replay("match.json")),
+        TRACKED_PLAYERS,
+        metrics={Metric.POSSESSION},
+    )
+    assert analysis is not None
+    conn = in_memory_db()
+    assert not write_metrics(conn, analysis, {Metric.POSSESSION})
+    assert conn.execute("SELECT COUNT(*) FROM matches").fetchone() == (0,)
+
+
+_ME = PlayerIdentity("epic", "abc")
+_SCOREBOARD: ReplayJSON = {
+    "properties": {
+        "MatchGUID": "ABC",
+        "MatchStartEpoch": 1700000000,
+        "Team0Score": 1,
+        "Team1Score": 0,
+        "WinningTeam": 0,
+        "PlayerStats": [
+            {
+                "Name": "Me",
+                "Team": 0,
+                "Platform": {"value": "OnlinePlatform_Epic"},
+                "PlayerID": {"fields": {"EpicAccountId": "abc"}},
+            }
+        ],
+    }
+}
+
+
+def test_stale_metrics_follow_handler_versions(monkeypatch: pytest.MonkeyPatch):
+    conn = in_memory_db()
+    analysis = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert analysis is not None
+    write_match(conn, analysis)
+    assert stale_metrics(conn) == {}
+
+    monkeypatch.setattr(PlayerZonesHandler, "version", 2)
+    assert stale_metrics(conn) == {"ABC": frozenset({Metric.PLAYER_ZONES})}
+
+    assert write_metrics(conn, analysis, {Metric.PLAYER_ZONES})
+    assert stale_metrics(conn) == {}
+
+
+def test_decimated_metrics_are_stale():
+    conn = in_memory_db()
+    decimated = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"}, rigid_body_hz=10)
+    assert decimated is not None
+    write_match(conn, decimated)
+    assert stale_metrics(conn) == {"ABC": frozenset(Metric)}
+
+    full = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert full is not None
+    assert write_metrics(conn, full, {Metric.PLAYER_ZONES})
+    assert stale_metrics(conn) == {"ABC": frozenset(Metric) - {Metric.PLAYER_ZONES}}
+
+
+def test_pending_matches_are_not_stale():
+    conn = in_memory_db()
+    analysis = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert analysis is not None
+    write_match(conn, analysis, AnalysisStatus.PENDING)
+
+    assert stale_metrics(conn) == {}
+    assert conn.execute("SELECT COUNT(*) FROM match_metric_versions").fetchone() == (0,)
+
+
+def test_goal_snapshots_store_trajectories_of_known_players():
+    conn = in_memory_db()
+    analysis = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert analysis is not None
+    sample = TrajectorySample(-0.5, 10.4, -20.6, 17.0, 1399.7)
+    analysis.frame_analysis.goal_snapshots = [
+        GoalSnapshot(
+            game_seconds=42.0,
+            team=0,
+            ball=(sample,),
+            cars=(
+                CarTrajectory(_ME, 0, (sample,)),
+                CarTrajectory(PlayerIdentity("epic", "stranger"), 1, (sample,)),
+            ),
+        )
+    ]
+    write_match(conn, analysis)
+
+    (game_seconds, team, trajectories), *rest = conn.execute(
+        "SELECT game_seconds, team, trajectories FROM goal_snapshots"
+    ).fetchall()
+    assert rest == []
+    (my_id,) = conn.execute("SELECT id FROM players WHERE name = 'Me'").fetchone()
+    row = [-0.5, 10, -21, 17, 1400]
+    assert (game_seconds, team) == (42.0, 0)
+    assert json.loads(trajectories) == {
+        "ball": [row],
+        "cars": [{"player_id": my_id, "team": 0, "samples": [row]}],
+    }
+
+    # Rewriting the match replaces its snapshots
+    analysis.frame_analysis.goal_snapshots = []
+    write_metrics(conn, analysis, {Metric.GOAL_CONTEXT})
+    assert conn.execute("SELECT COUNT(*) FROM goal_snapshots").fetchone() == (0,)
+
+
+def test_heatmaps_are_stored_per_match_player():
+    conn = in_memory_db()
+    analysis = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert analysis is not None
+    grid = tuple(float(i % 7) / 4 for i in range(HEATMAP_COLUMNS * HEATMAP_ROWS))
+    analysis.frame_analysis.player_heatmaps = {_ME: grid}
+    write_match(conn, analysis)
+
+    (blob,) = conn.execute("SELECT heatmap FROM match_players").fetchone()
+    assert len(blob) == 4 * len(grid)
+    assert tuple(decode_heatmap(blob)) == grid
+
+    analysis.frame_analysis.player_heatmaps = {}
+    write_metrics(conn, analysis, {Metric.HEATMAPS})
+    assert conn.execute("SELECT heatmap FROM match_players").fetchone() == (None,)
+
+
+def test_spacing_is_stored_next_to_zone_seconds():
+    conn = in_memory_db()
+    analysis = analyze_replay(parse_replay(_SCOREBOARD), {_ME: "Me"})
+    assert analysis is not None
+    analysis.frame_analysis.player_spacing = {_ME: PlayerSpacing(1234.5, 42.1)}
+    write_match(conn, analysis)
+
+    columns = "SELECT avg_teammate_distance, shared_zone_seconds FROM match_players"
+    assert conn.execute(columns).fetchone() == (1234.5, 42.1)
+
+    analysis.frame_analysis.player_spacing = {}
+    write_metrics(conn, analysis, {Metric.SPACING})
+    assert conn.execute(columns).fetchone() == (None, None)
+
+
 def test_match_events_have_valid_players():
     conn = ingest_fixture("match.json")
     rows = conn.execute("""
@@ -1,12 +1,47 @@
+import hashlib
 import json
+import os
 import sqlite3
+import struct
 import subprocess
 import threading
+import time
 from pathlib import Path
 from typing import Any
 from unittest.mock import MagicMock, patch
 
-from process import UploadProcessor, parse_replay, process_batch, process_replay
+import pytest
+
+import frame_analysis
+from frame_analysis import MovementHandler
+from frame_store import FrameStore
+from ingest import (
+    analyze_replay,
+    is_ingested,
+    is_known_replay,
+    record_replay_file,
+    stale_metrics,
+    write_match,
+)
+from player_identity import PlayerIdentity
+from process import (
+    RrrocketError,
+    UploadProcessor,
+    _map_supervised,
+    _parse_and_analyze,
+    iter_replays,
+    parse_replay,
+    parse_replay_headers,
+    parse_replays,
+    process_batch,
+    process_replay,
+    publish_headers,
+    reprocess_stale,
+    sniff_match_guid,
+    stream_replay,
+)
+from replay_cache import ReplayCache
+from rrrocket_schema import ParsedReplay
 from rrrocket_schema import parse as parse_rrrocket
 from tests.fixtures import (
     TEST_DATA_DIR,
@@ -58,6 +93,179 @@ def test_parse_replay_failure(tmp_path: Path):
     assert not replay_path.exists()
 
 
+def test_parse_replay_cache_hit_skips_rrrocket(tmp_path: Path):
+    """A second parse of the same bytes is served from the cache."""
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    cache = ReplayCache(tmp_path / "cache")
+    stdout = b'{"properties": {"MatchGUID": "ABC"}}'
+
+    with (
+        patch("process.rrrocket_version", return_value="rrrocket 0.11.4"),
+        patch(
+            "process.subprocess.run",
+            return_value=subprocess.CompletedProcess(["rrrocket"], 0, stdout=stdout),
+        ) as run,
+    ):
+        first, _ = parse_replay(replay_path, cache)
+        second, error = parse_replay(replay_path, cache)
+
+    assert run.call_count == 1
+    assert error is None
+    assert second == first
+    assert second is not None and second.match_guid == "ABC"
+
+
+def test_parse_replay_cache_miss_after_rrrocket_upgrade(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    cache = ReplayCache(tmp_path / "cache")
+    done = subprocess.CompletedProcess(["rrrocket"], 0, stdout=b'{"properties": {}}')
+
+    with patch("process.subprocess.run", return_value=done) as run:
+        with patch("process.rrrocket_version", return_value="rrrocket 0.11.4"):
+            parse_replay(replay_path, cache)
+        with patch("process.rrrocket_version", return_value="rrrocket 0.12.0"):
+            parse_replay(replay_path, cache)
+
+    assert run.call_count == 2
+
+
+_STREAM_DOC = {
+    "properties": {"MatchGUID": "ABC"},
+    "network_frames": {
+        "frames": [
+            {"time": 0.0, "delta": 0.0, "new_actors": [], "updated_actors": []},
+            {"time": 0.03, "delta": 0.03, "new_actors": [], "updated_actors": []},
+        ]
+    },
+    "objects": ["Archetypes.Ball.Ball_Default"],
+}
+
+
+def _fake_rrrocket_stream(tmp_path: Path, doc: dict[str, Any]):
+    """Patch rrrocket so the header run returns doc minus frames and the
+    streamed -n run pipes the full doc through a real subprocess."""
+    output = tmp_path / "rrrocket_output.json"
+    output.write_text(json.dumps(doc))
+    header = dict(doc, network_frames=None)
+    real_popen = subprocess.Popen
+
+    def fake_popen(args: Any, **kwargs: Any):
+        return real_popen(["cat", str(output)], **kwargs)
+
+    run = patch(
+        "process.subprocess.run",
+        return_value=subprocess.CompletedProcess(
+            ["rrrocket"], 0, stdout=json.dumps(header).encode()
+        ),
+    )
+    popen = patch("process.subprocess.Popen", side_effect=fake_popen)
+    return run, popen
+
+
+def test_stream_replay_matches_full_parse(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    run, popen = _fake_rrrocket_stream(tmp_path, _STREAM_DOC)
+
+    with run, popen:
+        replay, error = stream_replay(replay_path)
+        assert error is None
+        assert replay is not None
+        frames = list(replay.frames)
+
+    expected = parse_rrrocket(_STREAM_DOC)  # pyright: ignore[reportArgumentType]
+    assert frames == expected.frames
+    assert replay.match_guid == "ABC"
+    assert replay.object_index == expected.object_index
+
+
+def test_stream_replay_populates_cache_once_consumed(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    cache = ReplayCache(tmp_path / "cache")
+    run, popen = _fake_rrrocket_stream(tmp_path, _STREAM_DOC)
+
+    with run, popen as p, patch("process.rrrocket_version", return_value="v1"):
+        replay, _ = stream_replay(replay_path, cache)
+        assert replay is not None
+        first = list(replay.frames)
+        # The full document was teed into the cache: both a streamed and a
+        # whole-document parse are now served without rrrocket.
+        again, _ = stream_replay(replay_path, cache)
+        assert again is not None
+        assert list(again.frames) == first
+        full, _ = parse_replay(replay_path, cache)
+        assert full is not None
+        assert full.frames == first
+
+    assert p.call_count == 1
+
+
+def test_stream_replay_timeout_stops_once_output_starts(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    run, popen = _fake_rrrocket_stream(tmp_path, _STREAM_DOC)
+    timer = MagicMock()
+
+    with run, popen, patch("process.threading.Timer", return_value=timer):
+        replay, _ = stream_replay(replay_path)
+        assert replay is not None
+        # rrrocket has parsed the replay by now; slow frame consumers must
+        # not be able to trip its timeout.
+        timer.cancel.assert_called_once()
+        list(replay.frames)
+
+
+def test_stream_replay_truncated_output_raises(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    cache = ReplayCache(tmp_path / "cache")
+    run, popen = _fake_rrrocket_stream(tmp_path, _STREAM_DOC)
+    output = tmp_path / "rrrocket_output.json"
+    text = output.read_text()
+    output.write_text(text[: text.index('"time": 0.03')])
+
+    with run, popen, patch("process.rrrocket_version", return_value="v1"):
+        replay, _ = stream_replay(replay_path, cache)
+        assert replay is not None
+        with pytest.raises(RrrocketError):
+            list(replay.frames)
+
+    # A broken stream must not leave a partial cache entry behind.
+    assert cache.get(cache.key_for(replay_path, "v1")) is None
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+
+def test_parse_replays_with_headers_decodes_frames_from_output(tmp_path: Path):
+    replay_path = tmp_path / "test.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    cache = ReplayCache(tmp_path / "cache")
+    header = parse_rrrocket(dict(_STREAM_DOC, network_frames=None))  # pyright: ignore[reportArgumentType]
+    done = subprocess.CompletedProcess(
+        ["rrrocket"], 0, stdout=json.dumps(_STREAM_DOC).encode()
+    )
+
+    with (
+        patch("process.subprocess.run", return_value=done) as run,
+        patch("process.rrrocket_version", return_value="v1"),
+        patch("process.orjson.loads", side_effect=AssertionError("no dict tree")),
+    ):
+        fresh, _ = parse_replays([replay_path], cache, {replay_path: header})[
+            replay_path
+        ]
+        cached, _ = parse_replays([replay_path], cache, {replay_path: header})[
+            replay_path
+        ]
+
+    expected = parse_rrrocket(_STREAM_DOC)  # pyright: ignore[reportArgumentType]
+    assert run.call_count == 1
+    for replay in (fresh, cached):
+        assert replay is not None and replay.match_guid == "ABC"
+        assert list(replay.frames) == expected.frames
+
+
 def test_process_replay_success(tmp_path: Path):
     """process_replay parses and ingests a replay without writing a marker."""
     conn = _make_conn()
@@ -78,6 +286,8 @@ def test_process_replay_success(tmp_path: Path):
     conn.commit()
     row = conn.execute("SELECT COUNT(*) FROM matches").fetchone()
     assert row[0] == 1
+    recorded = conn.execute("SELECT match_guid FROM replay_files").fetchall()
+    assert recorded == [(replay_data["properties"]["MatchGUID"],)]
     # Marker is NOT written by process_replay; process_batch handles it after commit
     assert not (tmp_path / "test.replay.ingested").exists()
 
@@ -94,6 +304,7 @@ def test_process_replay_ingest_failure(tmp_path: Path):
 
     with (
         patch("process.subprocess.run", side_effect=fake_rrrocket),
+        patch("process.validate_replay", return_value=None),
         patch("process.analyze_replay", return_value=MagicMock()),
         patch("process.write_match", side_effect=RuntimeError("ingest broke")),
     ):
@@ -106,6 +317,48 @@ def test_process_replay_ingest_failure(tmp_path: Path):
     assert not (tmp_path / "bad.replay.ingested").exists()
 
 
+def test_process_replay_rrrocket_failure_leaves_upload_retryable(tmp_path: Path):
+    """A replay rrrocket couldn't read isn't remembered as a known file."""
+    conn = _make_conn()
+    replay_path = tmp_path / "corrupt.replay"
+    content = b"\x00" * 1024
+    replay_path.write_bytes(content)
+
+    failed = subprocess.CompletedProcess(["rrrocket"], 1, stderr=b"parse error")
+    with patch("process.subprocess.run", return_value=failed):
+        success, _ = process_replay(replay_path, conn, TRACKED_PLAYERS)
+
+    assert success is False
+    assert not replay_path.exists()
+    assert not is_known_replay(conn, hashlib.sha256(content).hexdigest(), None)
+    assert conn.execute("SELECT COUNT(*) FROM replay_files").fetchone()[0] == 0
+
+
+def test_upload_processor_forgets_failed_uploads(tmp_path: Path):
+    """A queued upload whose analysis fails can be uploaded again."""
+    db_path = file_db(tmp_path)
+    replay_path = tmp_path / "corrupt.replay"
+    content = b"\x00" * 1024
+    replay_path.write_bytes(content)
+    digest = hashlib.sha256(content).hexdigest()
+    conn = sqlite3.connect(db_path)
+    record_replay_file(conn, digest, None)  # as the upload route does
+    conn.commit()
+    assert is_known_replay(conn, digest, None)
+
+    failed = subprocess.CompletedProcess(["rrrocket"], 1, stderr=b"parse error")
+    with patch("process.subprocess.run", return_value=failed):
+        proc = UploadProcessor(db_path, TRACKED_PLAYERS, delay=60)
+        proc.enqueue(replay_path)
+        proc.flush()
+        proc.join()
+
+    try:
+        assert not is_known_replay(conn, digest, None)
+    finally:
+        conn.close()
+
+
 def test_process_replay_skipped(tmp_path: Path):
     """When analyze_replay returns None, returns True (sentinel will be written)."""
     conn = _make_conn()
@@ -129,6 +382,245 @@ def test_process_replay_skipped(tmp_path: Path):
     assert row[0] == 0
 
 
+_ME = PlayerIdentity("epic", "abc")
+_HEADER = {
+    "properties": {
+        "MatchGUID": "ABC",
+        "MatchStartEpoch": "1700000000",
+        "PlayerStats": [
+            {
+                "Platform": {"value": "OnlinePlatform_Epic"},
+                "PlayerID": {"fields": {"EpicAccountId": "abc"}},
+            }
+        ],
+    }
+}
+
+
+def _header_only_rrrocket(args: Any, **kwargs: Any):
+    assert "-n" not in args, "network parse should have been skipped"
+    return subprocess.CompletedProcess(args, 0, stdout=json.dumps(_HEADER).encode())
+
+
+def test_process_replay_skips_network_parse_without_tracked_players(tmp_path: Path):
+    conn = _make_conn()
+    replay_path = tmp_path / "other.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+
+    with patch("process.subprocess.run", side_effect=_header_only_rrrocket) as run:
+        success, error = process_replay(replay_path, conn, TRACKED_PLAYERS)
+
+    assert (success, error) == (True, None)
+    assert run.call_count == 1
+
+
+def test_process_replay_skips_network_parse_when_already_ingested(tmp_path: Path):
+    conn = _make_conn()
+    replay_path = tmp_path / "dupe.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+
+    with (
+        patch("process.subprocess.run", side_effect=_header_only_rrrocket) as run,
+        patch("process.is_ingested", return_value=True) as ingested,
+    ):
+        success, error = process_replay(replay_path, conn, {_ME: "Me"})
+
+    assert (success, error) == (True, None)
+    assert run.call_count == 1
+    ingested.assert_called_once_with(conn, "ABC")
+
+
+def test_parse_and_analyze_skips_known_hashes(tmp_path: Path):
+    replay_path = tmp_path / "dupe.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+
+    with patch("process.subprocess.run", side_effect=_header_only_rrrocket) as run:
+        analyses = _parse_and_analyze(
+            [replay_path], {_ME: "Me"}, known_hashes=frozenset({"ABC"})
+        )
+
+    assert analyses == [None]
+    assert run.call_count == 1
+    assert replay_path.exists()
+
+
+def _header_with_properties(*props: bytes) -> bytes:
+    header = b"".join(props)
+    return struct.pack("<iI", len(header), 0) + header + b"content"
+
+
+def _str_property(name: str, value: str) -> bytes:
+    def fstring(s: str) -> bytes:
+        return struct.pack("<i", len(s) + 1) + s.encode() + b"\0"
+
+    return fstring(name) + fstring("StrProperty") + bytes(8) + fstring(value)
+
+
+def _crash_on_poison(paths: list[Path]) -> list[None]:
+    if any(p.name == "poison.replay" for p in paths):
+        os._exit(1)  # as if OOM-killed
+    return [None] * len(paths)
+
+
+def _raise_on_poison(paths: list[Path]) -> list[None]:
+    if any(p.name == "poison.replay" for p in paths):
+        raise MemoryError("rlimit")
+    return [None] * len(paths)
+
+
+@pytest.mark.parametrize(
+    ("worker", "reason"),
+    [(_crash_on_poison, "worker crashed"), (_raise_on_poison, "MemoryError: rlimit")],
+)
+def test_map_supervised_isolates_poison_replay(worker: Any, reason: str):
+    a, b, c, poison = (Path(f"{n}.replay") for n in ("a", "b", "c", "poison"))
+
+    results, poisoned = _map_supervised(
+        worker, [[a, poison], [b, c]], workers=2, memory_limit=None
+    )
+
+    assert results == {a: None, b: None, c: None}
+    assert poisoned == {poison: reason}
+
+
+def test_sniff_match_guid_reads_header_property():
+    data = _header_with_properties(
+        _str_property("MapName", "stadium_p"), _str_property("MatchGUID", "ABC123")
+    )
+    assert sniff_match_guid(data) == "ABC123"
+    legacy = _header_with_properties(_str_property("MatchGuid", "abc"))
+    assert sniff_match_guid(legacy) == "abc"
+
+
+def test_sniff_match_guid_missing_or_truncated():
+    assert sniff_match_guid(b"") is None
+    assert sniff_match_guid(_header_with_properties(_str_property("Id", "x"))) is None
+    truncated = _header_with_properties(_str_property("MatchGUID", "ABC123"))[:-12]
+    assert sniff_match_guid(truncated) is None
+
+
+def _framed_replay(path: Path, header_crc: int, content_crc: int) -> Path:
+    """Write a file with just enough .replay framing to carry its CRCs."""
+    path.write_bytes(
+        struct.pack("<iI", 4, header_crc) + b"body" + struct.pack("<iI", 0, content_crc)
+    )
+    return path
+
+
+def _fake_rrrocket_batch(tmp_path: Path, docs: list[dict[str, Any]]):
+    """Patch rrrocket -m so it pipes one line per doc through a real
+    subprocess."""
+    output = tmp_path / "rrrocket_output.jsonl"
+    output.write_text("\n".join(json.dumps(doc) for doc in docs) + "\n")
+    real_popen = subprocess.Popen
+
+    def fake_popen(args: Any, **kwargs: Any):
+        assert "-m" in args
+        return real_popen(["cat", str(output)], **kwargs)
+
+    return patch("process.subprocess.Popen", side_effect=fake_popen)
+
+
+def test_parse_replay_headers_demultiplexes_one_rrrocket_run(tmp_path: Path):
+    good = [_framed_replay(tmp_path / f"{i}.replay", i, 100 + i) for i in range(3)]
+    corrupt = _framed_replay(tmp_path / "corrupt.replay", 9, 109)
+    paths = [good[0], corrupt, good[1], good[2]]
+    # Output order doesn't follow argument order; the corrupt file is absent
+    popen = _fake_rrrocket_batch(
+        tmp_path,
+        [
+            {
+                "header_crc": i,
+                "content_crc": 100 + i,
+                "properties": {"MatchGUID": f"guid-{i}"},
+            }
+            for i in (2, 0, 1)
+        ],
+    )
+    # corrupt.replay retried on its own
+    failed = subprocess.CompletedProcess(["rrrocket"], 1, stderr=b"bad replay")
+
+    with popen as p, patch("process.subprocess.run", return_value=failed) as run:
+        results = parse_replay_headers(paths)
+
+    assert p.call_count == 1
+    assert run.call_count == 1
+    assert list(results) == paths
+    for i, path in enumerate(good):
+        replay, error = results[path]
+        assert error is None
+        assert replay is not None and replay.match_guid == f"guid-{i}"
+    assert results[corrupt][0] is None
+    assert "bad replay" in str(results[corrupt][1])
+    assert not corrupt.exists()
+    assert all(p.exists() for p in good)
+
+
+def test_parse_replay_headers_unwraps_named_output(tmp_path: Path):
+    paths = [_framed_replay(tmp_path / f"{i}.replay", i, i) for i in range(2)]
+    popen = _fake_rrrocket_batch(
+        tmp_path,
+        [
+            {
+                "name": f"{i}.replay",
+                "replay": {
+                    "header_crc": i,
+                    "content_crc": i,
+                    "properties": {"MatchGUID": f"guid-{i}"},
+                },
+            }
+            for i in range(2)
+        ],
+    )
+
+    with popen:
+        results = parse_replay_headers(paths)
+
+    assert [r.match_guid for r, _ in results.values() if r] == ["guid-0", "guid-1"]
+
+
+def test_parse_replays_runs_rrrocket_as_results_are_consumed(tmp_path: Path):
+    paths = [tmp_path / f"{i}.replay" for i in range(3)]
+    for path in paths:
+        path.write_bytes(b"\x00" * 1024)
+    doc = json.dumps(_STREAM_DOC).encode()
+
+    with patch("process._run_rrrocket", return_value=(doc, None)) as run:
+        results = iter_replays(paths)
+        path, (replay, error) = next(results)
+        assert path == paths[0] and error is None and replay is not None
+        # Network output is large; the next replay waits for this one.
+        assert run.call_count == 1
+        assert [p for p, _ in results] == paths[1:]
+    assert run.call_count == 3
+
+
+def test_parse_replays_end_to_end_batches_real_rrrocket(tmp_path: Path):
+    """One real ``rrrocket -m -j`` header run is split across its files."""
+    fixture = (TEST_DATA_DIR / "BEC7EF8411F170E7DBCA41B0676B6A04.replay").read_bytes()
+    paths = [tmp_path / f"{i}.replay" for i in range(2)]
+    for path in paths:
+        path.write_bytes(fixture)
+
+    with patch("process._run_rrrocket", side_effect=AssertionError("not batched")):
+        headers = parse_replay_headers(paths)
+    full = parse_replays(paths)
+    streamed = parse_replays(
+        paths, headers={p: h for p, (h, _) in headers.items() if h}
+    )
+
+    for path in paths:
+        header, _ = headers[path]
+        replay, error = full[path]
+        assert error is None
+        assert header is not None and replay is not None
+        assert header.match_guid is not None
+        assert replay.match_guid == header.match_guid
+        assert replay.frames
+        frames = streamed[path][0]
+        assert frames is not None and list(frames.frames) == replay.frames
+
+
 def test_process_batch_commits(tmp_path: Path):
     """process_batch processes multiple files and commits once."""
     conn = _make_conn()
@@ -193,12 +685,21 @@ def test_upload_processor_debounce(tmp_path: Path):
     batch_calls: list[list[Path]] = []
 
     def fake_batch(
-        f: list[Path], c: sqlite3.Connection, tp: object
+        f: list[Path],
+        c: sqlite3.Connection,
+        tp: object,
+        cache: object = None,
+        parallel_handlers: bool = False,
+        frame_store: object = None,
+        commit_each: bool = False,
     ) -> dict[str, tuple[bool, None]]:
         batch_calls.append(list(f))
         return {p.name: (True, None) for p in f}
 
-    with patch("process.process_batch", side_effect=fake_batch):
+    with (
+        patch("process.publish_headers", return_value={}),
+        patch("process.process_batch", side_effect=fake_batch),
+    ):
         proc = UploadProcessor(db_path, TRACKED_PLAYERS, delay=0.1)
 
         for i in range(5):
@@ -216,8 +717,248 @@ def test_upload_processor_debounce(tmp_path: Path):
         # Re-enqueue to trigger our patched flush
         proc.enqueue(tmp_path / "match5.replay")
         done.wait(timeout=2.0)
+        proc.join()
 
     assert len(batch_calls) >= 1
     # All files should be in total across calls
     all_files = [f for call in batch_calls for f in call]
     assert len(all_files) == 6
+
+
+_SCOREBOARD_HEADER = {
+    "properties": {
+        **_HEADER["properties"],
+        "Team0Score": 2,
+        "Team1Score": 1,
+        "WinningTeam": 0,
+        "PlayerStats": [
+            {
+                "Name": "Me",
+                "Team": 0,
+                "Goals": 2,
+                "Platform": {"value": "OnlinePlatform_Epic"},
+                "PlayerID": {"fields": {"EpicAccountId": "abc"}},
+            }
+        ],
+    }
+}
+
+
+def _scoreboard_rrrocket(args: Any, **kwargs: Any):
+    assert "-n" not in args, "the first tier should only parse headers"
+    stdout = json.dumps(_SCOREBOARD_HEADER).encode()
+    return subprocess.CompletedProcess(args, 0, stdout=stdout)
+
+
+def test_publish_headers_writes_pending_match(tmp_path: Path):
+    """The first tier writes scoreboard stats from the header alone."""
+    conn = _make_conn()
+    replay_path = tmp_path / "new.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+
+    with patch("process.subprocess.run", side_effect=_scoreboard_rrrocket):
+        published = publish_headers([replay_path], conn, {_ME: "Me"})
+
+    assert published == {replay_path: "ABC"}
+    row = conn.execute(
+        "SELECT analysis_status, result, team_possession_seconds FROM matches"
+    ).fetchone()
+    assert row == ("pending", "win", None)
+    # A pending match still gets its full analysis
+    assert not is_ingested(conn, "ABC")
+
+
+def test_upload_processor_publishes_before_analysis(tmp_path: Path):
+    """Scoreboard stats are written before the full parse, which runs later."""
+    db_path = file_db(tmp_path)
+    replay_path = tmp_path / "new.replay"
+    replay_path.write_bytes(b"\x00" * 1024)
+    statuses: list[str] = []
+
+    def fake_batch(
+        f: list[Path], c: sqlite3.Connection, *args: object, **kwargs: object
+    ) -> dict[str, tuple[bool, str | None]]:
+        statuses.append(c.execute("SELECT analysis_status FROM matches").fetchone()[0])
+        return {p.name: (False, "rrrocket failed") for p in f}
+
+    with (
+        patch("process.subprocess.run", side_effect=_scoreboard_rrrocket),
+        patch("process.process_batch", side_effect=fake_batch),
+    ):
+        proc = UploadProcessor(db_path, {_ME: "Me"}, delay=0)
+        proc.enqueue(replay_path)
+        proc.flush()
+        proc.join()
+
+    assert statuses == ["pending"]
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT analysis_status FROM matches").fetchone()
+    finally:
+        conn.close()
+    assert row == ("failed",)
+
+
+def test_upload_processor_publishes_during_background_analysis(tmp_path: Path):
+    """A batch mid-analysis doesn't hold the write lock against flush."""
+    db_path = file_db(tmp_path)
+    paths = {guid: tmp_path / f"{guid}.replay" for guid in ("A", "B", "C")}
+    replays: dict[Path, ParsedReplay] = {}
+    for guid, path in paths.items():
+        path.write_bytes(guid.encode() * 1024)
+        doc = json.loads(json.dumps(_SCOREBOARD_HEADER))
+        doc["properties"]["MatchGUID"] = guid
+        replays[path] = parse_rrrocket(doc)
+
+    def fake_parse(
+        files: list[Path], cache: object = None, headers: object = None
+    ) -> dict[Path, tuple[ParsedReplay, None]]:
+        return {p: (replays[p], None) for p in files}
+
+    analyzing_b, release_b = threading.Event(), threading.Event()
+
+    def slow_analyze(replay: ParsedReplay, *args: Any, **kwargs: Any):
+        if replay.match_guid == "B":
+            analyzing_b.set()
+            release_b.wait(timeout=10)
+        return analyze_replay(replay, *args, **kwargs)
+
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    batch = threading.Thread(
+        target=process_batch,
+        args=([paths["A"], paths["B"]], conn, {_ME: "Me"}),
+        kwargs={"commit_each": True},
+    )
+    with (
+        patch("process.parse_replay_headers", side_effect=fake_parse),
+        patch(
+            "process.iter_replays",
+            side_effect=lambda *a, **kw: fake_parse(*a, **kw).items(),
+        ),
+        patch("process.analyze_replay", side_effect=slow_analyze),
+    ):
+        batch.start()
+        try:
+            assert analyzing_b.wait(timeout=10)
+            proc = UploadProcessor(db_path, {_ME: "Me"}, delay=60)
+            proc.enqueue(paths["C"])
+            started = time.monotonic()
+            proc.flush()
+            publish_seconds = time.monotonic() - started
+        finally:
+            release_b.set()
+            batch.join()
+        proc.join()
+    conn.close()
+
+    # Without a lock to wait out, publishing doesn't sit in busy_timeout
+    assert publish_seconds < 1
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT replay_hash, analysis_status FROM matches ORDER BY replay_hash"
+        ).fetchall()
+    finally:
+        conn.close()
+    assert rows == [("A", "complete"), ("B", "complete"), ("C", "complete")]
+
+
+def _rb_update(aid: int, y: float) -> dict[str, Any]:
+    rb = {"location": {"x": 0.0, "y": y, "z": 17.5}, "linear_velocity": None}
+    return {"actor_id": aid, "object_id": 2, "attribute": {"RigidBody": rb}}
+
+
+def test_parallel_analysis_records_frames(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    """A frame_store no longer forces the sequential loop."""
+    frames: list[Any] = [
+        {
+            "time": 0.0,
+            "new_actors": [
+                {"actor_id": 1, "object_id": 0},
+                {"actor_id": 2, "object_id": 1},
+            ],
+            "updated_actors": [],
+        }
+    ]
+    for i in range(1, 50):
+        frames.append(
+            {
+                "time": i * 0.1,
+                "updated_actors": [
+                    _rb_update(1, (i * 97) % 8000 - 4000.0),
+                    _rb_update(2, (i * 31) % 8000 - 4000.0),
+                    {"actor_id": 1, "object_id": 3, "attribute": {"Byte": i % 2}},
+                    {
+                        "actor_id": 50 + i % 7,
+                        "object_id": 4,
+                        "attribute": {
+                            "PickupNew": {"picked_up": i % 3, "instigator": 2}
+                        },
+                    },
+                ],
+            }
+        )
+    replay = parse_rrrocket(
+        {
+            **_SCOREBOARD_HEADER,
+            "objects": [
+                "Archetypes.Ball.Ball_Default",
+                "Archetypes.Car.Car_Default",
+                "TAGame.RBActor_TA:ReplicatedRBState",
+                "TAGame.Ball_TA:HitTeamNum",
+                "TAGame.VehiclePickup_TA:NewReplicatedPickupData",
+            ],
+            "network_frames": {"frames": frames},
+        }
+    )
+    sequential_store = FrameStore(tmp_path / "sequential")
+    expected = analyze_replay(replay, {_ME: "Me"}, frame_store=sequential_store)
+
+    runs: list[int] = []
+    run_parallel = frame_analysis._run_parallel
+
+    def spy_run_parallel(*args: Any) -> None:
+        runs.append(len(args[1]))
+        run_parallel(*args)
+
+    monkeypatch.setattr(frame_analysis, "free_threading_enabled", lambda: True)
+    monkeypatch.setattr(frame_analysis, "_run_parallel", spy_run_parallel)
+    store = FrameStore(tmp_path / "parallel")
+    analysis = analyze_replay(
+        replay, {_ME: "Me"}, parallel_handlers=True, frame_store=store
+    )
+
+    assert runs and runs[0] > 1
+    assert analysis == expected
+    stored, reference = store.load("ABC"), sequential_store.load("ABC")
+    assert stored is not None and reference is not None
+    assert list(stored.frames) == list(reference.frames)
+
+
+def test_reprocess_stale_replays_stored_frames(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    """A handler version bump reruns that handler without rrrocket."""
+    db_path = file_db(tmp_path)
+    store = FrameStore(tmp_path / "frames")
+    analysis = analyze_replay(
+        parse_rrrocket(_SCOREBOARD_HEADER), {_ME: "Me"}, frame_store=store
+    )
+    assert analysis is not None
+    conn = sqlite3.connect(db_path)
+    write_match(conn, analysis)
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(MovementHandler, "version", MovementHandler.version + 1)
+    with patch("process.subprocess.run") as run:
+        reprocess_stale(db_path, tmp_path, {_ME: "Me"}, frame_store=store)
+
+    run.assert_not_called()
+    conn = sqlite3.connect(db_path)
+    try:
+        assert stale_metrics(conn) == {}
+    finally:
+        conn.close()
@@ -0,0 +1,88 @@
+import os
+from pathlib import Path
+
+from replay_cache import ReplayCache, content_hash
+
+
+def _replay(tmp_path: Path, name: str, data: bytes) -> Path:
+    p = tmp_path / name
+    p.write_bytes(data)
+    return p
+
+
+def test_get_returns_none_on_miss(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache")
+    assert cache.get("missing") is None
+
+
+def test_put_then_get_round_trips(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache")
+    cache.put("k", b'{"properties": {}}')
+    assert cache.get("k") == b'{"properties": {}}'
+
+
+def test_entries_are_compressed(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache")
+    data = b'{"time": 0.0, "updated_actors": []}' * 1000
+    cache.put("k", data)
+    (entry,) = (tmp_path / "cache").iterdir()
+    assert entry.stat().st_size < len(data) // 10
+
+
+def test_key_depends_on_content_and_version(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache")
+    a = _replay(tmp_path, "a.replay", b"\x01" * 64)
+    a_copy = _replay(tmp_path, "a_copy.replay", b"\x01" * 64)
+    b = _replay(tmp_path, "b.replay", b"\x02" * 64)
+
+    assert cache.key_for(a, "rrrocket 0.11.4") == cache.key_for(
+        a_copy, "rrrocket 0.11.4"
+    )
+    assert cache.key_for(a, "rrrocket 0.11.4") != cache.key_for(b, "rrrocket 0.11.4")
+    assert cache.key_for(a, "rrrocket 0.11.4") != cache.key_for(a, "rrrocket 0.11.5")
+
+
+def test_content_hash_ignores_filename(tmp_path: Path):
+    a = _replay(tmp_path, "a.replay", b"same bytes")
+    b = _replay(tmp_path, "b.replay", b"same bytes")
+    assert content_hash(a) == content_hash(b)
+
+
+def test_corrupt_entry_is_discarded(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache")
+    cache.put("k", b"{}")
+    (tmp_path / "cache" / "k.json.zst").write_bytes(b"not zstd")
+    assert cache.get("k") is None
+    assert not (tmp_path / "cache" / "k.json.zst").exists()
+
+
+def test_eviction_removes_least_recently_used(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache", max_bytes=10_000)
+    blob = os.urandom(4_000)  # incompressible, so each entry is ~4KB on disk
+    cache.put("old", blob)
+    cache.put("mid", blob)
+    entries = tmp_path / "cache"
+    os.utime(entries / "old.json.zst", (1_000, 1_000))
+    os.utime(entries / "mid.json.zst", (2_000, 2_000))
+
+    cache.put("new", blob)
+
+    assert cache.get("old") is None
+    assert cache.get("mid") == blob
+    assert cache.get("new") == blob
+
+
+def test_hit_refreshes_recency(tmp_path: Path):
+    cache = ReplayCache(tmp_path / "cache", max_bytes=10_000)
+    blob = os.urandom(4_000)
+    cache.put("a", blob)
+    cache.put("b", blob)
+    entries = tmp_path / "cache"
+    os.utime(entries / "a.json.zst", (1_000, 1_000))
+    os.utime(entries / "b.json.zst", (2_000, 2_000))
+
+    assert cache.get("a") == blob  # touching "a" makes "b" the LRU entry
+    cache.put("c", blob)
+
+    assert cache.get("a") == blob
+    assert cache.get("b") is None
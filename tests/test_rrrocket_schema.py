@@ -0,0 +1,165 @@
+import json
+
+import pytest
+
+from rrrocket_schema import (
+    ActorUpdate,
+    Demolish,
+    Pickup,
+    RigidBody,
+    Vector3,
+    decode_frame,
+    decode_update,
+    iter_frames,
+    parse,
+)
+
+DOC = {
+    "properties": {"MatchGUID": "ABC", "PlayerName": "Zoë"},
+    "network_frames": {
+        "frames": [
+            {"time": 0.0, "delta": 0.0, "new_actors": [], "updated_actors": []},
+            {
+                "time": 0.03,
+                "delta": 0.03,
+                "new_actors": [{"actor_id": 1, "name_id": 2, "object_id": 3}],
+                "updated_actors": [
+                    {"actor_id": 1, "object_id": 4, "attribute": {"String": "Zoë ]}"}}
+                ],
+                "deleted_actors": [],
+            },
+            {"time": 0.06, "delta": 0.03, "new_actors": [], "deleted_actors": [1]},
+        ]
+    },
+    "objects": ["a", "b"],
+}
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_iter_frames_matches_whole_document(chunk_size: int):
+    data = json.dumps(DOC, ensure_ascii=False).encode()
+    frames = list(iter_frames(_chunks(data, chunk_size)))
+    assert frames == [decode_frame(f) for f in DOC["network_frames"]["frames"]]
+
+
+def test_iter_frames_handles_pretty_printed_output():
+    data = json.dumps(DOC, indent=2).encode()
+    frames = list(iter_frames(_chunks(data, 5)))
+    assert frames == [decode_frame(f) for f in DOC["network_frames"]["frames"]]
+
+
+def test_iter_frames_empty_frame_list():
+    data = b'{"network_frames": {"frames": []}}'
+    assert list(iter_frames([data])) == []
+
+
+def test_iter_frames_truncated_output_raises():
+    data = json.dumps(DOC).encode()
+    cut = data.index(b'"deleted_actors": [1]')
+    it = iter_frames(_chunks(data[:cut], 16))
+    assert next(it).time == 0.0
+    with pytest.raises(ValueError):
+        list(it)
+
+
+def test_iter_frames_without_network_frames_raises():
+    with pytest.raises(ValueError):
+        list(iter_frames([b'{"properties": {}, "network_frames": null}']))
+
+
+def _update(attribute: dict) -> ActorUpdate:
+    return decode_update({"actor_id": 1, "object_id": 2, "attribute": attribute})
+
+
+def test_decode_update_scalar_variants():
+    assert _update({"Byte": 1}).value == 1
+    assert _update({"Int": 300}).value == 300
+    assert _update({"ActiveActor": {"active": True, "actor": 42}}).value == 42
+    assert (
+        _update({"ReplicatedBoost": {"boost_amount": 85, "grant_count": 3}}).value == 85
+    )
+    assert _update({"TeamPaint": {"team": 1, "primary_color": 9}}).value == 1
+
+
+def test_decode_update_rigid_body():
+    rb = _update(
+        {
+            "RigidBody": {
+                "sleeping": False,
+                "location": {"x": 1.0, "y": 2.0, "z": 3.0},
+                "rotation": {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0},
+                "linear_velocity": {"x": 4.0, "y": 5.0, "z": 6.0},
+                "angular_velocity": None,
+            }
+        }
+    ).value
+    assert rb == RigidBody(Vector3(1.0, 2.0, 3.0), Vector3(4.0, 5.0, 6.0))
+
+    sleeping = _update(
+        {"RigidBody": {"location": {"x": 1.0, "y": 2.0, "z": 3.0}}}
+    ).value
+    assert sleeping == RigidBody(Vector3(1.0, 2.0, 3.0), None)
+
+
+def test_decode_update_events():
+    assert _update({"PickupNew": {"instigator": 7, "picked_up": 2}}).value == Pickup(
+        7, 2
+    )
+    demolish = _update(
+        {
+            "DemolishExtended": {
+                "attacker": {"active": True, "actor": 3},
+                "victim": {"active": True, "actor": 4},
+                "self_demolish": False,
+            }
+        }
+    ).value
+    assert demolish == Demolish(
+        attacker_active=True, victim_active=True, victim=4, self_demolish=False
+    )
+
+
+def test_decode_update_drops_unused_variants():
+    update = _update({"String": "hello"})
+    assert update == ActorUpdate(actor_id=1, object_id=2, value=None)
+    assert decode_update({"actor_id": 1}).value is None
+
+
+def test_parse_keeps_only_used_header_fields():
+    replay = parse(
+        {
+            "properties": {
+                "MatchGUID": "ABC",
+                "ReplayName": "unused",
+                "PlayerStats": [{"Name": "Zoë", "Goals": 1, "bBot": False, "Foo": 1}],
+            },
+            "debug_info": [
+                {"frame": 0, "user": "GameStartTime", "text": "2024-01-01T00:00:00Z"},
+                {"frame": 1, "user": "Other", "text": "noise"},
+            ],
+        }
+    )
+    assert replay.properties == {
+        "MatchGUID": "ABC",
+        "PlayerStats": [{"Name": "Zoë", "Goals": 1, "bBot": False}],
+    }
+    assert [e["user"] for e in replay.debug_info] == ["GameStartTime"]
+    assert replay.played_at is not None
+
+
+def test_object_index_shared_across_replays_from_one_build():
+    a = parse({"objects": ["Archetypes.Car.Car_Default", "TAGame.Ball_TA:HitTeamNum"]})
+    b = parse({"objects": ["Archetypes.Car.Car_Default", "TAGame.Ball_TA:HitTeamNum"]})
+    c = parse({"objects": ["TAGame.Ball_TA:HitTeamNum", "Archetypes.Car.Car_Default"]})
+
+    assert a.objects_digest == b.objects_digest
+    assert a.object_index is b.object_index
+    assert c.objects_digest != a.objects_digest
+    assert c.object_index == {
+        "TAGame.Ball_TA:HitTeamNum": 0,
+        "Archetypes.Car.Car_Default": 1,
+    }
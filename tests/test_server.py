@@ -239,6 +239,26 @@ def test_match_detail_events(match_client: TestClient) -> None:
     assert len(goals) == 9  # 5 team + 4 opponent
 
 
+def test_match_goals_returns_snapshot_per_goal(match_client: TestClient) -> None:
+    response = match_client.get("/api/matches/1/goals")
+
+    assert response.status_code == 200
+    goals: Any = response.json()
+    assert len(goals) == 9  # 5 team + 4 opponent
+    for goal in goals:
+        assert goal["ball"]
+        assert goal["cars"]
+        assert all(car["name"] for car in goal["cars"])
+        for car in goal["cars"]:
+            assert all(len(sample) == 5 for sample in car["samples"])
+
+
+def test_match_goals_404_nonexistent(match_client: TestClient) -> None:
+    response = match_client.get("/api/matches/9999/goals")
+
+    assert response.status_code == 404
+
+
 # -- player routes --
 
 
@@ -283,6 +303,22 @@ def test_player_time_series_unknown_returns_404(match_client: TestClient) -> Non
     assert response.status_code == 404
 
 
+def test_player_heatmap_sums_match_grids(match_client: TestClient) -> None:
+    response = match_client.get("/api/players/Drew/heatmap")
+
+    assert response.status_code == 200
+    data: Any = response.json()
+    assert data["matches"] == 1
+    assert len(data["seconds"]) == data["columns"] * data["rows"]
+    assert sum(data["seconds"]) > 0
+
+
+def test_player_heatmap_unknown_returns_404(match_client: TestClient) -> None:
+    response = match_client.get("/api/players/Nobody/heatmap")
+
+    assert response.status_code == 404
+
+
 def test_match_players_include_is_tracked(match_client: TestClient) -> None:
     response = match_client.get("/api/matches/1")
     data: Any = response.json()
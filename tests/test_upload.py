@@ -1,7 +1,11 @@
+import hashlib
+import sqlite3
+import struct
 from collections.abc import Callable
 from io import BytesIO
 from pathlib import Path
 
+from httpx import Response
 from starlette.testclient import TestClient
 
 from config import Settings
@@ -14,6 +18,16 @@ def _replay_content(size: int = 300 * 1024) -> bytes:
     return b"\x00" * size
 
 
+def _fstring(s: str) -> bytes:
+    return struct.pack("<i", len(s) + 1) + s.encode() + b"\0"
+
+
+def _replay_with_guid(guid: str, body: bytes) -> bytes:
+    """Minimal .replay framing whose header carries a MatchGUID property."""
+    header = _fstring("MatchGUID") + _fstring("StrProperty") + bytes(8) + _fstring(guid)
+    return struct.pack("<iI", len(header), 0) + header + body
+
+
 def _get_csrf_token(client: TestClient) -> str:
     """Get a CSRF token by hitting /api/auth/status."""
     resp = client.get("/api/auth/status")
@@ -201,6 +215,99 @@ def test_upload_duplicate(tmp_path: Path, make_settings: Callable[..., Settings]
     assert resp.json()["duplicate"] is True
 
 
+def _ingest(
+    tmp_path: Path, match_guid: str, content: bytes | None = None, status="complete"
+) -> None:
+    """Record a match as process_batch would, with the file it came from."""
+    conn = sqlite3.connect(tmp_path / "test.sqlite")
+    conn.execute(
+        """INSERT INTO matches
+        (replay_hash, team, team_score, opponent_score, result, analysis_status)
+        VALUES (?, 0, 1, 0, 'win', ?)""",
+        (match_guid, status),
+    )
+    if content is not None:
+        conn.execute(
+            "INSERT OR REPLACE INTO replay_files (content_hash, match_guid) VALUES (?, ?)",
+            (hashlib.sha256(content).hexdigest(), match_guid),
+        )
+    conn.commit()
+    conn.close()
+
+
+def _upload(client: TestClient, token: str, name: str, content: bytes) -> Response:
+    return client.post(
+        "/api/upload",
+        files={"file": (name, BytesIO(content), "application/octet-stream")},
+        headers={"X-CSRF-Token": token},
+    )
+
+
+def test_upload_same_content_under_new_name_rejected(
+    tmp_path: Path, make_settings: Callable[..., Settings]
+):
+    client, token, replay_dir = _authed_client(tmp_path, make_settings)
+
+    assert _upload(client, token, "mine.replay", _replay_content()).status_code == 201
+    _ingest(tmp_path, "ABC123", _replay_content())
+    resp = _upload(client, token, "theirs.replay", _replay_content())
+
+    assert resp.status_code == 409
+    assert resp.json() == {"error": "Replay already ingested", "duplicate": True}
+    assert not (replay_dir / "theirs.replay").exists()
+
+
+def test_upload_same_match_guid_rejected(
+    tmp_path: Path, make_settings: Callable[..., Settings]
+):
+    client, token, replay_dir = _authed_client(tmp_path, make_settings)
+    _ingest(tmp_path, "ABC123")
+
+    # Different bytes, same match (e.g. saved by two players in the lobby)
+    resp = _upload(client, token, "theirs.replay", _replay_with_guid("ABC123", b"\x02"))
+
+    assert resp.status_code == 409
+    assert not (replay_dir / "theirs.replay").exists()
+
+
+def test_upload_still_queued_rejected_under_new_name(
+    tmp_path: Path, make_settings: Callable[..., Settings]
+):
+    client, token, replay_dir = _authed_client(tmp_path, make_settings)
+
+    assert _upload(client, token, "mine.replay", _replay_content()).status_code == 201
+    resp = _upload(client, token, "theirs.replay", _replay_content())
+
+    assert resp.status_code == 409
+    assert not (replay_dir / "theirs.replay").exists()
+
+
+def test_upload_of_pending_match_rejected(
+    tmp_path: Path, make_settings: Callable[..., Settings]
+):
+    client, token, replay_dir = _authed_client(tmp_path, make_settings)
+    _ingest(tmp_path, "ABC123", status="pending")
+
+    resp = _upload(client, token, "theirs.replay", _replay_with_guid("ABC123", b"\x02"))
+
+    assert resp.status_code == 409
+    assert not (replay_dir / "theirs.replay").exists()
+
+
+def test_upload_retried_after_failed_analysis(
+    tmp_path: Path, make_settings: Callable[..., Settings]
+):
+    client, token, replay_dir = _authed_client(tmp_path, make_settings)
+    content = _replay_with_guid("ABC123", b"\x01")
+    _ingest(tmp_path, "ABC123", content, status="failed")
+
+    # rrrocket deleted the first copy, or the analysis never completed
+    resp = _upload(client, token, "mine.replay", content)
+
+    assert resp.status_code == 201
+    assert (replay_dir / "mine.replay").exists()
+
+
 def test_upload_path_traversal_sanitized(
     tmp_path: Path, make_settings: Callable[..., Settings]
 ):
@@ -312,6 +419,18 @@ def test_upload_status_processed_when_ingested_marker_exists(tmp_path: Path):
     assert resp.json()["status"] == "processed"
 
 
+def test_upload_status_error_when_failed_marker_exists(tmp_path: Path):
+    """.replay.failed marker means the replay crashed its worker."""
+    client, replay_dir = _status_client(tmp_path)
+
+    (replay_dir / "test.replay").write_bytes(b"\x00")
+    (replay_dir / "test.replay.failed").write_text("worker crashed\n")
+
+    resp = client.get("/api/upload/status?filename=test.replay")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "error"
+
+
 def test_upload_status_missing_filename(tmp_path: Path):
     client, _ = _status_client(tmp_path)
 